@@ -4,4 +4,4 @@
 包含所有API路由模块
 """
 
-from app.api import users, textbooks, chat, tests
+from app.api import users, textbooks, chat, tests, profiles
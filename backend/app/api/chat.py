@@ -8,23 +8,20 @@ import json
 from typing import List, Optional, Dict
 from datetime import datetime
 
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, status
 from pydantic import BaseModel
-from supabase import create_client, Client
 
 from config import settings
 from auth import get_current_user
 from database import User
 from services.llm_service import llm_service
+from services.llm_governor import llm_governor, LLMBusyError, PRIORITY_INTERACTIVE
+from services.data_loader import get_loaders
+from services.repository import repository
+from services.textbook_access import textbook_resolver
 
 router = APIRouter()
 
-# Supabase客户端
-supabase: Client = create_client(
-    settings.supabase.url,
-    settings.supabase.service_key
-)
-
 
 # 请求/响应模型
 class ChatRequest(BaseModel):
@@ -75,30 +72,31 @@ async def chat(
         
         if request.textbook_id:
             # 验证教材访问权限
-            tb_resp = supabase.table("textbooks").select("user_id").eq("id", request.textbook_id).execute()
+            access = await textbook_resolver.resolve(request.textbook_id)
             
-            if not tb_resp.data or len(tb_resp.data) == 0:
+            if not access:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="教材不存在"
                 )
             
-            if tb_resp.data[0]["user_id"] != current_user.id:
+            if not access.is_owner(current_user.id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="无权访问此教材"
                 )
             
             # 获取知识点
-            units_resp = supabase.table("units").select("id").eq("textbook_id", request.textbook_id).execute()
-            unit_ids = [u["id"] for u in units_resp.data or []]
+            kp_rows = await repository.list_knowledge_points(
+                unit_ids=access.unit_ids,
+                limit=50,
+                with_unit_title=False
+            )
             
-            if unit_ids:
-                kp_resp = supabase.table("knowledge_points").select("*").in_("unit_id", unit_ids).limit(50).execute()
-                
+            if kp_rows:
                 # 构建知识上下文
                 knowledge_items = []
-                for kp in kp_resp.data or []:
+                for kp in kp_rows:
                     item = {
                         "type": kp.get("point_type", "vocabulary"),
                         "content": kp.get("content", ""),
@@ -111,9 +109,12 @@ async def chat(
                 knowledge_context = json.dumps(knowledge_items, ensure_ascii=False, indent=2)
         
         # 调用大模型回答
-        result = llm_service.answer_question(
+        result = await llm_governor.run(
+            llm_service.answer_question,
             question=request.message,
-            knowledge_context=knowledge_context
+            knowledge_context=knowledge_context,
+            user_id=current_user.id,
+            priority=PRIORITY_INTERACTIVE
         )
         
         # 生成推荐话题
@@ -129,6 +130,8 @@ async def chat(
         
     except HTTPException:
         raise
+    except LLMBusyError as e:
+        raise e.to_http_exception()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -147,46 +150,36 @@ async def query_knowledge(
     根据关键词查询知识点
     """
     try:
-        # 构建查询
-        query = supabase.table("knowledge_points").select(
-            "id, unit_id, point_type, content, phonetic, part_of_speech, chinese_meaning, collocations, examples"
-        )
-        
         # 验证教材访问权限
+        unit_ids = [request.unit_id] if request.unit_id else None
         if request.textbook_id:
-            tb_resp = supabase.table("textbooks").select("user_id").eq("id", request.textbook_id).execute()
+            access = await textbook_resolver.resolve(request.textbook_id)
             
-            if not tb_resp.data or len(tb_resp.data) == 0:
+            if not access:
                 raise HTTPException(
                     status_code=status.HTTP_404_NOT_FOUND,
                     detail="教材不存在"
                 )
             
-            if tb_resp.data[0]["user_id"] != current_user.id:
+            if not access.is_owner(current_user.id):
                 raise HTTPException(
                     status_code=status.HTTP_403_FORBIDDEN,
                     detail="无权访问此教材"
                 )
             
-            # 获取该教材的单元
-            units_resp = supabase.table("units").select("id").eq("textbook_id", request.textbook_id).execute()
-            unit_ids = [u["id"] for u in units_resp.data or []]
-            
-            if unit_ids:
-                query = query.in_("unit_id", unit_ids)
-        
-        if request.unit_id:
-            query = query.eq("unit_id", request.unit_id)
-        
-        if request.point_type:
-            query = query.eq("point_type", request.point_type)
+            unit_ids = access.filter_unit_ids(unit_ids)
         
         # 执行查询
-        response = query.limit(20).execute()
+        kp_rows = await repository.list_knowledge_points(
+            unit_ids=unit_ids,
+            point_types=[request.point_type] if request.point_type else None,
+            limit=20,
+            with_unit_title=False
+        )
 
         # 模糊匹配关键词
         results = []
-        for kp in response.data or []:
+        for kp in kp_rows:
             # 检查关键词匹配
             content = kp.get("content", "").lower()
             meaning = kp.get("chinese_meaning", "").lower()
@@ -236,20 +229,23 @@ async def explain_knowledge(
     """
     try:
         # 获取知识点
-        kp_resp = supabase.table("knowledge_points").select(
-            "*, units:textbook_id(title)"
-        ).eq("id", request.knowledge_point_id).execute()
+        loaders = get_loaders()
+        kp = await loaders.knowledge_points.load(request.knowledge_point_id)
         
-        if not kp_resp.data or len(kp_resp.data) == 0:
+        if not kp:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="知识点不存在"
             )
         
-        kp = kp_resp.data[0]
+        unit = await loaders.units.load(kp["unit_id"])
         
         # 调用大模型解释
-        explanation = llm_service.explain_knowledge_point(kp)
+        explanation = await llm_governor.run(
+            llm_service.explain_knowledge_point, kp,
+            user_id=current_user.id,
+            priority=PRIORITY_INTERACTIVE
+        )
         
         return {
             "knowledge_point": {
@@ -259,13 +255,15 @@ async def explain_knowledge(
                 "phonetic": kp.get("phonetic"),
                 "part_of_speech": kp.get("part_of_speech"),
                 "chinese_meaning": kp.get("chinese_meaning"),
-                "unit_name": kp.get("units", {}).get("title", "")
+                "unit_name": unit["title"] if unit else ""
             },
             "explanation": explanation
         }
         
     except HTTPException:
         raise
+    except LLMBusyError as e:
+        raise e.to_http_exception()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
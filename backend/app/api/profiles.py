@@ -0,0 +1,75 @@
+"""
+英语学习辅助应用 - 请求分析API路由
+
+查看最近的请求采样分析结果（需管理员令牌）
+"""
+
+import hmac
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException, Depends, Header, Query, status
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+
+from config import settings
+from services.profiler import request_profiler
+
+router = APIRouter()
+
+
+class ProfileSummary(BaseModel):
+    """分析结果摘要"""
+    id: str
+    method: Optional[str] = None
+    path: Optional[str] = None
+    route: Optional[str] = None
+    status: int
+    trigger: str
+    wall_ms: float
+    samples: int = 0
+    interval_ms: float
+    started_at: str
+
+
+def require_profiling_token(x_profile_token: Optional[str] = Header(None)):
+    """校验管理员令牌"""
+    if not settings.profiling.enabled:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="未启用请求分析"
+        )
+
+    if not settings.profiling.token or not x_profile_token or \
+            not hmac.compare_digest(x_profile_token, settings.profiling.token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="无权访问请求分析结果"
+        )
+
+
+@router.get("", response_model=List[ProfileSummary], dependencies=[Depends(require_profiling_token)])
+def list_profiles(limit: int = Query(50, ge=1, le=500)):
+    """
+    获取最近的请求分析结果
+
+    按时间倒序返回路由、状态码、总耗时和样本数
+    """
+    return request_profiler.list_profiles(limit)
+
+
+@router.get("/{profile_id}", dependencies=[Depends(require_profiling_token)])
+def download_profile(profile_id: str):
+    """
+    下载折叠栈文件
+
+    可直接用 flamegraph.pl 或 speedscope 打开
+    """
+    path = request_profiler.profile_path(profile_id)
+
+    if path is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="分析结果不存在"
+        )
+
+    return FileResponse(path, media_type="text/plain; charset=utf-8", filename=path.name)
@@ -9,24 +9,21 @@ from typing import List, Optional, Dict, Any
 from datetime import datetime
 from uuid import uuid4
 
-from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Depends, Query, BackgroundTasks, status
 from pydantic import BaseModel
-from supabase import create_client, Client
 
 from config import settings
 from auth import get_current_user
 from database import User, TestRecord, AnswerRecord
 from services.test_generator import test_generator
 from services.llm_service import llm_service
+from services.llm_governor import llm_governor, LLMBusyError, PRIORITY_BATCH, PRIORITY_BACKGROUND
+from services.repository import repository
+from services.responses import FastJSONResponse
+from services.textbook_access import textbook_resolver
 
 router = APIRouter()
 
-# Supabase客户端
-supabase: Client = create_client(
-    settings.supabase.url,
-    settings.supabase.service_key
-)
-
 
 # 请求/响应模型
 class GenerateTestRequest(BaseModel):
@@ -109,28 +106,29 @@ async def generate_test(
     """
     try:
         # 验证教材访问权限
-        tb_resp = supabase.table("textbooks").select("user_id, name").eq("id", request.textbook_id).execute()
+        access = await textbook_resolver.resolve(request.textbook_id)
         
-        if not tb_resp.data or len(tb_resp.data) == 0:
+        if not access:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="教材不存在"
             )
         
-        if tb_resp.data[0]["user_id"] != current_user.id:
+        if not access.is_owner(current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权访问此教材"
             )
         
         # 获取知识点
-        units_resp = supabase.table("units").select("id, unit_number, title").eq("textbook_id", request.textbook_id).execute()
+        textbook = access.textbook
+        units = access.units
         
         # 筛选指定单元
         if request.unit_numbers:
-            unit_ids = [u["id"] for u in units_resp.data or [] if u["unit_number"] in request.unit_numbers]
+            unit_ids = [u["id"] for u in units if u["unit_number"] in request.unit_numbers]
         else:
-            unit_ids = [u["id"] for u in units_resp.data or []]
+            unit_ids = [u["id"] for u in units]
         
         if not unit_ids:
             raise HTTPException(
@@ -138,14 +136,11 @@ async def generate_test(
                 detail="未找到指定单元"
             )
         
-        # 构建查询
-        query = supabase.table("knowledge_points").select("*").in_("unit_id", unit_ids)
-        
-        if request.point_types:
-            query = query.in_("point_type", request.point_types)
-        
-        kp_resp = query.execute()
-        knowledge_points = kp_resp.data or []
+        knowledge_points = await repository.list_knowledge_points(
+            unit_ids=unit_ids,
+            point_types=request.point_types,
+            with_unit_title=False
+        )
         
         if not knowledge_points:
             raise HTTPException(
@@ -154,20 +149,23 @@ async def generate_test(
             )
         
         # 生成测试范围描述
-        unit_map = {u["id"]: u for u in units_resp.data or []}
+        unit_map = {u["id"]: u for u in units}
         test_scope = {
             "type": request.test_type,
-            "textbook_name": tb_resp.data[0]["name"],
+            "textbook_name": textbook["name"],
             "units": [unit_map[uid]["title"] for uid in unit_ids],
             "point_types": request.point_types or ["vocabulary", "grammar", "sentence"]
         }
         
         # 生成测试
-        test = test_generator.generate_test(
+        test = await llm_governor.run(
+            test_generator.generate_test,
             knowledge_points=knowledge_points,
             test_scope=test_scope,
             difficulty=request.difficulty,
-            question_count=request.question_count
+            question_count=request.question_count,
+            user_id=current_user.id,
+            priority=PRIORITY_BATCH
         )
         
         # 保存测试记录
@@ -186,7 +184,7 @@ async def generate_test(
             "started_at": datetime.utcnow().isoformat()
         }
         
-        supabase.table("test_records").insert(test_record).execute()
+        await repository.insert_test_record(test_record)
         
         # 保存题目（不包含正确答案）
         questions_for_user = []
@@ -210,7 +208,7 @@ async def generate_test(
                 "question_difficulty": request.difficulty
             }
             
-            supabase.table("answer_records").insert(question_record).execute()
+            await repository.insert_answer_record(question_record)
             
             # 返回给用户的题目（不含答案）
             questions_for_user.append({
@@ -221,16 +219,18 @@ async def generate_test(
                 "time_limit": 120  # 每题约2分钟
             })
         
-        return {
+        return FastJSONResponse({
             "test_id": test_id,
             "questions": questions_for_user,
             "total_questions": test["total_questions"],
             "time_limit": test["time_limit"],
             "difficulty": request.difficulty
-        }
+        })
         
     except HTTPException:
         raise
+    except LLMBusyError as e:
+        raise e.to_http_exception()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -249,16 +249,14 @@ async def submit_test(
     """
     try:
         # 获取测试记录
-        test_resp = supabase.table("test_records").select("*").eq("id", test_id).execute()
+        test_record = await repository.get_test_record(test_id)
         
-        if not test_resp.data or len(test_resp.data) == 0:
+        if not test_record:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="测试不存在"
             )
         
-        test_record = test_resp.data[0]
-        
         # 验证权限
         if test_record["user_id"] != current_user.id:
             raise HTTPException(
@@ -274,8 +272,7 @@ async def submit_test(
             )
         
         # 获取题目
-        questions_resp = supabase.table("answer_records").select("*").eq("test_id", test_id).execute()
-        questions = {q["id"]: q for q in questions_resp.data or []}
+        questions = {q["id"]: q for q in await repository.list_answer_records(test_id)}
         
         # 批改
         answers_for_grading = []
@@ -327,12 +324,12 @@ async def submit_test(
         passed = score >= 60
         
         # 更新测试记录
-        supabase.table("test_records").update({
+        await repository.update_test_record(test_id, {
             "correct_count": correct_count,
             "score": round(score, 2),
             "status": "completed",
             "completed_at": datetime.utcnow().isoformat()
-        }).eq("id", test_id).execute()
+        })
         
         # 分类正确答案和错误答案
         correct_answers = []
@@ -360,7 +357,15 @@ async def submit_test(
         # 错题分析
         analysis = {}
         if wrong_answers:
-            analysis = llm_service.analyze_errors(wrong_answers, [])
+            try:
+                analysis = await llm_governor.run(
+                    llm_service.analyze_errors, wrong_answers, [],
+                    user_id=current_user.id,
+                    priority=PRIORITY_BACKGROUND
+                )
+            except LLMBusyError:
+                # 成绩已保存，繁忙时跳过错题分析
+                analysis = {}
         
         return {
             "test_id": test_id,
@@ -396,10 +401,8 @@ async def get_test_records(
     try:
         offset = (page - 1) * page_size
         
-        response = supabase.table("test_records").select("*").eq("user_id", current_user.id).order("created_at", desc=True).range(offset, offset + page_size - 1).execute()
-        
         records = []
-        for tr in response.data or []:
+        for tr in await repository.list_test_records(current_user.id, offset=offset, limit=page_size):
             records.append({
                 "id": tr["id"],
                 "test_type": tr["test_type"],
@@ -413,7 +416,7 @@ async def get_test_records(
                 "completed_at": tr.get("completed_at")
             })
         
-        return records
+        return FastJSONResponse(records)
         
     except Exception as e:
         raise HTTPException(
@@ -431,9 +434,7 @@ async def get_statistics(
     """
     try:
         # 获取所有测试记录
-        test_resp = supabase.table("test_records").select("*").eq("user_id", current_user.id).eq("status", "completed").execute()
-        
-        tests = test_resp.data or []
+        tests = await repository.list_test_records(current_user.id, status="completed")
         total_tests = len(tests)
         
         if total_tests == 0:
@@ -478,13 +479,13 @@ async def get_statistics(
             for month, data in sorted(progress_by_month.items())
         ]
         
-        return {
+        return FastJSONResponse({
             "total_tests": total_tests,
             "total_questions": total_questions,
             "correct_rate": round(correct_rate, 2),
             "weak_points": weak_points,
             "learning_progress": learning_progress
-        }
+        })
         
     except Exception as e:
         raise HTTPException(
@@ -503,16 +504,14 @@ async def generate_review_test(
     """
     try:
         # 获取原测试记录
-        test_resp = supabase.table("test_records").select("*").eq("id", wrong_test_id).execute()
+        test_record = await repository.get_test_record(wrong_test_id)
         
-        if not test_resp.data or len(test_resp.data) == 0:
+        if not test_record:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="测试不存在"
             )
         
-        test_record = test_resp.data[0]
-        
         if test_record["user_id"] != current_user.id:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
@@ -529,10 +528,13 @@ async def generate_review_test(
             )
         
         # 生成复习测试
-        review_test = test_generator.generate_wrong_test(
+        review_test = await llm_governor.run(
+            test_generator.generate_wrong_test,
             wrong_answers=wrong_answers,
             knowledge_points=[],
-            difficulty="medium"
+            difficulty="medium",
+            user_id=current_user.id,
+            priority=PRIORITY_BATCH
         )
         
         return {
@@ -542,6 +544,8 @@ async def generate_review_test(
         
     except HTTPException:
         raise
+    except LLMBusyError as e:
+        raise e.to_http_exception()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -4,29 +4,27 @@
 提供教材上传、解析、知识查询等接口
 """
 
-import os
 import uuid
 from datetime import datetime
 from typing import List, Optional
 from pathlib import Path
 
-from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, status
+from fastapi import APIRouter, HTTPException, UploadFile, File, Form, Depends, Header, status
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from supabase import create_client, Client
 
 from config import settings
 from auth import get_current_user
 from database import User, Textbook, Unit, KnowledgePoint
-from services.document_parser import DocumentParser
+from services.etag import cache_headers, etag_matches, not_modified, textbook_etag, textbooks_etag
+from services.parse_jobs import ParseQueueFullError, job_to_response, parse_job_queue
+from services.repository import repository
+from services.responses import FastJSONResponse
+from services.textbook_access import textbook_resolver
+from services.uploads import UploadRejectedError, discard_upload, publish_upload, release_upload, stage_upload
 
 router = APIRouter()
 
-# Supabase客户端
-supabase: Client = create_client(
-    settings.supabase.url,
-    settings.supabase.service_key
-)
-
 
 # 请求/响应模型
 class TextbookListResponse(BaseModel):
@@ -90,23 +88,17 @@ async def upload_textbook(
     if file_ext not in allowed_types:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f不支持的文件格式。允许的格式: {', '.join(allowed_types)}"
+            detail=f"不支持的文件格式。允许的格式: {', '.join(allowed_types)}"
         )
     
     try:
-        # 生成唯一文件名
         file_id = str(uuid.uuid4())
-        file_name = f"{file_id}{file_ext}"
         
-        # 保存文件到本地临时目录
+        # 按块写入文件，同时计算哈希并核对文件类型；相同内容的文件只保存一份
         upload_dir = Path(__file__).parent.parent.parent / "uploads"
-        upload_dir.mkdir(exist_ok=True)
-        file_path = upload_dir / file_name
-        
-        # 写入文件
-        content = await file.read()
-        with open(file_path, 'wb') as f:
-            f.write(content)
+        saved = await stage_upload(file, upload_dir, file_ext, settings.upload)
+        file_path = saved.pop("path")
+        staging = saved.pop("staging")
         
         # 创建教材记录
         textbook_data = {
@@ -116,25 +108,42 @@ async def upload_textbook(
             "version": version,
             "file_type": file_ext[1:],  # 去掉点
             "file_path": str(file_path),
+            "file_hash": saved["sha256"],
             "parse_status": "pending",
             "created_at": datetime.utcnow().isoformat(),
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        response = supabase.table("textbooks").insert(textbook_data).execute()
+        # 只删除自己的暂存文件，不动按内容寻址的共用文件
+        try:
+            textbook = await repository.insert_textbook(textbook_data)
+        except Exception:
+            discard_upload(staging)
+            raise
         
-        if not response.data or len(response.data) == 0:
+        if not textbook:
+            discard_upload(staging)
             raise HTTPException(
                 status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                 detail="教材创建失败"
             )
         
+        # 教材记录写入后才放到共用路径，与同时删除相同内容教材的请求竞争时文件不会丢失
+        publish_upload(staging, file_path)
+        
+        textbook_resolver.prime(textbook)
+        
         return {
             "success": True,
             "message": "教材上传成功",
-            "textbook": response.data[0]
+            "textbook": textbook,
+            "file": saved
         }
         
+    except HTTPException:
+        raise
+    except UploadRejectedError as e:
+        raise e.to_http_exception()
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -142,7 +151,7 @@ async def upload_textbook(
         )
 
 
-@router.post("/{textbook_id}/parse")
+@router.post("/{textbook_id}/parse", status_code=status.HTTP_202_ACCEPTED)
 async def parse_textbook(
     textbook_id: str,
     request: ParseRequest = None,
@@ -151,139 +160,98 @@ async def parse_textbook(
     """
     解析教材
     
-    解析教材文件，提取知识点
+    创建后台解析任务并立即返回任务ID，通过 status_url 查询进度；
+    教材已有未完成的解析任务时返回该任务
     """
     try:
         # 获取教材信息
-        response = supabase.table("textbooks").select("*").eq("id", textbook_id).execute()
+        access = await textbook_resolver.resolve(textbook_id)
         
-        if not response.data or len(response.data) == 0:
+        if not access:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="教材不存在"
             )
         
-        textbook = response.data[0]
-        
         # 检查权限
-        if textbook["user_id"] != current_user.id:
+        if not access.is_owner(current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权访问此教材"
             )
         
-        # 更新状态为解析中
-        supabase.table("textbooks").update({
-            "parse_status": "processing",
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", textbook_id).execute()
-        
-        # 解析文档
-        file_path = textbook["file_path"]
-        parse_result = DocumentParser.parse(file_path)
-        
-        if not parse_result["success"]:
-            # 解析失败
-            supabase.table("textbooks").update({
-                "parse_status": "failed",
-                "updated_at": datetime.utcnow().isoformat()
-            }).eq("id", textbook_id).execute()
-            
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"解析失败: {parse_result.get('error', '未知错误')}"
-            )
+        job = await parse_job_queue.submit(
+            access.textbook,
+            current_user.id,
+            unit_numbers=request.unit_numbers if request else None
+        )
+        body = job_to_response(job)
         
-        # 保存知识点到数据库
-        knowledge_points = parse_result["knowledge_points"]
-        units_data = {}
+        return JSONResponse(
+            {"success": True, "message": "解析任务已提交", **body},
+            status_code=status.HTTP_202_ACCEPTED,
+            headers={"Location": body["status_url"]}
+        )
         
-        for kp in knowledge_points:
-            unit_name = kp.get("unit", "Unknown")
-            unit_key = f"{textbook_id}_{unit_name}"
-            
-            # 获取或创建单元
-            if unit_key not in units_data:
-                # 检查单元是否已存在
-                unit_resp = supabase.table("units").select("id").eq("textbook_id", textbook_id).eq("title", unit_name).execute()
-                
-                if unit_resp.data and len(unit_resp.data) > 0:
-                    unit_id = unit_resp.data[0]["id"]
-                else:
-                    # 创建新单元
-                    unit_resp = supabase.table("units").insert({
-                        "textbook_id": textbook_id,
-                        "unit_number": len(units_data) + 1,
-                        "title": unit_name,
-                        "page_range": kp.get("page"),
-                        "created_at": datetime.utcnow().isoformat()
-                    }).execute()
-                    
-                    if unit_resp.data and len(unit_resp.data) > 0:
-                        unit_id = unit_resp.data[0]["id"]
-                    else:
-                        continue
-                
-                units_data[unit_key] = unit_id
-            
-            # 保存知识点
-            kp_data = {
-                "id": str(uuid.uuid4()),
-                "unit_id": units_data[unit_key],
-                "point_type": kp.get("type", "vocabulary"),
-                "content": kp.get("content", ""),
-                "phonetic": kp.get("phonetic"),
-                "part_of_speech": kp.get("part_of_speech"),
-                "chinese_meaning": kp.get("chinese_meaning"),
-                "collocations": kp.get("collocations", []),
-                "examples": kp.get("examples", []),
-                "image_description": kp.get("image_description"),
-                "created_at": datetime.utcnow().isoformat()
-            }
-            
-            supabase.table("knowledge_points").insert(kp_data).execute()
+    except HTTPException:
+        raise
+    except ParseQueueFullError as e:
+        raise e.to_http_exception()
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"提交解析任务失败: {str(e)}"
+        )
+
+
+@router.get("/jobs/{job_id}", response_model=dict)
+async def get_parse_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    查询解析任务
+    
+    返回任务状态、阶段、进度（0-100）和错误信息
+    """
+    try:
+        job = await repository.get_parse_job(job_id)
         
-        # 更新教材状态和统计
-        statistics = parse_result.get("statistics", {})
-        supabase.table("textbooks").update({
-            "parse_status": "completed",
-            "statistics": statistics,
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", textbook_id).execute()
+        if not job or job["user_id"] != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="解析任务不存在"
+            )
         
-        return {
-            "success": True,
-            "message": "教材解析成功",
-            "statistics": statistics,
-            "knowledge_points_count": len(knowledge_points)
-        }
+        return job_to_response(job)
         
     except HTTPException:
         raise
     except Exception as e:
-        supabase.table("textbooks").update({
-            "parse_status": "failed",
-            "updated_at": datetime.utcnow().isoformat()
-        }).eq("id", textbook_id).execute()
-        
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail=f"解析失败: {str(e)}"
+            detail=f"查询解析任务失败: {str(e)}"
         )
 
 
 @router.get("", response_model=List[TextbookListResponse])
 async def list_textbooks(
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取教材列表
+    
+    支持If-None-Match，列表未变化时返回304
     """
     try:
-        response = supabase.table("textbooks").select("*").eq("user_id", current_user.id).order("created_at", desc=True).execute()
+        rows = await repository.list_textbooks(current_user.id)
+        etag = textbooks_etag(rows)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
         
         textbooks = []
-        for tb in response.data or []:
+        for tb in rows:
             textbooks.append({
                 "id": tb["id"],
                 "name": tb["name"],
@@ -294,7 +262,7 @@ async def list_textbooks(
                 "created_at": tb["created_at"]
             })
         
-        return textbooks
+        return FastJSONResponse(textbooks, headers=cache_headers(etag))
         
     except Exception as e:
         raise HTTPException(
@@ -306,60 +274,54 @@ async def list_textbooks(
 @router.get("/{textbook_id}", response_model=TextbookDetailResponse)
 async def get_textbook(
     textbook_id: str,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取教材详情
+    
+    支持If-None-Match，教材未重新解析时返回304
     """
     try:
-        # 获取教材
-        response = supabase.table("textbooks").select("*").eq("id", textbook_id).execute()
+        # 获取教材（ETag依赖解析状态，用最新的教材记录校验缓存）
+        access = await textbook_resolver.resolve_fresh(textbook_id)
         
-        if not response.data or len(response.data) == 0:
+        if not access:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="教材不存在"
             )
         
-        textbook = response.data[0]
-        
         # 检查权限
-        if textbook["user_id"] != current_user.id:
+        if not access.is_owner(current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权访问此教材"
             )
         
-        # 获取单元列表
-        units_resp = supabase.table("units").select("*").eq("textbook_id", textbook_id).order("unit_number").execute()
+        # 教材未变化时直接返回304，不再统计知识点
+        textbook = access.textbook
+        etag = textbook_etag(textbook, "detail")
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
+        
+        # 各单元知识点统计（一次聚合查询）
+        point_counts = await repository.count_points_by_unit(textbook_id, unit_ids=access.unit_ids)
         units = []
         
-        for unit in units_resp.data or []:
-            # 获取该单元的知识点统计
-            kp_resp = supabase.table("knowledge_points").select("point_type", count="exact").eq("unit_id", unit["id"]).execute()
-            
-            vocab_count = 0
-            grammar_count = 0
-            sentence_count = 0
-            
-            for kp in kp_resp.data or []:
-                if kp.get("point_type") == "vocabulary":
-                    vocab_count += 1
-                elif kp.get("point_type") == "grammar":
-                    grammar_count += 1
-                elif kp.get("point_type") == "sentence":
-                    sentence_count += 1
+        for unit in access.units:
+            counts = point_counts.get(unit["id"], {})
             
             units.append({
                 "id": unit["id"],
                 "unit_number": unit["unit_number"],
                 "title": unit["title"],
-                "vocabulary_count": vocab_count,
-                "grammar_count": grammar_count,
-                "sentence_count": sentence_count
+                "vocabulary_count": counts.get("vocabulary", 0),
+                "grammar_count": counts.get("grammar", 0),
+                "sentence_count": counts.get("sentence", 0)
             })
         
-        return {
+        return FastJSONResponse({
             "id": textbook["id"],
             "name": textbook["name"],
             "version": textbook.get("version"),
@@ -368,7 +330,7 @@ async def get_textbook(
             "statistics": textbook.get("statistics"),
             "units": units,
             "created_at": textbook["created_at"]
-        }
+        }, headers=cache_headers(etag))
         
     except HTTPException:
         raise
@@ -389,30 +351,27 @@ async def delete_textbook(
     """
     try:
         # 获取教材
-        response = supabase.table("textbooks").select("*").eq("id", textbook_id).execute()
+        access = await textbook_resolver.resolve(textbook_id)
         
-        if not response.data or len(response.data) == 0:
+        if not access:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="教材不存在"
             )
         
-        textbook = response.data[0]
-        
         # 检查权限
-        if textbook["user_id"] != current_user.id:
+        if not access.is_owner(current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权删除此教材"
             )
         
-        # 删除文件
-        file_path = textbook.get("file_path")
-        if file_path and os.path.exists(file_path):
-            os.remove(file_path)
-        
         # 删除数据库记录（级联删除会自动删除关联的单元和知识点）
-        supabase.table("textbooks").delete().eq("id", textbook_id).execute()
+        await repository.delete_textbook(textbook_id)
+        textbook_resolver.invalidate(textbook_id)
+        
+        # 删除文件（其他教材仍引用相同内容的文件时保留）
+        await release_upload(access.textbook.get("file_path"), access.textbook.get("file_hash"))
         
         return {
             "success": True,
@@ -435,74 +394,64 @@ async def get_knowledge_points(
     point_type: Optional[str] = None,
     page: int = 1,
     page_size: int = 20,
+    if_none_match: Optional[str] = Header(None),
     current_user: User = Depends(get_current_user)
 ):
     """
     获取知识点列表
+    
+    支持If-None-Match，教材未重新解析时返回304
     """
     try:
-        # 验证教材访问权限
-        tb_resp = supabase.table("textbooks").select("user_id").eq("id", textbook_id).execute()
+        # 验证教材访问权限（ETag依赖解析状态，用最新的教材记录校验缓存）
+        access = await textbook_resolver.resolve_fresh(textbook_id)
         
-        if not tb_resp.data or len(tb_resp.data) == 0:
+        if not access:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="教材不存在"
             )
         
-        if tb_resp.data[0]["user_id"] != current_user.id:
+        if not access.is_owner(current_user.id):
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="无权访问此教材"
             )
         
-        # 构建查询
-        query = supabase.table("knowledge_points").select(
-            "id, unit_id, point_type, content, phonetic, part_of_speech, chinese_meaning, collocations, examples"
-        )
-        
-        # 如果指定了单元ID
-        if unit_id:
-            query = query.eq("unit_id", unit_id)
-        else:
-            # 获取该教材所有单元
-            units_resp = supabase.table("units").select("id").eq("textbook_id", textbook_id).execute()
-            unit_ids = [u["id"] for u in units_resp.data or []]
-            
-            if unit_ids:
-                query = query.in_("unit_id", unit_ids)
-        
-        # 如果指定了知识点类型
-        if point_type:
-            query = query.eq("point_type", point_type)
+        # 教材未变化时直接返回304，不再查询知识点
+        etag = textbook_etag(access.textbook, "knowledge", unit_id, point_type, page, page_size)
+        if etag_matches(if_none_match, etag):
+            return not_modified(etag)
         
-        # 分页
+        # 查询知识点，分页（单元范围和标题取自缓存的教材元数据）
         offset = (page - 1) * page_size
-        query = query.range(offset, offset + page_size - 1)
-        
-        response = query.execute()
-        
-        # 获取单元信息
-        units_resp = supabase.table("units").select("id, title").eq("textbook_id", textbook_id).execute()
-        unit_map = {u["id"]: u["title"] for u in units_resp.data or []}
+        rows = await repository.list_knowledge_points(
+            unit_ids=access.filter_unit_ids([unit_id] if unit_id else None),
+            point_types=[point_type] if point_type else None,
+            offset=offset,
+            limit=page_size,
+            with_unit_title=False
+        )
+        unit_titles = access.unit_titles
         
         # 构建响应
         knowledge_points = []
-        for kp in response.data or []:
+        for kp in rows:
             knowledge_points.append({
                 "id": kp["id"],
                 "unit_id": kp["unit_id"],
-                "unit_name": unit_map.get(kp["unit_id"], "Unknown"),
+                "unit_name": unit_titles.get(kp["unit_id"]) or "Unknown",
                 "point_type": kp["point_type"],
                 "content": kp["content"],
                 "phonetic": kp.get("phonetic"),
                 "part_of_speech": kp.get("part_of_speech"),
                 "chinese_meaning": kp.get("chinese_meaning"),
-                "collations": kp.get("collocations"),
+                "collocations": kp.get("collocations"),
                 "examples": kp.get("examples")
             })
         
-        return knowledge_points
+        # 数据结构已确定，跳过响应模型逐项校验
+        return FastJSONResponse(knowledge_points, headers=cache_headers(etag))
         
     except HTTPException:
         raise
@@ -5,20 +5,39 @@
 """
 
 from datetime import timedelta
+from typing import List, Optional
+
 from fastapi import APIRouter, HTTPException, Depends, status
 from pydantic import BaseModel, EmailStr
 
+from fastapi.security import HTTPAuthorizationCredentials
+
 from auth import (
     create_user, 
+    create_users_bulk,
     authenticate_user, 
-    create_access_token, 
+    create_user_token, 
     update_user_login_time,
-    get_current_user
+    get_current_user,
+    revoke_token,
+    ensure_family_id,
+    security
 )
 from database import User
+from services.password_hasher import PasswordHasherBusyError
 
 router = APIRouter()
 
+# 单次批量注册的最大账号数
+MAX_BULK_ACCOUNTS = 100
+
+
+def _format_datetime(value) -> Optional[str]:
+    """数据库返回的时间可能已是ISO字符串"""
+    if value is None or isinstance(value, str):
+        return value
+    return value.isoformat()
+
 
 # 请求/响应模型
 class UserRegisterRequest(BaseModel):
@@ -45,6 +64,36 @@ class UserResponse(BaseModel):
     created_at: str | None = None
 
 
+class BulkAccountRequest(BaseModel):
+    """批量注册中的单个账号"""
+    email: EmailStr
+    password: str
+    name: str
+    user_type: str = "student"
+
+
+class BulkRegisterRequest(BaseModel):
+    """批量注册请求"""
+    accounts: List[BulkAccountRequest]
+
+
+class BulkRegisterResult(BaseModel):
+    """批量注册单行结果"""
+    index: int
+    email: str
+    success: bool
+    user_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BulkRegisterResponse(BaseModel):
+    """批量注册响应"""
+    family_id: str
+    created_count: int
+    failed_count: int
+    results: List[BulkRegisterResult]
+
+
 class TokenResponse(BaseModel):
     """令牌响应"""
     access_token: str
@@ -71,7 +120,7 @@ async def register(user_data: UserRegisterRequest):
     
     try:
         # 创建用户
-        user = create_user(
+        user = await create_user(
             email=user_data.email,
             password=user_data.password,
             user_type=user_data.user_type,
@@ -80,8 +129,8 @@ async def register(user_data: UserRegisterRequest):
         
         # 生成Token
         access_token_expires = timedelta(minutes=60 * 24 * 7)  # 7天
-        access_token = create_access_token(
-            data={"sub": user.id},
+        access_token = create_user_token(
+            user,
             expires_delta=access_token_expires
         )
         
@@ -94,12 +143,17 @@ async def register(user_data: UserRegisterRequest):
                 "user_type": user.user_type,
                 "name": user.name,
                 "avatar_url": user.avatar_url,
-                "created_at": user.created_at.isoformat() if user.created_at else None
+                "created_at": _format_datetime(user.created_at)
             }
         }
         
     except HTTPException as e:
         raise e
+    except PasswordHasherBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -107,10 +161,88 @@ async def register(user_data: UserRegisterRequest):
         )
 
 
+@router.post("/bulk-register", response_model=BulkRegisterResponse)
+async def bulk_register(
+    request: BulkRegisterRequest,
+    current_user: User = Depends(get_current_user)
+):
+    """
+    批量注册学生账号
+    
+    家长/老师一次性为多名学生创建账号，新账号与当前用户共享family_id
+    """
+    if current_user.user_type != "parent":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="只有家长账号可以批量注册"
+        )
+    
+    if not request.accounts:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="账号列表不能为空"
+        )
+    
+    if len(request.accounts) > MAX_BULK_ACCOUNTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"单次最多注册{MAX_BULK_ACCOUNTS}个账号"
+        )
+    
+    try:
+        # 当前用户还没有家庭ID时为其分配一个
+        family_id = await ensure_family_id(current_user.id)
+        
+        # 逐行校验，合法的账号一起提交
+        results = [None] * len(request.accounts)
+        valid_indexes = []
+        for i, account in enumerate(request.accounts):
+            error = None
+            if account.user_type not in ["parent", "student"]:
+                error = "用户类型必须为 'parent' 或 'student'"
+            elif len(account.password) < 6:
+                error = "密码长度至少6位"
+            
+            if error:
+                results[i] = {"index": i, "email": account.email, "success": False, "error": error}
+            else:
+                valid_indexes.append(i)
+        
+        created = await create_users_bulk(
+            [request.accounts[i].model_dump() for i in valid_indexes],
+            family_id=family_id
+        )
+        for i, result in zip(valid_indexes, created):
+            results[i] = {"index": i, **result}
+        
+        created_count = sum(1 for r in results if r["success"])
+        
+        return {
+            "family_id": family_id,
+            "created_count": created_count,
+            "failed_count": len(results) - created_count,
+            "results": results
+        }
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"批量注册失败: {str(e)}"
+        )
+
+
 @router.post("/login", response_model=TokenResponse)
 async def login(credentials: UserLoginRequest):
     """用户登录"""
-    user = authenticate_user(credentials.email, credentials.password)
+    try:
+        user = await authenticate_user(credentials.email, credentials.password)
+    except PasswordHasherBusyError as e:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(e)
+        )
     
     if not user:
         raise HTTPException(
@@ -127,12 +259,12 @@ async def login(credentials: UserLoginRequest):
         )
     
     # 更新最后登录时间
-    update_user_login_time(user.id)
+    await update_user_login_time(user.id)
     
     # 生成Token
     access_token_expires = timedelta(minutes=60 * 24 * 7)  # 7天
-    access_token = create_access_token(
-        data={"sub": user.id},
+    access_token = create_user_token(
+        user,
         expires_delta=access_token_expires
     )
     
@@ -145,11 +277,25 @@ async def login(credentials: UserLoginRequest):
             "user_type": user.user_type,
             "name": user.name,
             "avatar_url": user.avatar_url,
-            "created_at": user.created_at.isoformat() if user.created_at else None
+            "created_at": _format_datetime(user.created_at)
         }
     }
 
 
+@router.post("/logout")
+async def logout(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: User = Depends(get_current_user)
+):
+    """用户注销（吊销当前令牌）"""
+    await revoke_token(credentials.credentials)
+    
+    return {
+        "success": True,
+        "message": "已退出登录"
+    }
+
+
 @router.get("/me", response_model=UserResponse)
 async def get_current_user_info(current_user: User = Depends(get_current_user)):
     """获取当前用户信息"""
@@ -159,5 +305,5 @@ async def get_current_user_info(current_user: User = Depends(get_current_user)):
         "user_type": current_user.user_type,
         "name": current_user.name,
         "avatar_url": current_user.avatar_url,
-        "created_at": current_user.created_at.isoformat() if current_user.created_at else None
+        "created_at": _format_datetime(current_user.created_at)
     }
@@ -4,46 +4,36 @@
 提供用户注册、登录、JWT Token生成和验证
 """
 
-from datetime import datetime, timedelta
-from typing import Optional
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+from uuid import uuid4
 
 from fastapi import HTTPException, status, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from supabase import create_client, Client
 
 from config import settings
 from database import User
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from services.data_loader import get_loaders
+from services.password_hasher import password_hasher
+from services.repository import repository
+from services.token_revocation import revocation_list
+from services.tracing import traced
+from services.user_cache import user_cache
 
 # JWT配置
 SECRET_KEY = settings.app.secret_key
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 * 7  # 7天
 
-# Supabase客户端
-supabase: Client = create_client(
-    settings.supabase.url,
-    settings.supabase.service_key
-)
+# claims模式下令牌携带的用户字段
+TOKEN_USER_CLAIMS = ("email", "user_type", "name", "is_active", "avatar_url", "family_id")
 
 # HTTP Bearer Token安全依赖
 security = HTTPBearer()
 
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """验证密码"""
-    return pwd_context.verify(plain_password, hashed_password)
-
-
-def get_password_hash(password: str) -> str:
-    """生成密码哈希"""
-    return pwd_context.hash(password)
-
-
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """创建JWT访问令牌"""
     to_encode = data.copy()
@@ -53,12 +43,29 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.utcnow()})
+    to_encode.setdefault("jti", uuid4().hex)
     
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
+def create_user_token(user: User, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    为用户创建访问令牌
+    
+    claims模式下令牌携带用户基本信息，get_current_user无需查询数据库
+    """
+    data = {"sub": user.id}
+    
+    if settings.auth.token_mode == "claims":
+        for field in TOKEN_USER_CLAIMS:
+            data[field] = getattr(user, field)
+        data["is_active"] = data["is_active"] is not False
+    
+    return create_access_token(data, expires_delta)
+
+
 def decode_token(token: str) -> dict:
     """解码JWT令牌"""
     try:
@@ -72,6 +79,7 @@ def decode_token(token: str) -> dict:
         )
 
 
+@traced("auth.get_current_user")
 async def get_current_user(
     credentials: HTTPAuthorizationCredentials = Depends(security)
 ) -> User:
@@ -92,55 +100,77 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
     
-    # 从Supabase获取用户
+    # 检查令牌是否已被吊销（注销或用户被禁用）
+    if revocation_list.is_revoked(payload):
+        raise credentials_exception
+    
+    # claims模式令牌直接构建用户，无需查询数据库
+    if "user_type" in payload:
+        user_data = {field: payload.get(field) for field in TOKEN_USER_CLAIMS}
+        user_data["id"] = user_id
+        return _ensure_active(user_data)
+    
+    # 优先从缓存获取用户，未命中时再查询Supabase
     try:
-        response = supabase.table("users").select("*").eq("id", user_id).execute()
-        
-        if not response.data or len(response.data) == 0:
-            raise credentials_exception
-        
-        user_data = response.data[0]
-        
-        # 检查用户是否激活
-        if not user_data.get("is_active", True):
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="用户已被禁用"
-            )
-        
-        return User(**user_data)
-        
-    except Exception as e:
+        user_data = await user_cache.get_or_load(user_id, _load_user_row)
+    except Exception:
+        raise credentials_exception
+    
+    if user_data is None:
         raise credentials_exception
+    
+    return _ensure_active(user_data)
+
+
+def _ensure_active(user_data: dict) -> User:
+    """检查用户是否激活并构建用户对象"""
+    if not user_data.get("is_active", True):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="用户已被禁用"
+        )
+    
+    return User(**user_data)
+
+
+async def _load_user_row(user_id: str) -> Optional[dict]:
+    """从数据库加载用户数据（供用户缓存回源使用，并发回源合并为一次批量查询）"""
+    return await get_loaders().users.load(user_id)
+
+
+def invalidate_user_cache(user_id: str):
+    """使用户缓存失效（用户资料变更后调用）"""
+    user_cache.invalidate(user_id)
+    get_loaders().users.clear(user_id)
 
 
 async def get_current_user_from_email(email: str) -> Optional[User]:
     """根据邮箱获取用户"""
     try:
-        response = supabase.table("users").select("*").eq("email", email).execute()
+        user_data = await repository.get_user_by_email(email)
         
-        if response.data and len(response.data) > 0:
-            return User(**response.data[0])
+        if user_data:
+            return User(**user_data)
         return None
         
     except Exception:
         return None
 
 
-def create_user(email: str, password: str, user_type: str, name: str) -> User:
+async def create_user(email: str, password: str, user_type: str, name: str) -> User:
     """创建新用户"""
     # 检查邮箱是否已存在
-    existing = supabase.table("users").select("id").eq("email", email).execute()
-    if existing.data and len(existing.data) > 0:
+    existing = await repository.find_existing_emails([email])
+    if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="该邮箱已被注册"
         )
     
-    # 创建用户
+    # 创建用户（邮箱统一保存为小写）
     user_data = {
-        "email": email,
-        "password_hash": get_password_hash(password),
+        "email": email.lower(),
+        "password_hash": await password_hasher.hash(password),
         "user_type": user_type,
         "name": name,
         "is_active": True,
@@ -148,32 +178,205 @@ def create_user(email: str, password: str, user_type: str, name: str) -> User:
         "updated_at": datetime.utcnow().isoformat()
     }
     
-    response = supabase.table("users").insert(user_data).execute()
+    created = await repository.insert_users([user_data])
     
-    if not response.data or len(response.data) == 0:
+    if not created:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="用户创建失败"
         )
     
-    return User(**response.data[0])
+    return User(**created[0])
 
 
-def authenticate_user(email: str, password: str) -> Optional[User]:
+async def create_users_bulk(accounts: List[Dict], family_id: Optional[str] = None) -> List[Dict]:
+    """
+    批量创建用户
+    
+    一次查询检查全部邮箱，并行计算密码哈希，一次批量写入
+    
+    Args:
+        accounts: 账号列表 [{"email", "password", "user_type", "name"}]
+        family_id: 共享的家庭ID
+    
+    Returns:
+        与accounts一一对应的结果列表 [{"email", "success", "user_id"/"error"}]
+    """
+    results: List[Dict] = [{"email": a["email"], "success": False} for a in accounts]
+    if not accounts:
+        return results
+    
+    # 一次查询检查所有邮箱是否已存在
+    emails = [a["email"] for a in accounts]
+    existing_emails = await repository.find_existing_emails(emails)
+    
+    pending = []
+    seen_emails = set()
+    for i, account in enumerate(accounts):
+        email_key = account["email"].lower()
+        if email_key in existing_emails:
+            results[i]["error"] = "该邮箱已被注册"
+        elif email_key in seen_emails:
+            results[i]["error"] = "邮箱在本次导入中重复"
+        else:
+            seen_emails.add(email_key)
+            pending.append(i)
+    
+    # 并行计算密码哈希
+    hashes = await asyncio.gather(
+        *(password_hasher.hash(accounts[i]["password"]) for i in pending),
+        return_exceptions=True
+    )
+    
+    now = datetime.utcnow().isoformat()
+    rows = []
+    row_indexes = []
+    for i, password_hash in zip(pending, hashes):
+        if isinstance(password_hash, Exception):
+            results[i]["error"] = str(password_hash)
+            continue
+        
+        account = accounts[i]
+        rows.append({
+            "email": account["email"].lower(),
+            "password_hash": password_hash,
+            "user_type": account["user_type"],
+            "name": account["name"],
+            "family_id": family_id,
+            "is_active": True,
+            "created_at": now,
+            "updated_at": now
+        })
+        row_indexes.append(i)
+    
+    if not rows:
+        return results
+    
+    # 一次批量写入
+    inserted = await repository.insert_users(rows)
+    created = {u["email"].lower(): u for u in inserted}
+    
+    for i in row_indexes:
+        user_row = created.get(accounts[i]["email"].lower())
+        if user_row:
+            results[i]["success"] = True
+            results[i]["user_id"] = user_row["id"]
+        else:
+            results[i]["error"] = "用户创建失败"
+    
+    return results
+
+
+async def authenticate_user(email: str, password: str) -> Optional[User]:
     """验证用户登录"""
-    user = get_current_user_from_email(email)
+    user = await get_current_user_from_email(email)
     
     if not user:
         return None
     
-    if not verify_password(password, user.password_hash):
+    verified, new_hash = await password_hasher.verify_and_update(password, user.password_hash)
+    if not verified:
         return None
     
+    # bcrypt计算强度变更后，使用新配置重新哈希
+    if new_hash:
+        await _update_password_hash(user.id, new_hash)
+        user.password_hash = new_hash
+    
     return user
 
 
-def update_user_login_time(user_id: str):
+async def _update_password_hash(user_id: str, password_hash: str):
+    """更新用户密码哈希"""
+    await repository.update_user(user_id, {
+        "password_hash": password_hash
+    })
+    
+    invalidate_user_cache(user_id)
+
+
+async def update_user_login_time(user_id: str):
     """更新用户最后登录时间"""
-    supabase.table("users").update({
+    await repository.update_user(user_id, {
         "last_login_at": datetime.utcnow().isoformat()
-    }).eq("id", user_id).execute()
+    })
+    
+    invalidate_user_cache(user_id)
+
+
+async def update_user_profile(user_id: str, fields: dict) -> Optional[User]:
+    """更新用户资料"""
+    fields = {**fields, "updated_at": datetime.utcnow().isoformat()}
+    
+    user_data = await repository.update_user(user_id, fields)
+    invalidate_user_cache(user_id)
+    
+    if user_data:
+        return User(**user_data)
+    return None
+
+
+async def ensure_family_id(user_id: str) -> str:
+    """
+    获取用户的家庭ID，还没有时分配一个
+
+    以数据库为准（令牌中的用户信息可能是旧的），条件更新保证并发请求只分配一次
+    """
+    user_data = await repository.get_user(user_id)
+    family_id = (user_data or {}).get("family_id")
+    if family_id:
+        return family_id
+
+    family_id = await repository.assign_family_id(user_id, str(uuid4()))
+    invalidate_user_cache(user_id)
+    if not family_id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="用户不存在"
+        )
+    return family_id
+
+
+async def deactivate_user(user_id: str):
+    """禁用用户"""
+    await repository.update_user(user_id, {
+        "is_active": False,
+        "updated_at": datetime.utcnow().isoformat()
+    })
+    
+    invalidate_user_cache(user_id)
+    revocation_list.disable_user(user_id)
+
+
+async def revoke_token(token: str):
+    """注销令牌（写入吊销表，其他进程在下次刷新时同步）"""
+    payload = decode_token(token)
+    jti = payload.get("jti")
+    
+    if not jti:
+        return
+    
+    expires_at = float(payload.get("exp", 0))
+    await repository.insert_token_revocation({
+        "jti": jti,
+        "user_id": payload.get("sub"),
+        "expires_at": datetime.utcfromtimestamp(expires_at).isoformat(),
+        "created_at": datetime.utcnow().isoformat()
+    })
+    
+    revocation_list.revoke_token(jti, expires_at)
+
+
+async def fetch_revocations():
+    """从数据库读取已禁用用户和未过期的已注销令牌"""
+    disabled_users = await repository.list_disabled_user_ids()
+    tokens = await repository.list_token_revocations(datetime.utcnow().isoformat())
+    
+    revoked_tokens = []
+    for t in tokens:
+        expires_at = datetime.fromisoformat(t["expires_at"].replace("Z", "+00:00"))
+        if expires_at.tzinfo is None:
+            expires_at = expires_at.replace(tzinfo=timezone.utc)
+        revoked_tokens.append((t["jti"], expires_at.timestamp()))
+    
+    return disabled_users, revoked_tokens
@@ -69,6 +69,7 @@ class Textbook(Base):
     version = Column(String(50), nullable=True)
     file_type = Column(String(20), nullable=False)  # pdf, word, ppt
     file_path = Column(String(500), nullable=False)
+    file_hash = Column(String(64), nullable=True, index=True)  # 文件内容SHA-256，相同内容的教材共用文件和解析结果
     parse_status = Column(String(20), default="pending")  # pending, processing, completed, failed
     statistics = Column(JSON, nullable=True)  # 知识点统计信息
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -85,6 +86,7 @@ class Textbook(Base):
             "name": self.name,
             "version": self.version,
             "file_type": self.file_type,
+            "file_hash": self.file_hash,
             "parse_status": self.parse_status,
             "statistics": self.statistics,
             "created_at": self.created_at.isoformat() if self.created_at else None,
@@ -234,3 +236,59 @@ class AnswerRecord(Base):
             "time_spent": self.time_spent,
             "answered_at": self.answered_at.isoformat() if self.answered_at else None
         }
+
+
+class TokenRevocation(Base):
+    """令牌吊销表"""
+    __tablename__ = "token_revocations"
+    
+    jti = Column(String(64), primary_key=True)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=True, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)  # 令牌自然过期时间，过期后可清理
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    def to_dict(self):
+        return {
+            "jti": self.jti,
+            "user_id": self.user_id,
+            "expires_at": self.expires_at.isoformat() if self.expires_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None
+        }
+
+
+class ParseJob(Base):
+    """教材解析任务表"""
+    __tablename__ = "parse_jobs"
+    
+    id = Column(String(36), primary_key=True, default=generate_uuid)
+    textbook_id = Column(String(36), ForeignKey("textbooks.id"), nullable=False, index=True)
+    user_id = Column(String(36), ForeignKey("users.id"), nullable=False, index=True)
+    status = Column(String(20), default="queued", index=True)  # queued, running, completed, failed
+    phase = Column(String(20), default="queued")  # queued, parsing, saving, done
+    progress = Column(Integer, default=0)  # 0-100
+    options = Column(JSON, nullable=True)  # 解析参数，如 unit_numbers
+    result = Column(JSON, nullable=True)  # 统计信息和知识点数量
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)  # 被领取执行的次数，同时作为乐观锁版本
+    heartbeat_at = Column(DateTime, nullable=True)  # 执行中的worker定期刷新，超时视为中断
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "textbook_id": self.textbook_id,
+            "user_id": self.user_id,
+            "status": self.status,
+            "phase": self.phase,
+            "progress": self.progress,
+            "options": self.options,
+            "result": self.result,
+            "error": self.error,
+            "attempts": self.attempts,
+            "heartbeat_at": self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None
+        }
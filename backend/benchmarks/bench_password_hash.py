@@ -0,0 +1,83 @@
+"""
+英语学习辅助应用 - 密码哈希性能测试
+
+模拟并发登录，统计指定bcrypt计算强度下每秒可完成的登录校验次数
+
+用法:
+    python benchmarks/bench_password_hash.py --rounds 12 --logins 200 --concurrency 50
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.password_hasher import PasswordHasher, build_crypt_context
+
+
+async def run_benchmark(rounds: int, logins: int, concurrency: int, workers: int):
+    """并发执行登录校验并输出统计结果"""
+    context = build_crypt_context(rounds)
+    hasher = PasswordHasher(context, max_workers=workers, max_pending=max(logins, concurrency))
+
+    password = "benchmark-password"
+    hashed = context.hash(password)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    # 事件循环延迟探针：哈希计算阻塞事件循环时会明显增大
+    loop_lag = []
+    stop = asyncio.Event()
+
+    async def probe():
+        while not stop.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(0.01)
+            loop_lag.append(time.perf_counter() - started - 0.01)
+
+    async def login():
+        async with semaphore:
+            started = time.perf_counter()
+            ok = await hasher.verify(password, hashed)
+            latencies.append(time.perf_counter() - started)
+            assert ok
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(logins)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await probe_task
+    hasher.shutdown()
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+
+    print(f"bcrypt rounds:      {rounds}")
+    print(f"hash workers:       {workers}")
+    print(f"logins:             {logins} (concurrency {concurrency})")
+    print(f"elapsed:            {elapsed:.2f}s")
+    print(f"logins/sec:         {logins / elapsed:.1f}")
+    print(f"latency p50/p95:    {p50 * 1000:.1f}ms / {p95 * 1000:.1f}ms")
+    print(f"max event-loop lag: {max(loop_lag or [0]) * 1000:.1f}ms")
+    print(f"max queue depth:    {hasher.max_queue_depth}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="密码哈希性能测试")
+    parser.add_argument("--rounds", type=int, default=12, help="bcrypt计算强度")
+    parser.add_argument("--logins", type=int, default=100, help="登录校验总次数")
+    parser.add_argument("--concurrency", type=int, default=20, help="并发登录数")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="哈希线程数")
+    args = parser.parse_args()
+
+    asyncio.run(run_benchmark(args.rounds, args.logins, args.concurrency, args.workers))
+
+
+if __name__ == "__main__":
+    main()
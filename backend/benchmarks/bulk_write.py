@@ -0,0 +1,151 @@
+"""
+英语学习辅助应用 - 知识点批量写入基准
+
+对比逐条insert（原实现）和 BulkWriter 在不同批大小、并发批次数下的写入速度（行/秒）。
+PostgREST使用standins.py的内存版，可模拟每次请求的网络往返延迟；
+sql后端使用临时SQLite文件。
+
+用法:
+    python benchmarks/bulk_write.py
+    python benchmarks/bulk_write.py --rows 5000 --latency-ms 10 --chunk-sizes 200,500,1000 --concurrency 1,4,8
+    python benchmarks/bulk_write.py --storage sql
+"""
+
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from config import StorageConfig
+from load_test import _free_port, _wait_until_ready
+from services.bulk_writer import BulkWriter
+from services.repository import SupabaseRepository
+
+
+def build_rows(textbook_id: str, count: int, units: int = 20):
+    unit_rows = [
+        {"id": str(uuid.uuid4()), "textbook_id": textbook_id, "unit_number": i + 1, "title": f"Unit {i + 1}"}
+        for i in range(units)
+    ]
+    point_rows = [{
+        "id": str(uuid.uuid4()),
+        "unit_id": unit_rows[i % units]["id"],
+        "point_type": "vocabulary",
+        "content": f"word{i}",
+        "phonetic": f"/word{i}/",
+        "part_of_speech": "noun",
+        "chinese_meaning": f"释义{i}",
+        "collocations": [f"word{i} phrase"],
+        "examples": [f"This is word{i}."]
+    } for i in range(count)]
+    return unit_rows, point_rows
+
+
+async def create_textbook(repository) -> str:
+    user_id = str(uuid.uuid4())
+    await repository.insert_users([{
+        "id": user_id, "email": f"{user_id}@example.com", "password_hash": "x", "user_type": "parent", "name": "bench"
+    }])
+    textbook = await repository.insert_textbook({
+        "id": str(uuid.uuid4()), "user_id": user_id, "name": "bench", "file_type": "md", "file_path": "bench.md"
+    })
+    return textbook["id"]
+
+
+async def per_row(repository, rows: int) -> Dict:
+    unit_rows, point_rows = build_rows(await create_textbook(repository), rows)
+    started = time.perf_counter()
+    for unit in unit_rows:
+        await repository.insert_unit(unit)
+    for row in point_rows:
+        await repository.insert_knowledge_point(row)
+    elapsed = time.perf_counter() - started
+    return {"case": "per-row", "rows": rows, "seconds": elapsed, "rows_per_second": rows / elapsed}
+
+
+async def bulk(repository, rows: int, chunk_size: int, concurrency: int) -> Dict:
+    unit_rows, point_rows = build_rows(await create_textbook(repository), rows)
+    config = StorageConfig(bulk_chunk_size=chunk_size, bulk_concurrency=concurrency)
+    async with BulkWriter(repository, config) as writer:
+        await writer.write_units(unit_rows)
+        for row in point_rows:
+            await writer.add(row)
+    report = writer.report()
+    return {
+        "case": f"bulk {chunk_size}x{1 if report['transactional'] else concurrency}",
+        "rows": report["rows"],
+        "seconds": report["seconds"],
+        "rows_per_second": report["rows_per_second"]
+    }
+
+
+async def run(args, repository) -> List[Dict]:
+    results = [await per_row(repository, args.baseline_rows)]
+    # sql后端在单个事务中顺序写入，并发批次数不起作用
+    levels = args.concurrency if isinstance(repository, SupabaseRepository) else [1]
+    for chunk_size in args.chunk_sizes:
+        for concurrency in levels:
+            results.append(await bulk(repository, args.rows, chunk_size, concurrency))
+    await repository.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识点批量写入基准")
+    parser.add_argument("--storage", choices=["supabase", "sql"], default="supabase",
+                        help="存储后端（supabase即内存版PostgREST）")
+    parser.add_argument("--rows", type=int, default=3000, help="批量写入的知识点数")
+    parser.add_argument("--baseline-rows", type=int, default=300, help="逐条写入的知识点数（较慢，默认少写一些）")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="PostgREST每次请求的模拟延迟（毫秒）")
+    parser.add_argument("--chunk-sizes", type=lambda s: [int(x) for x in s.split(",")], default=[100, 500, 1000],
+                        help="批大小，逗号分隔")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 4],
+                        help="同时写入的批次数，逗号分隔")
+    args = parser.parse_args()
+
+    process = None
+    try:
+        if args.storage == "sql":
+            from services.sql_repository import SQLRepository
+            path = os.path.join(tempfile.mkdtemp(prefix="bulk-bench-"), "bench.db")
+            repository = SQLRepository(f"sqlite+aiosqlite:///{path}")
+        else:
+            from postgrest import AsyncPostgrestClient
+
+            port = _free_port()
+            process = subprocess.Popen([
+                sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "standins.py"),
+                "--postgrest-port", str(port), "--llm-port", str(_free_port()),
+                "--postgrest-latency-ms", str(args.latency_ms),
+            ])
+            _wait_until_ready(f"http://127.0.0.1:{port}/rest/v1/users", process)
+            repository = SupabaseRepository(AsyncPostgrestClient(f"http://127.0.0.1:{port}/rest/v1"))
+
+        results = asyncio.run(run(args, repository))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    latency = f", {args.latency_ms:g} ms per request" if args.storage == "supabase" else ""
+    print(f"\nstorage {args.storage}{latency}\n")
+    print(f"{'case':<16} {'rows':>7} {'seconds':>9} {'rows/s':>10} {'speedup':>8}")
+    print("-" * 54)
+    baseline = results[0]["rows_per_second"]
+    for row in results:
+        print(f"{row['case']:<16} {row['rows']:>7} {row['seconds']:>9.3f} {row['rows_per_second']:>10.1f} "
+              f"{row['rows_per_second'] / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+英语学习辅助应用 - 启动导入耗时检查
+
+在干净的子进程中以 -X importtime 导入 main，输出总耗时和最慢的模块，
+超出预算或导入了应按需加载的重量级依赖时以非零状态码退出，可直接用于CI。
+
+用法:
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --budget-ms 800 --top 20
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from typing import Dict, List, Tuple
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 仅在首次使用时导入的依赖
+LAZY_MODULES = ("openai", "docx", "fitz")
+
+
+def measure(module: str = "main") -> Tuple[List[Tuple[str, int, int]], int]:
+    """
+    导入指定模块，返回 ([(模块名, 自身耗时us, 累计耗时us)], 总耗时us)
+    """
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    env.setdefault("SECRET_KEY", "import-time")
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"导入 {module} 失败:\n{result.stderr[-2000:]}")
+
+    rows = []
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # 名称前的缩进表示嵌套层级，顶层模块只有一个空格
+        name = name.rstrip()[1:]
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+        if name == module:
+            total = int(cumulative_us)
+    return rows, total
+
+
+def top_level_packages(rows: List[Tuple[str, int, int]]) -> Dict[str, int]:
+    """按顶层包汇总自身耗时"""
+    packages: Dict[str, int] = {}
+    for name, self_us, _ in rows:
+        package = name.split(".", 1)[0]
+        packages[package] = packages.get(package, 0) + self_us
+    return packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查导入main的耗时预算")
+    parser.add_argument("--module", default="main", help="要导入的模块")
+    parser.add_argument("--budget-ms", type=float, default=1500.0, help="导入耗时预算（毫秒）")
+    parser.add_argument("--runs", type=int, default=3, help="测量次数，取最小值")
+    parser.add_argument("--top", type=int, default=15, help="列出最慢的顶层包数量")
+    args = parser.parse_args()
+
+    measurements = [measure(args.module) for _ in range(args.runs)]
+    rows, total = min(measurements, key=lambda m: m[1])
+
+    print(f"import {args.module}: {total / 1000:.1f} ms (预算 {args.budget_ms:.0f} ms，{args.runs}次取最小)\n")
+    print(f"{'package':<32} {'self ms':>10}")
+    print("-" * 43)
+    packages = sorted(top_level_packages(rows).items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in packages[:args.top]:
+        print(f"{package:<32} {self_us / 1000:>10.1f}")
+
+    failures = []
+    imported = {name.split(".", 1)[0] for name, _, _ in rows}
+    for module in LAZY_MODULES:
+        if module in imported:
+            failures.append(f"启动时导入了应按需加载的模块: {module}")
+    if total / 1000 > args.budget_ms:
+        failures.append(f"导入耗时 {total / 1000:.1f} ms 超出预算 {args.budget_ms:.0f} ms")
+
+    if failures:
+        print()
+        for failure in failures:
+            print(f"❌ {failure}")
+        sys.exit(1)
+    print("\n✅ 导入耗时在预算内")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+英语学习辅助应用 - 端到端压测
+
+在本地启动内存版PostgREST和假大模型（见standins.py），以子进程方式运行 main:app，
+按以下场景施压并输出各路由的 p50/p95/p99 延迟和吞吐：
+
+- login:  登录风暴，所有虚拟用户并发反复登录
+- parse:  上传教材并提交解析任务，轮询任务至完成后查看教材详情和知识点
+- test:   生成测试并提交答案
+- chat:   基于教材的对话问答
+
+用法:
+    python benchmarks/load_test.py --users 20 --concurrency 20
+    python benchmarks/load_test.py --scenarios login --users 50 --logins-per-user 10 --bcrypt-rounds 10
+    python benchmarks/load_test.py --json results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import string
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import httpx
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCENARIOS = ("login", "parse", "test", "chat")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _random_word(length: int = 7) -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=length))
+
+
+def build_textbook(units: int, words_per_unit: int) -> str:
+    """生成Markdown格式的教材内容"""
+    lines = []
+    for unit in range(1, units + 1):
+        lines.append(f"# Unit {unit}")
+        for _ in range(words_per_unit):
+            word = _random_word()
+            lines.append(f"**{word}** /{word}/ *n.* 释义{word}")
+        lines.append(f"- look after {_random_word()}")
+        lines.append("")
+    return "\n".join(lines)
+
+
+class Stats:
+    """按路由统计延迟"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.first_started: Dict[str, float] = {}
+        self.last_finished: Dict[str, float] = {}
+
+    def record(self, route: str, started: float, finished: float, ok: bool):
+        self.latencies[route].append(finished - started)
+        if not ok:
+            self.errors[route] += 1
+        self.first_started[route] = min(self.first_started.get(route, started), started)
+        self.last_finished[route] = max(self.last_finished.get(route, finished), finished)
+
+    @staticmethod
+    def _percentile(values: List[float], percent: float) -> float:
+        index = max(0, min(len(values) - 1, int(round(percent / 100 * len(values))) - 1))
+        return values[index]
+
+    def summary(self) -> List[Dict]:
+        rows = []
+        for route, values in self.latencies.items():
+            values = sorted(values)
+            elapsed = max(self.last_finished[route] - self.first_started[route], 1e-9)
+            rows.append({
+                "route": route,
+                "requests": len(values),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(values) / elapsed, 2),
+                "p50_ms": round(self._percentile(values, 50) * 1000, 1),
+                "p95_ms": round(self._percentile(values, 95) * 1000, 1),
+                "p99_ms": round(self._percentile(values, 99) * 1000, 1),
+                "max_ms": round(values[-1] * 1000, 1)
+            })
+        return rows
+
+    def print_table(self):
+        header = f"{'route':<40} {'reqs':>6} {'errs':>5} {'rps':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'maxms':>8}"
+        print(header)
+        print("-" * len(header))
+        for row in self.summary():
+            print(f"{row['route']:<40} {row['requests']:>6} {row['errors']:>5} {row['rps']:>8} "
+                  f"{row['p50_ms']:>8} {row['p95_ms']:>8} {row['p99_ms']:>8} {row['max_ms']:>8}")
+
+
+class VirtualUser:
+    """一个压测用户的会话状态"""
+
+    def __init__(self, index: int, run_id: str):
+        self.email = f"bench-{run_id}-{index}@example.com"
+        self.password = "bench-password"
+        self.token: Optional[str] = None
+        self.textbook_id: Optional[str] = None
+        self.test: Optional[Dict] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {"Authorization": f"Bearer {self.token}"} if self.token else {}
+
+
+class LoadTest:
+    """压测场景执行器"""
+
+    def __init__(self, client: httpx.AsyncClient, args):
+        self.client = client
+        self.args = args
+        self.stats = Stats()
+        self.semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def request(self, route: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        async with self.semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                self.stats.record(route, started, time.perf_counter(), False)
+                print(f"⚠️ {route}: {e!r}")
+                return None
+            self.stats.record(route, started, time.perf_counter(), response.status_code < 400)
+            if response.status_code >= 400 and self.args.verbose:
+                print(f"⚠️ {route}: {response.status_code} {response.text[:200]}")
+            return response
+
+    async def register(self, user: VirtualUser):
+        response = await self.request("POST /api/auth/register", "POST", "/api/auth/register", json={
+            "email": user.email, "password": user.password, "user_type": "parent", "name": user.email
+        })
+        if response is not None and response.status_code == 200:
+            user.token = response.json()["access_token"]
+
+    async def login(self, user: VirtualUser):
+        response = await self.request("POST /api/auth/login", "POST", "/api/auth/login", json={
+            "email": user.email, "password": user.password
+        })
+        if response is not None and response.status_code == 200:
+            user.token = response.json()["access_token"]
+
+    async def upload_and_parse(self, user: VirtualUser):
+        content = build_textbook(self.args.units, self.args.words_per_unit).encode("utf-8")
+        response = await self.request(
+            "POST /api/textbooks/upload", "POST", "/api/textbooks/upload", headers=user.headers,
+            files={"file": ("bench.md", content, "text/markdown")}, data={"name": "bench textbook"}
+        )
+        if response is None or response.status_code != 200:
+            return
+        user.textbook_id = response.json()["textbook"]["id"]
+
+        response = await self.request("POST /api/textbooks/{id}/parse", "POST",
+                                      f"/api/textbooks/{user.textbook_id}/parse", headers=user.headers, json={})
+        if response is None or response.status_code != 202:
+            return
+        if not await self.wait_for_job(user, response.json()["status_url"]):
+            return
+
+        await self.request("GET /api/textbooks/{id}", "GET", f"/api/textbooks/{user.textbook_id}",
+                           headers=user.headers)
+        await self.request("GET /api/textbooks/{id}/knowledge", "GET",
+                           f"/api/textbooks/{user.textbook_id}/knowledge", headers=user.headers,
+                           params={"page": 1, "page_size": 50})
+
+    async def wait_for_job(self, user: VirtualUser, status_url: str) -> bool:
+        """轮询解析任务直到结束，记录从提交到完成的总耗时"""
+        started = time.perf_counter()
+        deadline = started + self.args.timeout
+        while time.perf_counter() < deadline:
+            response = await self.request("GET /api/textbooks/jobs/{id}", "GET", status_url, headers=user.headers)
+            if response is None or response.status_code != 200:
+                break
+            job_status = response.json()["status"]
+            if job_status in ("completed", "failed"):
+                self.stats.record("parse job (submit→done)", started, time.perf_counter(), job_status == "completed")
+                return job_status == "completed"
+            await asyncio.sleep(0.2)
+        self.stats.record("parse job (submit→done)", started, time.perf_counter(), False)
+        return False
+
+    async def generate_and_submit(self, user: VirtualUser):
+        if not user.textbook_id:
+            return
+        response = await self.request("POST /api/tests/generate", "POST", "/api/tests/generate",
+                                      headers=user.headers,
+                                      json={"textbook_id": user.textbook_id, "question_count": 10})
+        if response is None or response.status_code != 200:
+            return
+
+        test = response.json()
+        answers = [
+            {"question_id": q["id"], "answer": random.choice(["A", "B", "C", "D"]), "time_spent": 5}
+            for q in test.get("questions", [])
+        ]
+        await self.request("POST /api/tests/{id}/submit", "POST", f"/api/tests/{test['test_id']}/submit",
+                           headers=user.headers, json={"answers": answers})
+
+    async def chat(self, user: VirtualUser):
+        for _ in range(self.args.chats_per_user):
+            await self.request("POST /api/chat/chat", "POST", "/api/chat/chat", headers=user.headers, json={
+                "message": "How do I use these words in a sentence?",
+                "textbook_id": user.textbook_id
+            })
+
+    async def phase(self, name: str, users: List[VirtualUser], step):
+        started = time.perf_counter()
+        await asyncio.gather(*(step(user) for user in users))
+        print(f"✅ {name}: {time.perf_counter() - started:.2f}s")
+
+    async def run(self, scenarios: List[str]):
+        run_id = f"{int(time.time())}{random.randint(0, 9999)}"
+        users = [VirtualUser(i, run_id) for i in range(self.args.users)]
+
+        await self.phase("register", users, self.register)
+
+        if "login" in scenarios:
+            async def login_storm(user):
+                await asyncio.gather(*(self.login(user) for _ in range(self.args.logins_per_user)))
+            await self.phase("login", users, login_storm)
+
+        if {"parse", "test", "chat"} & set(scenarios):
+            await self.phase("parse", users, self.upload_and_parse)
+        if "test" in scenarios:
+            await self.phase("test", users, self.generate_and_submit)
+        if "chat" in scenarios:
+            await self.phase("chat", users, self.chat)
+
+
+def _wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"进程提前退出: {' '.join(process.args)}")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"等待服务就绪超时: {url}")
+
+
+def start_services(args) -> (List[subprocess.Popen], str):
+    """启动替身服务和被测应用，返回子进程列表和应用地址"""
+    postgrest_port, llm_port, app_port = _free_port(), _free_port(), _free_port()
+    processes = []
+
+    standins = subprocess.Popen([
+        sys.executable, os.path.join(BACKEND_DIR, "benchmarks", "standins.py"),
+        "--postgrest-port", str(postgrest_port),
+        "--llm-port", str(llm_port),
+        "--llm-latency-ms", str(args.llm_latency_ms),
+        "--llm-tokens-per-sec", str(args.llm_tokens_per_sec),
+        "--postgrest-max-rows", str(getattr(args, "postgrest_max_rows", 0)),
+    ])
+    processes.append(standins)
+    _wait_until_ready(f"http://127.0.0.1:{postgrest_port}/rest/v1/users", standins)
+
+    env = {
+        **os.environ,
+        "SUPABASE_URL": f"http://127.0.0.1:{postgrest_port}",
+        "SUPABASE_ANON_KEY": "bench",
+        "SUPABASE_SERVICE_KEY": "bench",
+        "DASHSCOPE_API_KEY": "bench",
+        "DASHSCOPE_BASE_URL": f"http://127.0.0.1:{llm_port}/v1",
+        "SECRET_KEY": "bench-secret",
+        "BCRYPT_ROUNDS": str(args.bcrypt_rounds),
+        "STORAGE_BACKEND": args.storage,
+    }
+    if args.storage == "sql":
+        env.setdefault("DATABASE_URL", f"sqlite+aiosqlite:///{os.path.join(BACKEND_DIR, 'data', 'bench.db')}")
+
+    app = subprocess.Popen([
+        sys.executable, "-m", "uvicorn", "main:app",
+        "--host", "127.0.0.1", "--port", str(app_port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ], cwd=BACKEND_DIR, env=env)
+    processes.append(app)
+
+    app_url = f"http://127.0.0.1:{app_port}"
+    _wait_until_ready(f"{app_url}/health", app)
+    return processes, app_url
+
+
+def stop_services(processes: List[subprocess.Popen]):
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+async def run_load_test(args, app_url: str) -> Stats:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=app_url, limits=limits, timeout=args.timeout) as client:
+        load_test = LoadTest(client, args)
+        started = time.perf_counter()
+        await load_test.run(args.scenarios)
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in load_test.stats.latencies.values())
+    print()
+    load_test.stats.print_table()
+    print(f"\ntotal: {total} requests in {elapsed:.2f}s ({total / elapsed:.1f} req/s)")
+    return load_test.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="端到端压测（本地替身，无需Supabase和百炼）")
+    parser.add_argument("--scenarios", type=lambda s: [x.strip() for x in s.split(",") if x.strip()],
+                        default=list(SCENARIOS), help=f"压测场景，逗号分隔: {','.join(SCENARIOS)}")
+    parser.add_argument("--users", type=int, default=20, help="虚拟用户数")
+    parser.add_argument("--concurrency", type=int, default=20, help="最大并发请求数")
+    parser.add_argument("--logins-per-user", type=int, default=5, help="登录风暴中每个用户的登录次数")
+    parser.add_argument("--chats-per-user", type=int, default=3, help="每个用户的对话次数")
+    parser.add_argument("--units", type=int, default=5, help="教材单元数")
+    parser.add_argument("--words-per-unit", type=int, default=20, help="每单元词汇数")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="假大模型首包延迟（毫秒）")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=200.0, help="假大模型输出速率")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="bcrypt计算强度")
+    parser.add_argument("--storage", choices=["supabase", "sql"], default="supabase",
+                        help="被测应用的存储后端（supabase即内存版PostgREST）")
+    parser.add_argument("--workers", type=int, default=1, help="被测应用的uvicorn worker数")
+    parser.add_argument("--timeout", type=float, default=60.0, help="单个请求超时（秒）")
+    parser.add_argument("--app-url", default=None, help="压测已启动的应用，不再启动本地替身")
+    parser.add_argument("--json", default=None, help="将统计结果写入JSON文件")
+    parser.add_argument("--verbose", action="store_true", help="打印失败请求")
+    args = parser.parse_args()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"未知场景: {', '.join(sorted(unknown))}")
+
+    processes = []
+    try:
+        if args.app_url:
+            app_url = args.app_url
+        else:
+            processes, app_url = start_services(args)
+        stats = asyncio.run(run_load_test(args, app_url))
+    finally:
+        stop_services(processes)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": {k: v for k, v in vars(args).items()}, "routes": stats.summary()}, f,
+                      ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+英语学习辅助应用 - 解析结果缓存
+
+对比解析一本大教材与从缓存还原解析结果的耗时，以及缓存文件与 parse_and_save 输出的JSON文件大小。
+
+用法:
+    python benchmarks/parse_cache.py
+    python benchmarks/parse_cache.py --units 40 --words-per-unit 1000
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+from config import ParseJobsConfig
+from load_test import build_textbook
+from services.document_parser import DocumentParser
+from services.parse_cache import ParseCache
+from services.uploads import hash_file
+
+
+async def run(args):
+    workdir = tempfile.mkdtemp(prefix="parse-cache-bench-")
+    path = os.path.join(workdir, "textbook.md")
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(build_textbook(args.units, args.words_per_unit))
+
+    cache = ParseCache(ParseJobsConfig(cache_dir=os.path.join(workdir, "cache"), cache_max_mb=512))
+    file_hash = hash_file(path)
+
+    started = time.perf_counter()
+    result = DocumentParser.parse(path)
+    parse_s = time.perf_counter() - started
+    assert result["success"]
+    with open(os.path.join(workdir, "result.json"), "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+    started = time.perf_counter()
+    await cache.put(file_hash, path, result)
+    put_s = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        cached = await cache.get(file_hash, path)
+    get_s = (time.perf_counter() - started) / args.repeat
+
+    assert len(cached["knowledge_points"]) == len(result["knowledge_points"])
+    json_kb = os.path.getsize(os.path.join(workdir, "result.json")) / 1024
+    cache_kb = sum(entry.stat().st_size for entry in os.scandir(cache.directory)) / 1024
+
+    print(f"\n{len(result['knowledge_points'])} knowledge points\n")
+    print(f"parse:       {parse_s * 1000:>9.1f} ms")
+    print(f"cache put:   {put_s * 1000:>9.1f} ms")
+    print(f"cache get:   {get_s * 1000:>9.1f} ms  ({parse_s / get_s:.1f}x faster than parsing)")
+    print(f"json output: {json_kb:>9.1f} KB (parse_and_save format)")
+    print(f"cache file:  {cache_kb:>9.1f} KB ({json_kb / cache_kb:.1f}x smaller)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="解析结果缓存")
+    parser.add_argument("--units", type=int, default=20, help="教材单元数")
+    parser.add_argument("--words-per-unit", type=int, default=1000, help="每单元词汇数")
+    parser.add_argument("--repeat", type=int, default=5, help="缓存读取次数（取平均）")
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
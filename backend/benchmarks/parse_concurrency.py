@@ -0,0 +1,134 @@
+"""
+英语学习辅助应用 - 并发解析对接口延迟的影响
+
+同时解析K本大教材，期间持续请求一个轻量接口（与解析共用同一事件循环），
+对比线程池解析（pool_workers=0）和进程池解析下该接口的延迟，以及解析吞吐。
+
+用法:
+    python benchmarks/parse_concurrency.py
+    python benchmarks/parse_concurrency.py --pool-workers 0,2,4 --concurrency 1,2,4,8 --words-per-unit 2000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import httpx
+from fastapi import FastAPI
+
+from config import ParseJobsConfig
+from load_test import build_textbook
+from services.parse_pool import ParsePool
+
+
+def build_probe_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"status": "ok"}
+
+    return app
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+
+async def measure(pool: ParsePool, client: httpx.AsyncClient, paths: List[str], interval: float) -> Dict:
+    """
+    并发解析paths，同时每隔interval秒请求一次/ping
+
+    延迟从计划发出请求的时刻算起，包含事件循环被占用导致的调度延迟
+    """
+    latencies: List[float] = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            scheduled = time.perf_counter() + interval
+            await asyncio.sleep(interval)
+            await client.get("/ping")
+            latencies.append(time.perf_counter() - scheduled)
+
+    probe_task = asyncio.create_task(probe())
+    started = time.perf_counter()
+    results = await asyncio.gather(*(pool.parse(path) for path in paths))
+    elapsed = time.perf_counter() - started
+    done.set()
+    await probe_task
+
+    assert all(r["success"] for r in results)
+    return {
+        "elapsed_s": elapsed,
+        "parses_per_s": len(paths) / elapsed if paths else 0.0,
+        "probes": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": _percentile(latencies, 99) * 1000,
+        "max_ms": max(latencies) * 1000
+    }
+
+
+async def run(args) -> List[Dict]:
+    workdir = tempfile.mkdtemp(prefix="parse-bench-")
+    paths = []
+    for i in range(max(args.concurrency)):
+        path = os.path.join(workdir, f"textbook-{i}.md")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(build_textbook(args.units, args.words_per_unit))
+        paths.append(path)
+
+    transport = httpx.ASGITransport(app=build_probe_app())
+    rows = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for workers in args.pool_workers:
+            pool = ParsePool(ParseJobsConfig(pool_workers=workers, timeout_seconds=args.timeout))
+            await pool.warmup()
+            # 预热解析代码路径
+            await pool.parse(paths[0])
+            try:
+                for concurrency in args.concurrency:
+                    result = await measure(pool, client, paths[:concurrency], args.probe_interval_ms / 1000)
+                    rows.append({"pool_workers": workers, "concurrency": concurrency, **result})
+            finally:
+                pool.shutdown()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发解析对接口延迟的影响")
+    parser.add_argument("--pool-workers", type=lambda s: [int(x) for x in s.split(",")], default=[0, 2, 4],
+                        help="对比的解析子进程数，0表示线程池解析，逗号分隔")
+    parser.add_argument("--concurrency", type=lambda s: [int(x) for x in s.split(",")], default=[1, 2, 4, 8],
+                        help="同时解析的教材数，逗号分隔")
+    parser.add_argument("--units", type=int, default=20, help="每本教材的单元数")
+    parser.add_argument("--words-per-unit", type=int, default=1000, help="每单元词汇数")
+    parser.add_argument("--probe-interval-ms", type=float, default=10.0, help="轻量接口的请求间隔（毫秒）")
+    parser.add_argument("--timeout", type=float, default=300.0, help="单个文档的解析超时（秒）")
+    args = parser.parse_args()
+
+    rows = asyncio.run(run(args))
+
+    print(f"{args.units * args.words_per_unit} words per textbook, cpu count {os.cpu_count()}\n")
+    print(f"{'pool':>6} {'parses':>7} {'elapsed s':>10} {'parses/s':>9} {'probes':>7} "
+          f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    print("-" * 71)
+    for row in rows:
+        pool = "thread" if row["pool_workers"] == 0 else str(row["pool_workers"])
+        print(f"{pool:>6} {row['concurrency']:>7} {row['elapsed_s']:>10.2f} {row['parses_per_s']:>9.2f} "
+              f"{row['probes']:>7} {row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+英语学习辅助应用 - 大响应序列化与压缩基准
+
+以5000个知识点的教材为例，对比知识点列表接口的三种返回方式：
+- before:   response_model 校验 + 标准库json，不压缩（原实现）
+- fast:     FastJSONResponse（跳过校验，orjson可用时使用orjson）
+- fast+gzip / fast+br: 再经 CompressionMiddleware 压缩
+
+用法:
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --points 5000 --iterations 30
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import string
+import sys
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+import httpx
+from fastapi import FastAPI
+
+from app.api.textbooks import KnowledgePointResponse
+from services import compression
+from services import responses
+from services.compression import CompressionMiddleware
+from services.responses import FastJSONResponse
+
+
+def _word(length: int = 8) -> str:
+    return "".join(random.choices(string.ascii_lowercase, k=length))
+
+
+def build_knowledge_points(count: int, units: int = 20) -> List[Dict]:
+    """构造与知识点接口返回结构一致的数据"""
+    unit_ids = [f"unit-{i:04d}-{_word(24)}" for i in range(units)]
+    points = []
+    for i in range(count):
+        word = _word(random.randint(4, 12))
+        points.append({
+            "id": f"{i:08d}-{_word(27)}",
+            "unit_id": unit_ids[i % units],
+            "unit_name": f"Unit {i % units + 1} {_word(6).title()} and {_word(5).title()}",
+            "point_type": random.choice(["vocabulary", "grammar", "sentence"]),
+            "content": word,
+            "phonetic": f"/{word}/",
+            "part_of_speech": random.choice(["n.", "v.", "adj.", "adv."]),
+            "chinese_meaning": "释义" + "".join(random.choices("学习英语单词教材知识点练习", k=6)),
+            "collocations": [f"{word} {_word(5)}" for _ in range(2)],
+            "examples": [f"This is an example sentence with {word} in it." for _ in range(2)]
+        })
+    return points
+
+
+def build_app(points: List[Dict]) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/before", response_model=List[KnowledgePointResponse])
+    async def before():
+        return points
+
+    @app.get("/fast", response_model=List[KnowledgePointResponse])
+    async def fast():
+        return FastJSONResponse(points)
+
+    return app
+
+
+async def run(args) -> List[Dict]:
+    points = build_knowledge_points(args.points)
+    app = build_app(points)
+    compressed_app = CompressionMiddleware(app)
+
+    cases = [
+        ("before", app, "/before", "identity"),
+        ("fast", app, "/fast", "identity"),
+        ("fast+gzip", compressed_app, "/fast", "gzip"),
+    ]
+    if compression.brotli is not None:
+        cases.append(("fast+br", compressed_app, "/fast", "br"))
+
+    results = []
+    for name, asgi_app, path, encoding in cases:
+        transport = httpx.ASGITransport(app=asgi_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            headers = {"Accept-Encoding": encoding}
+            # 预热
+            response = await client.get(path, headers=headers)
+            response.raise_for_status()
+            size = len(response.content) if encoding == "identity" else int(response.headers["content-length"])
+
+            timings = []
+            for _ in range(args.iterations):
+                started = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                timings.append(time.perf_counter() - started)
+
+        results.append({
+            "case": name,
+            "bytes": size,
+            "mean_ms": statistics.mean(timings) * 1000,
+            "p50_ms": statistics.median(timings) * 1000,
+            "min_ms": min(timings) * 1000
+        })
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识点列表序列化与压缩基准")
+    parser.add_argument("--points", type=int, default=5000, help="知识点数量")
+    parser.add_argument("--iterations", type=int, default=20, help="每种方式的请求次数")
+    args = parser.parse_args()
+
+    random.seed(42)
+    results = asyncio.run(run(args))
+
+    print(f"{args.points} knowledge points, {args.iterations} iterations "
+          f"(orjson: {'yes' if responses.orjson else 'no'}, brotli: {'yes' if compression.brotli else 'no'})\n")
+    print(f"{'case':<12} {'bytes':>10} {'mean ms':>10} {'p50 ms':>10} {'min ms':>10} {'speedup':>8}")
+    print("-" * 65)
+    baseline = results[0]["mean_ms"]
+    for row in results:
+        print(f"{row['case']:<12} {row['bytes']:>10} {row['mean_ms']:>10.2f} {row['p50_ms']:>10.2f} "
+              f"{row['min_ms']:>10.2f} {baseline / row['mean_ms']:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
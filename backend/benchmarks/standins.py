@@ -0,0 +1,477 @@
+"""
+英语学习辅助应用 - 压测用外部服务替身
+
+- 内存版PostgREST：支持本项目用到的 select / insert / update / delete、
+  eq / neq / gt / gte / lt / lte / is / in / like / ilike 过滤及 or 组合、order、limit/offset 和 Range 分页，
+  并模拟外键级联删除
+- 兼容OpenAI接口的假大模型：可配置首包延迟和输出速率（token/秒），
+  按提示词返回题目JSON、错题分析JSON或普通回答
+- OTLP/HTTP JSON 采集端（可选）：把收到的span转换为与本地jsonl导出相同的格式写入文件，
+  可用 benchmarks/trace_view.py 查看
+
+用法:
+    python benchmarks/standins.py --postgrest-port 54321 --llm-port 54322 --llm-latency-ms 300
+    python benchmarks/standins.py --collector-port 4318 --collector-output traces/collected.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+
+# ---------- 内存版PostgREST ----------
+
+# 等值查询较多的列建立索引，避免每次请求全表扫描
+INDEXED_COLUMNS = ("id", "email", "user_id", "textbook_id", "unit_id", "test_id")
+
+# 外键级联删除: 父表 -> [(子表, 外键列)]
+CASCADES = {
+    "users": [("textbooks", "user_id"), ("test_records", "user_id")],
+    "textbooks": [("units", "textbook_id"), ("test_records", "textbook_id"), ("parse_jobs", "textbook_id")],
+    "units": [("knowledge_points", "unit_id")],
+    "test_records": [("answer_records", "test_id")],
+}
+
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _normalize(value: Any) -> str:
+    """PostgREST过滤值是字符串，按其文本形式比较"""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def _split_in_values(text: str) -> List[str]:
+    """解析 in.(a,b,"c,d") 中的取值"""
+    text = text[1:-1] if text.startswith("(") and text.endswith(")") else text
+    values, current, quoted = [], [], False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            values.append("".join(current))
+            current = []
+        else:
+            current.append(char)
+    if current or text:
+        values.append("".join(current))
+    return values
+
+
+def _unquote(text: str) -> str:
+    if len(text) >= 2 and text[0] == '"' and text[-1] == '"':
+        return re.sub(r"\\(.)", r"\1", text[1:-1])
+    return text
+
+
+def _split_or_conditions(text: str) -> List[Tuple[str, str, str]]:
+    """解析 or=(col.op.value,col.op."value") 中的条件"""
+    text = text[1:-1] if text.startswith("(") and text.endswith(")") else text
+    parts, current, quoted, escaped = [], [], False, False
+    for char in text:
+        if escaped:
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == "," and not quoted:
+            parts.append("".join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append("".join(current))
+    conditions = []
+    for part in parts:
+        column, operator, argument = part.split(".", 2)
+        conditions.append((column, operator, _unquote(argument)))
+    return conditions
+
+
+def _like(value: Any, pattern: str, flags: int = 0) -> bool:
+    if value is None:
+        return False
+    regex = "".join(".*" if char in "*%" else "." if char == "_" else re.escape(char) for char in pattern)
+    return re.fullmatch(regex, _normalize(value), flags) is not None
+
+
+def _compare(value: Any, operator: str, argument: str) -> bool:
+    if operator == "like":
+        return _like(value, argument)
+    if operator == "ilike":
+        return _like(value, argument, re.IGNORECASE)
+    if operator == "is":
+        return _normalize(value) == argument.lower()
+    if operator == "in":
+        return _normalize(value) in set(_split_in_values(argument))
+
+    text = _normalize(value)
+    if operator == "eq":
+        return text == argument
+    if operator == "neq":
+        return text != argument
+    if value is None:
+        return False
+
+    # 数字按数值比较，其余（ISO时间等）按字符串比较
+    left, right = value, argument
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        right = float(argument)
+    else:
+        left = text
+    if operator == "gt":
+        return left > right
+    if operator == "gte":
+        return left >= right
+    if operator == "lt":
+        return left < right
+    if operator == "lte":
+        return left <= right
+    raise ValueError(f"unsupported operator: {operator}")
+
+
+def _matches(row: Dict[str, Any], column: str, operator: str, argument: str) -> bool:
+    if column == "or":
+        return any(_compare(row.get(c), o, a) for c, o, a in _split_or_conditions(argument))
+    return _compare(row.get(column), operator, argument)
+
+
+class MemoryStore:
+    """按表存储的内存数据"""
+
+    def __init__(self):
+        self.tables: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.indexes: Dict[str, Dict[str, Dict[str, Dict[str, Dict[str, Any]]]]] = {}
+
+    def _table(self, name: str) -> Dict[str, Dict[str, Any]]:
+        if name not in self.tables:
+            self.tables[name] = {}
+            self.indexes[name] = {column: {} for column in INDEXED_COLUMNS}
+        return self.tables[name]
+
+    def _index_add(self, table: str, row: Dict[str, Any]):
+        for column, index in self.indexes[table].items():
+            if column in row:
+                index.setdefault(_normalize(row[column]), {})[row["id"]] = row
+
+    def _index_remove(self, table: str, row: Dict[str, Any]):
+        for column, index in self.indexes[table].items():
+            if column in row:
+                index.get(_normalize(row[column]), {}).pop(row["id"], None)
+
+    def _candidates(self, table: str, filters: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        rows = self._table(table)
+        for column, operator, argument in filters:
+            index = self.indexes[table].get(column)
+            if index is None:
+                continue
+            if operator == "eq":
+                return list(index.get(argument, {}).values())
+            if operator == "in":
+                found = {}
+                for value in _split_in_values(argument):
+                    found.update(index.get(value, {}))
+                return list(found.values())
+        return list(rows.values())
+
+    def select(self, table: str, filters: List[Tuple[str, str, str]]) -> List[Dict[str, Any]]:
+        return [
+            row for row in self._candidates(table, filters)
+            if all(_matches(row, column, operator, argument) for column, operator, argument in filters)
+        ]
+
+    def insert(self, table: str, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        stored = self._table(table)
+        inserted = []
+        for row in rows:
+            row = dict(row)
+            row.setdefault("id", str(uuid.uuid4()))
+            if table == "users" and self.select("users", [("email", "eq", _normalize(row.get("email")))]):
+                raise KeyError("duplicate key value violates unique constraint \"users_email_key\"")
+            stored[row["id"]] = row
+            self._index_add(table, row)
+            inserted.append(row)
+        return inserted
+
+    def update(self, table: str, filters, fields: Dict[str, Any]) -> List[Dict[str, Any]]:
+        updated = self.select(table, filters)
+        for row in updated:
+            self._index_remove(table, row)
+            row.update(fields)
+            self._index_add(table, row)
+        return updated
+
+    def delete(self, table: str, filters) -> List[Dict[str, Any]]:
+        deleted = self.select(table, filters)
+        for row in deleted:
+            for child_table, column in CASCADES.get(table, []):
+                self.delete(child_table, [(column, "eq", _normalize(row["id"]))])
+            self._index_remove(table, row)
+            self._table(table).pop(row["id"], None)
+        return deleted
+
+
+def _parse_filters(request: Request) -> List[Tuple[str, str, str]]:
+    filters = []
+    for column, expression in request.query_params.multi_items():
+        if column in RESERVED_PARAMS:
+            continue
+        if column == "or":
+            filters.append((column, "or", expression))
+            continue
+        operator, _, argument = expression.partition(".")
+        filters.append((column, operator, argument))
+    return filters
+
+
+def _apply_select(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+    if not select or select.strip() == "*":
+        return rows
+    columns = [c.strip() for c in select.split(",") if c.strip()]
+    return [{c: row.get(c) for c in columns} for row in rows]
+
+
+def _apply_order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+    if not order:
+        return rows
+    for term in reversed(order.split(",")):
+        parts = term.split(".")
+        column, descending = parts[0], "desc" in parts[1:]
+        rows = sorted(rows, key=lambda r: (r.get(column) is None, r.get(column) if r.get(column) is not None else ""),
+                      reverse=descending)
+    return rows
+
+
+def _apply_range(rows: List[Dict[str, Any]], request: Request, max_rows: int = 0) -> List[Dict[str, Any]]:
+    offset = int(request.query_params.get("offset", 0))
+    limit = request.query_params.get("limit")
+
+    range_header = request.headers.get("range")
+    if range_header and "-" in range_header:
+        start, _, end = range_header.partition("-")
+        offset = int(start)
+        limit = int(end) - offset + 1 if end else None
+
+    rows = rows[offset:]
+    if limit is not None:
+        rows = rows[:int(limit)]
+    if max_rows > 0:
+        # 与PostgREST的max-rows一致：超出的行不返回
+        rows = rows[:max_rows]
+    return rows
+
+
+def create_postgrest_app(store: Optional[MemoryStore] = None, latency_ms: float = 0.0, max_rows: int = 0) -> Starlette:
+    """创建内存版PostgREST应用，latency_ms模拟每次请求的网络往返，max_rows限制单次响应的行数（0表示不限）"""
+    store = store or MemoryStore()
+
+    async def handle(request: Request):
+        if latency_ms > 0:
+            await asyncio.sleep(latency_ms / 1000)
+        table = request.path_params["table"]
+        filters = _parse_filters(request)
+        method = request.method
+
+        try:
+            if method in ("GET", "HEAD"):
+                rows = store.select(table, filters)
+                rows = _apply_order(rows, request.query_params.get("order"))
+                rows = _apply_range(rows, request, max_rows)
+                return JSONResponse(_apply_select(rows, request.query_params.get("select")))
+
+            if method == "POST":
+                body = await request.json()
+                rows = store.insert(table, body if isinstance(body, list) else [body])
+                return JSONResponse(rows, status_code=201)
+
+            if method == "PATCH":
+                return JSONResponse(store.update(table, filters, await request.json()))
+
+            if method == "DELETE":
+                return JSONResponse(store.delete(table, filters))
+        except KeyError as e:
+            return JSONResponse({"code": "23505", "message": str(e)}, status_code=409)
+        except ValueError as e:
+            return JSONResponse({"code": "PGRST100", "message": str(e)}, status_code=400)
+
+        return Response(status_code=405)
+
+    app = Starlette(routes=[
+        Route("/rest/v1/{table}", handle, methods=["GET", "HEAD", "POST", "PATCH", "DELETE"]),
+    ])
+    app.state.store = store
+    return app
+
+
+# ---------- 假大模型 ----------
+
+def _fake_questions(prompt: str) -> str:
+    count_match = re.search(r"生成(\d+)道", prompt)
+    count = int(count_match.group(1)) if count_match else 5
+    contents = re.findall(r'"content":\s*"([^"]+)"', prompt) or ["word"]
+
+    questions = []
+    for i in range(count):
+        content = contents[i % len(contents)]
+        questions.append({
+            "type": "choice",
+            "question": f"Which option best matches '{content}'?",
+            "options": [f"A. {content}", "B. option", "C. option", "D. option"],
+            "answer": "A",
+            "explanation": f"'{content}' is the correct choice.",
+            "knowledge_point": content
+        })
+    return json.dumps({"questions": questions}, ensure_ascii=False)
+
+
+def _fake_analysis() -> str:
+    return json.dumps({
+        "error_types": ["记忆错误"],
+        "analysis": "Simulated analysis.",
+        "suggestions": ["Review the unit vocabulary."],
+        "review_points": ["vocabulary"]
+    }, ensure_ascii=False)
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+def create_llm_app(latency_ms: float = 200.0, tokens_per_sec: float = 50.0, answer_tokens: int = 150) -> Starlette:
+    """创建兼容OpenAI接口的假大模型应用"""
+
+    async def completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        prompt = messages[-1]["content"] if messages else ""
+
+        if '"questions"' in prompt:
+            content = _fake_questions(prompt)
+        elif '"error_types"' in prompt:
+            content = _fake_analysis()
+        else:
+            content = " ".join(["This is a simulated answer."] * max(1, answer_tokens // 6))
+
+        completion_tokens = _estimate_tokens(content)
+        delay = latency_ms / 1000
+        if tokens_per_sec > 0:
+            delay += completion_tokens / tokens_per_sec
+        await asyncio.sleep(delay)
+
+        prompt_tokens = sum(_estimate_tokens(m.get("content", "")) for m in messages)
+        return JSONResponse({
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens
+            }
+        })
+
+    return Starlette(routes=[
+        Route("/v1/chat/completions", completions, methods=["POST"]),
+        Route("/chat/completions", completions, methods=["POST"]),
+    ])
+
+
+# ---------- OTLP采集端 ----------
+
+def _otlp_attribute(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("stringValue", "boolValue", "doubleValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def create_collector_app(output_path: str) -> Starlette:
+    """创建OTLP/HTTP JSON采集端应用"""
+
+    async def traces(request: Request):
+        body = await request.json()
+        lines = []
+        for resource_spans in body.get("resourceSpans", []):
+            for scope_spans in resource_spans.get("scopeSpans", []):
+                for span in scope_spans.get("spans", []):
+                    start = int(span["startTimeUnixNano"])
+                    lines.append(json.dumps({
+                        "trace_id": span["traceId"],
+                        "span_id": span["spanId"],
+                        "parent_id": span.get("parentSpanId") or None,
+                        "name": span["name"],
+                        "kind": span.get("kind"),
+                        "start_unix_nano": start,
+                        "duration_ms": round((int(span["endTimeUnixNano"]) - start) / 1e6, 3),
+                        "attributes": {a["key"]: _otlp_attribute(a["value"]) for a in span.get("attributes", [])},
+                        "error": span.get("status", {}).get("message")
+                    }, ensure_ascii=False))
+
+        with open(output_path, "a", encoding="utf-8") as f:
+            f.writelines(line + "\n" for line in lines)
+        return JSONResponse({})
+
+    return Starlette(routes=[Route("/v1/traces", traces, methods=["POST"])])
+
+
+async def serve(postgrest_port: int, llm_port: int, latency_ms: float, tokens_per_sec: float, answer_tokens: int,
+                collector_port: int = 0, collector_output: str = "collected_spans.jsonl",
+                postgrest_latency_ms: float = 0.0, postgrest_max_rows: int = 0):
+    """在同一事件循环中运行各替身服务"""
+    import uvicorn
+
+    apps = [
+        (create_postgrest_app(latency_ms=postgrest_latency_ms, max_rows=postgrest_max_rows), postgrest_port),
+        (create_llm_app(latency_ms, tokens_per_sec, answer_tokens), llm_port),
+    ]
+    if collector_port:
+        apps.append((create_collector_app(collector_output), collector_port))
+
+    servers = [
+        uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+        for app, port in apps
+    ]
+    await asyncio.gather(*(server.serve() for server in servers))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="压测用外部服务替身")
+    parser.add_argument("--postgrest-port", type=int, default=54321, help="内存版PostgREST端口")
+    parser.add_argument("--postgrest-latency-ms", type=float, default=0.0, help="PostgREST每次请求的模拟延迟（毫秒）")
+    parser.add_argument("--postgrest-max-rows", type=int, default=0,
+                        help="PostgREST单次响应的最大行数（Supabase默认1000），0表示不限")
+    parser.add_argument("--llm-port", type=int, default=54322, help="假大模型端口")
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="大模型首包延迟（毫秒）")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=50.0, help="大模型输出速率，0表示不限")
+    parser.add_argument("--llm-answer-tokens", type=int, default=150, help="普通回答的输出token数")
+    parser.add_argument("--collector-port", type=int, default=0, help="OTLP采集端端口，0表示不启动")
+    parser.add_argument("--collector-output", default="collected_spans.jsonl", help="采集端写入的jsonl文件")
+    args = parser.parse_args()
+
+    asyncio.run(serve(args.postgrest_port, args.llm_port, args.llm_latency_ms, args.llm_tokens_per_sec,
+                      args.llm_answer_tokens, args.collector_port, args.collector_output,
+                      args.postgrest_latency_ms, args.postgrest_max_rows))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+英语学习辅助应用 - 链路瀑布图
+
+读取本地jsonl导出（或standins.py采集端写入）的span，按链路打印瀑布图。
+默认显示最慢的一条链路，可按路由筛选或指定trace id。
+
+用法:
+    python benchmarks/trace_view.py traces/spans.jsonl
+    python benchmarks/trace_view.py traces/spans.jsonl --route "POST /api/tests/generate" --top 3
+    python benchmarks/trace_view.py traces/spans.jsonl --trace-id 4bf92f3577b34da6a3ce929d0e0e4736
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+
+def load_traces(path: str) -> Dict[str, List[Dict]]:
+    traces: Dict[str, List[Dict]] = defaultdict(list)
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                span = json.loads(line)
+                traces[span["trace_id"]].append(span)
+    return traces
+
+
+def root_of(spans: List[Dict]) -> Optional[Dict]:
+    span_ids = {s["span_id"] for s in spans}
+    roots = [s for s in spans if not s.get("parent_id") or s["parent_id"] not in span_ids]
+    return min(roots, key=lambda s: s["start_unix_nano"]) if roots else None
+
+
+def print_waterfall(spans: List[Dict], width: int = 50):
+    root = root_of(spans)
+    if root is None:
+        return
+
+    children: Dict[str, List[Dict]] = defaultdict(list)
+    for span in spans:
+        if span is not root:
+            children[span.get("parent_id")].append(span)
+
+    origin = root["start_unix_nano"]
+    total_ms = max(root["duration_ms"], 1e-6)
+    print(f"trace {root['trace_id']}  {root['name']}  {root['duration_ms']:.1f} ms  ({len(spans)} spans)\n")
+
+    def walk(span: Dict, depth: int):
+        offset_ms = (span["start_unix_nano"] - origin) / 1e6
+        start = min(width - 1, int(offset_ms / total_ms * width))
+        length = max(1, int(span["duration_ms"] / total_ms * width))
+        bar = " " * start + "█" * min(length, width - start)
+        label = ("  " * depth + span["name"])[:48]
+        error = f"  ❌ {span['error']}" if span.get("error") else ""
+        print(f"{label:<48} {offset_ms:>9.1f} {span['duration_ms']:>9.1f}  |{bar:<{width}}|{error}")
+        for child in sorted(children.get(span["span_id"], []), key=lambda s: s["start_unix_nano"]):
+            walk(child, depth + 1)
+
+    print(f"{'span':<48} {'start ms':>9} {'dur ms':>9}")
+    walk(root, 0)
+    print()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="按链路打印span瀑布图")
+    parser.add_argument("path", help="span的jsonl文件")
+    parser.add_argument("--trace-id", default=None, help="指定链路")
+    parser.add_argument("--route", default=None, help="只看根span名称包含该字符串的链路，如 \"POST /api/tests/generate\"")
+    parser.add_argument("--top", type=int, default=1, help="显示最慢的N条链路")
+    args = parser.parse_args()
+
+    traces = load_traces(args.path)
+    if args.trace_id:
+        selected = [traces.get(args.trace_id, [])]
+    else:
+        candidates = []
+        for spans in traces.values():
+            root = root_of(spans)
+            if root and (not args.route or args.route in root["name"]):
+                candidates.append((root["duration_ms"], spans))
+        candidates.sort(key=lambda item: item[0], reverse=True)
+        selected = [spans for _, spans in candidates[:args.top]]
+
+    if not selected or not selected[0]:
+        print("未找到匹配的链路")
+        return
+    for spans in selected:
+        print_waterfall(spans)
+
+
+if __name__ == "__main__":
+    main()
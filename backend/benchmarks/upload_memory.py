@@ -0,0 +1,112 @@
+"""
+英语学习辅助应用 - 大文件上传的内存占用
+
+启动替身服务和被测应用，同时上传K个大PDF文件，读取应用进程的峰值常驻内存（/proc/<pid>/status 的 VmHWM，仅Linux），
+并检查超限（413）和内容与扩展名不符（415）的上传被拒绝、uploads目录中不残留部分文件。
+
+用法:
+    python benchmarks/upload_memory.py
+    python benchmarks/upload_memory.py --size-mb 200 --concurrency 4 --max-size-mb 300
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "benchmarks"))
+
+import httpx
+
+from load_test import start_services, stop_services
+
+
+def peak_rss_mb(pid: int) -> float:
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def build_file(directory: str, name: str, size_mb: int, header: bytes) -> str:
+    path = os.path.join(directory, name)
+    block = os.urandom(1024 * 1024)
+    with open(path, "wb") as f:
+        f.write(header)
+        for _ in range(size_mb):
+            f.write(block)
+    return path
+
+
+async def upload(client: httpx.AsyncClient, token: str, path: str, filename: str) -> httpx.Response:
+    with open(path, "rb") as f:
+        return await client.post(
+            "/api/textbooks/upload", headers={"Authorization": f"Bearer {token}"},
+            files={"file": (filename, f, "application/octet-stream")}, data={"name": filename}
+        )
+
+
+async def run(args, app_url: str, pid: int):
+    workdir = tempfile.mkdtemp(prefix="upload-bench-")
+    pdf = build_file(workdir, "big.pdf", args.size_mb, b"%PDF-1.7\n")
+    oversized = build_file(workdir, "huge.pdf", args.max_size_mb + 1, b"%PDF-1.7\n")
+
+    async with httpx.AsyncClient(base_url=app_url, timeout=600) as client:
+        response = await client.post("/api/auth/register", json={
+            "email": f"upload-{uuid.uuid4().hex[:8]}@example.com", "password": "bench-password",
+            "user_type": "parent", "name": "upload bench"
+        })
+        token = response.json()["access_token"]
+
+        baseline = peak_rss_mb(pid)
+        started = time.perf_counter()
+        responses = await asyncio.gather(*(upload(client, token, pdf, "big.pdf") for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+        peak = peak_rss_mb(pid)
+
+        assert all(r.status_code == 200 for r in responses), [r.text[:200] for r in responses]
+        digests = {r.json()["file"]["sha256"] for r in responses}
+
+        try:
+            rejected_size = (await upload(client, token, oversized, "huge.pdf")).status_code
+        except httpx.TransportError:
+            # 服务端读取请求头后即返回413并关闭连接，客户端可能还在发送请求体
+            rejected_size = "connection closed early"
+        rejected_type = (await upload(client, token, pdf, "fake.docx")).status_code
+
+    uploads_dir = os.path.join(BACKEND_DIR, "uploads")
+    leftovers = [name for name in os.listdir(uploads_dir) if name.endswith(".part")]
+
+    total_mb = args.size_mb * args.concurrency
+    print(f"\n{args.concurrency} x {args.size_mb} MB uploads in {elapsed:.2f}s ({total_mb / elapsed:.0f} MB/s)")
+    print(f"app peak RSS: {baseline:.0f} MB before, {peak:.0f} MB after (+{peak - baseline:.0f} MB)")
+    print(f"sha256 identical across uploads: {len(digests) == 1}")
+    print(f"oversized upload: {rejected_size}, type mismatch: {rejected_type}")
+    print(f"partial files left in uploads/: {len(leftovers)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="大文件上传的内存占用")
+    parser.add_argument("--size-mb", type=int, default=100, help="每个上传文件的大小（MB）")
+    parser.add_argument("--concurrency", type=int, default=4, help="同时上传的文件数")
+    parser.add_argument("--max-size-mb", type=int, default=150, help="被测应用的上传大小上限（MB）")
+    args = parser.parse_args()
+
+    os.environ["UPLOAD_MAX_SIZE_MB"] = str(args.max_size_mb)
+    service_args = argparse.Namespace(
+        llm_latency_ms=0.0, llm_tokens_per_sec=200.0, bcrypt_rounds=4, storage="sql", workers=1
+    )
+    processes, app_url = start_services(service_args)
+    try:
+        asyncio.run(run(args, app_url, processes[-1].pid))
+    finally:
+        stop_services(processes)
+
+
+if __name__ == "__main__":
+    main()
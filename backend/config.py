@@ -18,6 +18,10 @@ class SupabaseConfig(BaseModel):
     url: str = Field(..., description="Supabase项目URL")
     anon_key: str = Field(..., description="anon公开密钥")
     service_key: str = Field(..., description="service_role密钥")
+    pool_max_connections: int = Field(default=100, description="HTTP连接池最大连接数")
+    pool_max_keepalive: int = Field(default=20, description="HTTP连接池最大keep-alive连接数")
+    pool_keepalive_expiry: float = Field(default=30.0, description="keep-alive连接空闲回收时间（秒）")
+    timeout: float = Field(default=10.0, description="PostgREST请求超时时间（秒）")
 
 
 class DashScopeConfig(BaseModel):
@@ -35,12 +39,123 @@ class OSSConfig(BaseModel):
     access_key_secret: str = Field(..., description="AccessKey Secret")
 
 
+class LLMLimitsConfig(BaseModel):
+    """大模型调用准入控制配置"""
+    max_concurrency: int = Field(default=8, description="同时进行的大模型调用数上限")
+    max_queue: int = Field(default=64, description="排队调用数上限，超出后直接返回429")
+    queue_timeout_seconds: float = Field(default=30.0, description="排队超时时间（秒），超时返回429")
+    user_rate_per_minute: float = Field(default=20.0, description="每个用户每分钟的大模型调用数，0为不限制")
+    user_burst: int = Field(default=5, description="每个用户允许的突发调用数")
+    max_tracked_users: int = Field(default=10000, description="令牌桶最多跟踪的用户数")
+
+
+class ParseJobsConfig(BaseModel):
+    """教材解析任务配置"""
+    workers: int = Field(default=2, description="每个进程同时执行的解析任务数")
+    max_queue: int = Field(default=100, description="每个进程排队的解析任务上限，超出后返回503")
+    max_attempts: int = Field(default=3, description="任务被中断后最多重新执行的次数")
+    heartbeat_seconds: float = Field(default=5.0, description="执行中任务刷新心跳的间隔（秒）")
+    stale_after_seconds: float = Field(default=60.0, description="心跳超过该时间未刷新的任务视为中断，由其他worker接管（秒）")
+    recovery_interval_seconds: float = Field(default=30.0, description="扫描排队中和已中断任务的间隔（秒）")
+    pool_workers: int = Field(default=2, description="每个进程的文档解析子进程数，0表示在线程池中解析")
+    memory_limit_mb: int = Field(default=1024, description="每个解析子进程的内存上限（MB），0为不限制")
+    timeout_seconds: float = Field(default=300.0, description="单个文档的解析超时时间（秒），同时限制CPU时间，0为不限制")
+    cache_dir: str = Field(default="./data/parse_cache", description="解析结果缓存目录（同一台机器的进程共用）")
+    cache_max_mb: int = Field(default=512, description="解析结果缓存的总大小上限（MB），0为不缓存")
+
+
+class UploadConfig(BaseModel):
+    """教材上传配置"""
+    max_size_mb: int = Field(default=200, description="单个教材文件的大小上限（MB）")
+    chunk_size_kb: int = Field(default=1024, description="写入磁盘时每块的大小（KB）")
+
+
 class AppConfig(BaseModel):
     """应用配置"""
     host: str = Field(default="0.0.0.0")
     port: int = Field(default=8000)
     debug: bool = Field(default=False)
     secret_key: str = Field(..., description="JWT密钥")
+    warmup: bool = Field(default=False, description="启动时预建数据库连接、大模型客户端和密码哈希线程，完成后才开始接收请求")
+
+
+class AuthConfig(BaseModel):
+    """认证配置"""
+    bcrypt_rounds: int = Field(default=12, description="bcrypt计算强度，变更后用户登录时自动重新哈希")
+    hash_workers: int = Field(default=2, description="密码哈希专用线程数")
+    hash_max_pending: int = Field(default=64, description="密码哈希最大排队任务数，超出后拒绝请求")
+    token_mode: str = Field(default="sub", description="令牌模式: sub（仅用户ID）或 claims（携带用户信息，免查库）")
+    revocation_refresh_seconds: int = Field(default=30, description="令牌吊销列表刷新间隔（秒）")
+
+
+class StorageConfig(BaseModel):
+    """存储后端配置"""
+    backend: str = Field(default="supabase", description="存储后端: supabase 或 sql")
+    database_url: str = Field(
+        default="sqlite+aiosqlite:///./data/app.db",
+        description="sql后端的SQLAlchemy异步连接串（sqlite+aiosqlite / postgresql+asyncpg）"
+    )
+    pool_size: int = Field(default=10, description="sql后端连接池大小")
+    create_tables: bool = Field(default=True, description="sql后端启动时自动建表")
+    echo: bool = Field(default=False, description="打印SQL语句")
+    bulk_chunk_size: int = Field(default=500, description="批量写入知识点时每批的行数")
+    bulk_concurrency: int = Field(default=4, description="批量写入时同时进行的批次数（sql后端在单个事务中顺序写入）")
+    bulk_retries: int = Field(default=3, description="单批写入失败后的重试次数")
+    bulk_retry_backoff_seconds: float = Field(default=0.5, description="重试的初始等待时间（秒），每次翻倍")
+
+
+class CacheConfig(BaseModel):
+    """进程内缓存配置"""
+    user_ttl_seconds: int = Field(default=60, description="登录用户缓存有效期（秒）")
+    user_max_size: int = Field(default=10000, description="登录用户缓存最大条目数")
+    textbook_ttl_seconds: int = Field(default=30, description="教材权限及单元缓存有效期（秒）")
+    textbook_max_size: int = Field(default=2000, description="教材权限及单元缓存最大条目数")
+
+
+class MetricsConfig(BaseModel):
+    """运行指标配置"""
+    enabled: bool = Field(default=True, description="是否开放/metrics接口")
+
+
+class CompressionConfig(BaseModel):
+    """响应压缩配置"""
+    enabled: bool = Field(default=True, description="按Accept-Encoding协商brotli/gzip压缩")
+    minimum_size: int = Field(default=1024, description="超过该字节数的响应才压缩")
+    gzip_level: int = Field(default=3, description="gzip压缩级别（1-9），级别越高CPU开销越大")
+    brotli_quality: int = Field(default=1, description="brotli压缩质量（0-11），需安装brotli；低档位已优于gzip且快得多")
+
+
+class TracingConfig(BaseModel):
+    """请求链路追踪配置"""
+    enabled: bool = Field(default=False, description="是否记录请求链路")
+    sample_rate: float = Field(default=1.0, description="记录链路的请求比例（0-1），上游traceparent已采样时总是记录")
+    exporter: str = Field(default="jsonl", description="导出方式: jsonl（本地文件）或 otlp（OTLP/HTTP JSON采集端）")
+    jsonl_path: str = Field(default="./traces/spans.jsonl", description="jsonl导出文件路径")
+    otlp_endpoint: str = Field(default="http://127.0.0.1:4318", description="OTLP/HTTP采集端地址")
+    service_name: str = Field(default="english-learning-backend", description="上报的服务名")
+    batch_size: int = Field(default=256, description="每批导出的span数")
+    flush_interval_seconds: float = Field(default=2.0, description="导出间隔（秒）")
+    max_queue_size: int = Field(default=10000, description="待导出span队列上限，超出后丢弃")
+
+
+class ProfilingConfig(BaseModel):
+    """请求采样分析配置"""
+    enabled: bool = Field(default=False, description="是否启用请求采样分析")
+    token: str = Field(default="", description="管理员令牌，请求头X-Profile-Token与之相同时分析该请求")
+    sample_rate: float = Field(default=0.0, description="随机分析的请求比例（0-1）")
+    interval_ms: float = Field(default=5.0, description="采样间隔（毫秒）")
+    output_dir: str = Field(default="./profiles", description="分析结果输出目录")
+    max_profiles: int = Field(default=200, description="最多保留的分析结果数")
+
+
+class ServerConfig(BaseModel):
+    """生产环境进程管理配置（gunicorn.conf.py）"""
+    workers: int = Field(default=0, description="worker进程数，0表示按可用CPU核数")
+    max_requests: int = Field(default=2000, description="worker处理该数量请求后重启，限制内存增长，0为不重启")
+    max_requests_jitter: int = Field(default=200, description="重启阈值的随机抖动，避免所有worker同时重启")
+    graceful_timeout: int = Field(default=30, description="收到SIGTERM后等待进行中请求完成的时间（秒）")
+    timeout: int = Field(default=120, description="worker无响应超过该时间后被重启（秒）")
+    keepalive: int = Field(default=5, description="HTTP keep-alive超时（秒）")
 
 
 class Settings(BaseModel):
@@ -49,6 +164,17 @@ class Settings(BaseModel):
     dashscope: DashScopeConfig
     oss: OSSConfig
     app: AppConfig
+    auth: AuthConfig = Field(default_factory=AuthConfig)
+    llm_limits: LLMLimitsConfig = Field(default_factory=LLMLimitsConfig)
+    parse_jobs: ParseJobsConfig = Field(default_factory=ParseJobsConfig)
+    upload: UploadConfig = Field(default_factory=UploadConfig)
+    storage: StorageConfig = Field(default_factory=StorageConfig)
+    cache: CacheConfig = Field(default_factory=CacheConfig)
+    metrics: MetricsConfig = Field(default_factory=MetricsConfig)
+    compression: CompressionConfig = Field(default_factory=CompressionConfig)
+    profiling: ProfilingConfig = Field(default_factory=ProfilingConfig)
+    tracing: TracingConfig = Field(default_factory=TracingConfig)
+    server: ServerConfig = Field(default_factory=ServerConfig)
 
 
 def load_config(config_path: Optional[str] = None) -> Settings:
@@ -65,7 +191,11 @@ def load_config(config_path: Optional[str] = None) -> Settings:
             supabase=SupabaseConfig(
                 url=os.getenv("SUPABASE_URL", ""),
                 anon_key=os.getenv("SUPABASE_ANON_KEY", ""),
-                service_key=os.getenv("SUPABASE_SERVICE_KEY", "")
+                service_key=os.getenv("SUPABASE_SERVICE_KEY", ""),
+                pool_max_connections=int(os.getenv("SUPABASE_POOL_MAX_CONNECTIONS", "100")),
+                pool_max_keepalive=int(os.getenv("SUPABASE_POOL_MAX_KEEPALIVE", "20")),
+                pool_keepalive_expiry=float(os.getenv("SUPABASE_POOL_KEEPALIVE_EXPIRY", "30")),
+                timeout=float(os.getenv("SUPABASE_TIMEOUT", "10"))
             ),
             dashscope=DashScopeConfig(
                 api_key=os.getenv("DASHSCOPE_API_KEY", ""),
@@ -82,7 +212,89 @@ def load_config(config_path: Optional[str] = None) -> Settings:
                 host=os.getenv("APP_HOST", "0.0.0.0"),
                 port=int(os.getenv("APP_PORT", "8000")),
                 debug=os.getenv("DEBUG", "False").lower() == "true",
-                secret_key=os.getenv("SECRET_KEY", "default-secret-key")
+                secret_key=os.getenv("SECRET_KEY", "default-secret-key"),
+                warmup=os.getenv("APP_WARMUP", "False").lower() == "true"
+            ),
+            llm_limits=LLMLimitsConfig(
+                max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", "8")),
+                max_queue=int(os.getenv("LLM_MAX_QUEUE", "64")),
+                queue_timeout_seconds=float(os.getenv("LLM_QUEUE_TIMEOUT", "30")),
+                user_rate_per_minute=float(os.getenv("LLM_USER_RATE_PER_MINUTE", "20")),
+                user_burst=int(os.getenv("LLM_USER_BURST", "5"))
+            ),
+            parse_jobs=ParseJobsConfig(
+                workers=int(os.getenv("PARSE_WORKERS", "2")),
+                max_queue=int(os.getenv("PARSE_MAX_QUEUE", "100")),
+                max_attempts=int(os.getenv("PARSE_MAX_ATTEMPTS", "3")),
+                heartbeat_seconds=float(os.getenv("PARSE_HEARTBEAT_SECONDS", "5")),
+                stale_after_seconds=float(os.getenv("PARSE_STALE_AFTER_SECONDS", "60")),
+                recovery_interval_seconds=float(os.getenv("PARSE_RECOVERY_INTERVAL", "30")),
+                pool_workers=int(os.getenv("PARSE_POOL_WORKERS", "2")),
+                memory_limit_mb=int(os.getenv("PARSE_MEMORY_LIMIT_MB", "1024")),
+                timeout_seconds=float(os.getenv("PARSE_TIMEOUT_SECONDS", "300")),
+                cache_dir=os.getenv("PARSE_CACHE_DIR", "./data/parse_cache"),
+                cache_max_mb=int(os.getenv("PARSE_CACHE_MAX_MB", "512"))
+            ),
+            upload=UploadConfig(
+                max_size_mb=int(os.getenv("UPLOAD_MAX_SIZE_MB", "200")),
+                chunk_size_kb=int(os.getenv("UPLOAD_CHUNK_SIZE_KB", "1024"))
+            ),
+            auth=AuthConfig(
+                bcrypt_rounds=int(os.getenv("BCRYPT_ROUNDS", "12")),
+                hash_workers=int(os.getenv("PASSWORD_HASH_WORKERS", "2")),
+                hash_max_pending=int(os.getenv("PASSWORD_HASH_MAX_PENDING", "64")),
+                token_mode=os.getenv("AUTH_TOKEN_MODE", "sub"),
+                revocation_refresh_seconds=int(os.getenv("TOKEN_REVOCATION_REFRESH", "30"))
+            ),
+            storage=StorageConfig(
+                backend=os.getenv("STORAGE_BACKEND", "supabase"),
+                database_url=os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/app.db"),
+                pool_size=int(os.getenv("DATABASE_POOL_SIZE", "10")),
+                create_tables=os.getenv("DATABASE_CREATE_TABLES", "True").lower() == "true",
+                echo=os.getenv("DATABASE_ECHO", "False").lower() == "true",
+                bulk_chunk_size=int(os.getenv("BULK_WRITE_CHUNK_SIZE", "500")),
+                bulk_concurrency=int(os.getenv("BULK_WRITE_CONCURRENCY", "4")),
+                bulk_retries=int(os.getenv("BULK_WRITE_RETRIES", "3")),
+                bulk_retry_backoff_seconds=float(os.getenv("BULK_WRITE_RETRY_BACKOFF", "0.5"))
+            ),
+            cache=CacheConfig(
+                user_ttl_seconds=int(os.getenv("USER_CACHE_TTL", "60")),
+                user_max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "10000")),
+                textbook_ttl_seconds=int(os.getenv("TEXTBOOK_CACHE_TTL", "30")),
+                textbook_max_size=int(os.getenv("TEXTBOOK_CACHE_MAX_SIZE", "2000"))
+            ),
+            metrics=MetricsConfig(
+                enabled=os.getenv("METRICS_ENABLED", "True").lower() == "true"
+            ),
+            compression=CompressionConfig(
+                enabled=os.getenv("COMPRESSION_ENABLED", "True").lower() == "true",
+                minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+                gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "3")),
+                brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "1"))
+            ),
+            profiling=ProfilingConfig(
+                enabled=os.getenv("PROFILING_ENABLED", "False").lower() == "true",
+                token=os.getenv("PROFILING_TOKEN", ""),
+                sample_rate=float(os.getenv("PROFILING_SAMPLE_RATE", "0")),
+                interval_ms=float(os.getenv("PROFILING_INTERVAL_MS", "5")),
+                output_dir=os.getenv("PROFILING_OUTPUT_DIR", "./profiles"),
+                max_profiles=int(os.getenv("PROFILING_MAX_PROFILES", "200"))
+            ),
+            tracing=TracingConfig(
+                enabled=os.getenv("TRACING_ENABLED", "False").lower() == "true",
+                sample_rate=float(os.getenv("TRACING_SAMPLE_RATE", "1.0")),
+                exporter=os.getenv("TRACING_EXPORTER", "jsonl"),
+                jsonl_path=os.getenv("TRACING_JSONL_PATH", "./traces/spans.jsonl"),
+                otlp_endpoint=os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://127.0.0.1:4318"),
+                service_name=os.getenv("OTEL_SERVICE_NAME", "english-learning-backend")
+            ),
+            server=ServerConfig(
+                workers=int(os.getenv("WEB_CONCURRENCY", "0")),
+                max_requests=int(os.getenv("MAX_REQUESTS", "2000")),
+                max_requests_jitter=int(os.getenv("MAX_REQUESTS_JITTER", "200")),
+                graceful_timeout=int(os.getenv("GRACEFUL_TIMEOUT", "30")),
+                timeout=int(os.getenv("WORKER_TIMEOUT", "120")),
+                keepalive=int(os.getenv("KEEPALIVE", "5"))
             )
         )
     
@@ -0,0 +1,76 @@
+"""
+英语学习辅助应用 - 生产环境进程管理配置
+
+gunicorn管理多个uvicorn worker进程：
+- worker数按容器/cgroup可用的CPU核数确定（WEB_CONCURRENCY可覆盖）
+- 预加载应用，worker由主进程fork，共享只读内存并缩短启动时间
+- 每个worker处理一定数量的请求后重启，限制内存增长
+- 收到SIGTERM后停止接收新连接，在graceful_timeout内等待进行中的请求完成
+- 启动时预热连接池，/ready在预热完成前和退出过程中返回503
+
+用法:
+    gunicorn main:app -c gunicorn.conf.py
+"""
+
+import math
+import os
+
+# 生产环境默认开启启动预热，需在加载配置之前设置
+os.environ.setdefault("APP_WARMUP", "true")
+
+from config import settings
+
+
+def available_cpus() -> int:
+    """可用CPU核数（考虑CPU亲和性和cgroup配额）"""
+    try:
+        count = len(os.sched_getaffinity(0))
+    except AttributeError:
+        count = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" 或 "max <period>"
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            value, period = f.read().split()
+            if value != "max":
+                quota = int(value) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_quota_us") as f:
+                value = int(f.read())
+            with open("/sys/fs/cgroup/cpu/cpu.cfs_period_us") as f:
+                period = int(f.read())
+            if value > 0 and period > 0:
+                quota = value / period
+        except (OSError, ValueError):
+            pass
+
+    if quota is not None:
+        count = min(count, max(1, math.ceil(quota)))
+    return max(1, count)
+
+
+bind = f"{settings.app.host}:{settings.app.port}"
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = settings.server.workers or available_cpus()
+preload_app = True
+
+max_requests = settings.server.max_requests
+max_requests_jitter = settings.server.max_requests_jitter
+graceful_timeout = settings.server.graceful_timeout
+timeout = settings.server.timeout
+keepalive = settings.server.keepalive
+
+accesslog = "-"
+errorlog = "-"
+loglevel = "debug" if settings.app.debug else "info"
+
+
+def when_ready(server):
+    server.log.info(f"🚀 主进程就绪，启动 {workers} 个worker（可用CPU {available_cpus()}）")
+
+
+def worker_exit(server, worker):
+    server.log.info(f"worker {worker.pid} 已退出")
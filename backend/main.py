@@ -4,11 +4,70 @@
 提供RESTful API服务
 """
 
+import asyncio
+import os
+import sys
+
+# app目录下的模块（auth、database）按顶层名称导入
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from config import settings
+from services.compression import CompressionMiddleware
+from services.data_loader import RequestLoadersMiddleware
+from services.llm_service import llm_service
+from services.metrics import metrics, MetricsMiddleware
+from services.parse_jobs import parse_job_queue
+from services.parse_pool import parse_pool
+from services.password_hasher import password_hasher
+from services.profiler import ProfilingMiddleware
+from services.readiness import readiness
+from services.repository import repository
+from services.token_revocation import revocation_list
+from services.uploads import UploadLimitMiddleware
+from services.tracing import tracer, TracingMiddleware
+
+
+# 预热失败后重试的间隔（秒）
+WARMUP_RETRY_SECONDS = 5
+
+
+async def warmup() -> bool:
+    """
+    预建连接池和客户端，避免首批请求承担初始化耗时
+
+    Returns:
+        数据库、密码哈希和解析进程池是否全部预热成功；大模型客户端按需创建，预热失败不影响就绪
+    """
+    loop = asyncio.get_running_loop()
+    results = await asyncio.gather(
+        repository.warmup(),
+        password_hasher.warmup(),
+        loop.run_in_executor(None, llm_service.warmup),
+        parse_pool.warmup(),
+        return_exceptions=True
+    )
+    ok = True
+    for name, required, result in zip(("数据库", "密码哈希", "大模型客户端", "解析进程池"),
+                                      (True, True, False, True), results):
+        if isinstance(result, Exception):
+            print(f"⚠️ {name}预热失败: {str(result)}")
+            ok = ok and not required
+    return ok
+
+
+async def retry_warmup():
+    """预热失败时/ready保持未就绪，定期重试直到成功"""
+    while True:
+        await asyncio.sleep(WARMUP_RETRY_SECONDS)
+        if await warmup():
+            readiness.mark_ready()
+            print("✅ 预热重试成功，开始接收流量")
+            return
 
 
 @asynccontextmanager
@@ -19,10 +78,36 @@ async def lifespan(app: FastAPI):
     print(f"📍 服务地址: http://{settings.app.host}:{settings.app.port}")
     print(f"📚 API文档: http://{settings.app.host}:{settings.app.port}/docs")
     
+    # 定期刷新令牌吊销列表
+    from auth import fetch_revocations
+    revocation_task = asyncio.create_task(revocation_list.run_periodic(fetch_revocations))
+
+    # 收到SIGTERM时/ready立即返回未就绪
+    readiness.install_signal_handlers()
+
+    warmed = await warmup() if settings.app.warmup else True
+
+    # 启动解析任务worker，接管上次未完成的任务
+    await parse_job_queue.start()
+    warmup_task = None
+    if warmed:
+        readiness.mark_ready()
+    else:
+        warmup_task = asyncio.create_task(retry_warmup())
+    
     yield
     
     # 关闭时执行
     print("\n👋 正在关闭服务...")
+    readiness.start_draining()
+    revocation_task.cancel()
+    if warmup_task is not None:
+        warmup_task.cancel()
+    await parse_job_queue.shutdown()
+    parse_pool.shutdown()
+    password_hasher.shutdown()
+    await repository.close()
+    tracer.flush()
 
 
 # 创建FastAPI应用
@@ -49,6 +134,13 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# 超过大小上限的上传在解析请求体之前拒绝（在CORS之内，413响应也带跨域头）
+app.add_middleware(
+    UploadLimitMiddleware,
+    paths=["/api/textbooks/upload"],
+    max_bytes=settings.upload.max_size_mb * 1024 * 1024
+)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
@@ -58,14 +150,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求级批量加载器
+app.add_middleware(RequestLoadersMiddleware)
+
+# 大响应按Accept-Encoding压缩
+if settings.compression.enabled:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression.minimum_size,
+        gzip_level=settings.compression.gzip_level,
+        brotli_quality=settings.compression.brotli_quality
+    )
+
+# 按需采样分析单个请求
+if settings.profiling.enabled:
+    app.add_middleware(ProfilingMiddleware)
+
+# 请求链路追踪
+if settings.tracing.enabled:
+    app.add_middleware(TracingMiddleware)
+
+# 请求耗时统计（最外层，包含其他中间件的耗时）
+if settings.metrics.enabled:
+    app.add_middleware(MetricsMiddleware)
+
 
 # 导入并注册路由
-from app.api import users, textbooks, chat, tests
+from app.api import users, textbooks, chat, tests, profiles
 
 app.include_router(users.router, prefix="/api/auth", tags=["认证"])
 app.include_router(textbooks.router, prefix="/api/textbooks", tags=["教材"])
 app.include_router(chat.router, prefix="/api/chat", tags=["对话"])
 app.include_router(tests.router, prefix="/api/tests", tags=["测试"])
+app.include_router(profiles.router, prefix="/api/profiles", tags=["性能分析"])
 
 
 @app.get("/")
@@ -85,6 +202,22 @@ async def health_check():
     return {"status": "healthy"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """就绪检查：预热完成前和退出过程中返回503"""
+    return JSONResponse(
+        readiness.status(),
+        status_code=200 if readiness.is_ready else 503
+    )
+
+
+if settings.metrics.enabled:
+    @app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+    async def metrics_endpoint():
+        """Prometheus指标"""
+        return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
@@ -0,0 +1,283 @@
+"""
+英语学习辅助应用 - 知识点批量写入
+
+解析一本教材会产生数千个知识点，逐条insert需要同样多次往返。
+BulkWriter 缓存待写入的行，按批写入，失败的批次按指数退避重试；
+PostgREST后端可同时写入多批，sql后端在单个事务中顺序写入。
+
+除新增外也支持覆盖已有的知识点（按ID）、删除知识点、更新和删除已有单元
+（在所有知识点写入完成后执行），用于增量重新解析。
+
+一本教材的单元和知识点全部写入成功或全部撤销：
+- sql后端：所有批次在同一事务中，失败时回滚
+- PostgREST后端：无法跨请求开启事务，失败时删除本次新增（或可能已新增）的知识点和新建的单元，
+  并写回被覆盖、被删除的知识点和被更新、被删除的单元的原始内容
+"""
+
+import asyncio
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from config import StorageConfig
+from services.metrics import metrics
+
+
+# 撤销时按ID删除，每次请求的ID数（避免URL过长）
+DELETE_CHUNK_SIZE = 100
+
+bulk_write_chunk_seconds = metrics.histogram(
+    "bulk_write_chunk_seconds", "批量写入单批耗时", ("table",),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+bulk_write_retries = metrics.counter(
+    "bulk_write_retries_total", "批量写入重试次数", ("table",))
+
+
+class BulkWriteError(RuntimeError):
+    """批量写入失败（已回滚或撤销）"""
+
+
+class BulkWriter:
+    """
+    一本教材的单元和知识点批量写入器
+
+    用法:
+        async with BulkWriter(repository, settings.storage) as writer:
+            await writer.write_units(new_units)
+            for row in rows:
+                await writer.add(row)
+            writer.remove(stale_rows)
+            writer.update_unit(unit, fields)
+            writer.remove_units(stale_units)
+        writer.report()
+    """
+
+    def __init__(self, repository, config: StorageConfig,
+                 on_progress: Optional[Callable[[int], None]] = None):
+        self.repository = repository
+        self.config = config
+        self.on_progress = on_progress
+
+        self._transaction_cm = None
+        self._transaction = None
+        self._buffer: List[Dict[str, Any]] = []
+        self._tasks: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._error: Optional[BaseException] = None
+
+        # 已提交写入的单元ID、新增的知识点ID、被覆盖或删除的知识点原始内容（PostgREST后端失败时据此撤销）
+        self._unit_ids: List[str] = []
+        self._point_ids: List[str] = []
+        self._originals: List[Dict[str, Any]] = []
+        # 已更新单元的原字段值、已删除单元的原始行（PostgREST后端失败时写回）
+        self._updated_units: List[Dict[str, Any]] = []
+        self._removed_units: List[Dict[str, Any]] = []
+        # 待删除的知识点，待更新（原始行，字段）和待删除的单元
+        self._removals: List[Dict[str, Any]] = []
+        self._unit_updates: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        self._unit_removals: List[Dict[str, Any]] = []
+
+        # 统计
+        self.rows = 0
+        self.removed = 0
+        self.chunks = 0
+        self.retries = 0
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    @property
+    def transactional(self) -> bool:
+        return self._transaction is not None
+
+    # ---------- 生命周期 ----------
+
+    async def __aenter__(self) -> "BulkWriter":
+        self._transaction_cm = self.repository.transaction()
+        self._transaction = await self._transaction_cm.__aenter__()
+        # 同一事务（数据库会话）不能并发执行语句
+        concurrency = 1 if self.transactional else max(1, self.config.bulk_concurrency)
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self.started = time.perf_counter()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc is None:
+            try:
+                await self.flush()
+            except BaseException as e:
+                exc_type, exc, tb = type(e), e, e.__traceback__
+
+        if exc is not None:
+            await self._abort()
+
+        # 有异常时事务回滚
+        await self._transaction_cm.__aexit__(exc_type, exc, tb)
+        self.elapsed = time.perf_counter() - self.started
+
+        if exc is not None and not isinstance(exc, (asyncio.CancelledError, BulkWriteError)):
+            raise BulkWriteError(f"写入知识点失败，已撤销: {str(exc)}") from exc
+        return False
+
+    async def _abort(self):
+        """取消进行中的批次；PostgREST后端删除已写入的数据"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+
+        if self.transactional:
+            return
+        try:
+            for i in range(0, len(self._point_ids), DELETE_CHUNK_SIZE):
+                await self.repository.delete_knowledge_points(self._point_ids[i:i + DELETE_CHUNK_SIZE])
+            # 先写回单元，知识点引用单元
+            await self.repository.insert_units(self._removed_units)
+            for unit in self._updated_units:
+                await self.repository.update_unit(unit["id"], {k: v for k, v in unit.items() if k != "id"})
+            for i in range(0, len(self._originals), self.config.bulk_chunk_size):
+                await self.repository.insert_knowledge_points(self._originals[i:i + self.config.bulk_chunk_size])
+            await self.repository.delete_units(self._unit_ids)
+        except Exception as e:
+            print(f"⚠️ 撤销已写入的知识点失败: {str(e)}")
+
+    # ---------- 写入 ----------
+
+    async def _write_with_retry(self, table: str, func: Callable, rows: List[Dict[str, Any]]):
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                await func(rows, transaction=self._transaction)
+                bulk_write_chunk_seconds.observe(time.perf_counter() - started, table)
+                return
+            except Exception:
+                # 事务中的语句失败后事务已不可用，不重试
+                if self.transactional or attempt >= self.config.bulk_retries:
+                    raise
+            bulk_write_retries.inc(table)
+            self.retries += 1
+            await asyncio.sleep(self.config.bulk_retry_backoff_seconds * (2 ** attempt))
+            attempt += 1
+
+    async def write_units(self, rows: List[Dict[str, Any]]):
+        """写入新建的单元（在知识点之前，立即写入）"""
+        if not rows:
+            return
+        # 先记录ID：请求超时但实际已写入时也能撤销
+        self._unit_ids.extend(row["id"] for row in rows)
+        await self._write_with_retry("units", self.repository.insert_units, rows)
+
+    async def add(self, row: Dict[str, Any], original: Optional[Dict[str, Any]] = None):
+        """
+        缓存一行知识点，满一批时写入（同时进行的批次达到上限时等待）
+
+        覆盖已有的知识点时传入original（原始内容），撤销时写回
+        """
+        self._raise_error()
+        if original is not None:
+            self._originals.append(original)
+        else:
+            self._point_ids.append(row["id"])
+        self._buffer.append(row)
+        if len(self._buffer) >= self.config.bulk_chunk_size:
+            await self._flush_buffer()
+
+    async def _flush_buffer(self):
+        chunk, self._buffer = self._buffer, []
+        if not chunk:
+            return
+
+        await self._semaphore.acquire()
+        if self._error is not None:
+            self._semaphore.release()
+            self._raise_error()
+
+        task = asyncio.create_task(self._write_chunk(chunk))
+        self._tasks.add(task)
+
+    async def _write_chunk(self, chunk: List[Dict[str, Any]]):
+        try:
+            await self._write_with_retry("knowledge_points", self.repository.insert_knowledge_points, chunk)
+            self.rows += len(chunk)
+            self.chunks += 1
+            if self.on_progress is not None:
+                self.on_progress(self.rows)
+        except Exception as e:
+            if self._error is None:
+                self._error = e
+        finally:
+            self._semaphore.release()
+            self._tasks.discard(asyncio.current_task())
+
+    def _raise_error(self):
+        if self._error is not None:
+            raise self._error
+
+    def remove(self, rows: List[Dict[str, Any]]):
+        """删除知识点（传入原始行，在所有写入完成后删除）"""
+        self._removals.extend(rows)
+
+    def update_unit(self, unit: Dict[str, Any], fields: Dict[str, Any]):
+        """更新已有单元（传入原始行，在知识点写入完成后更新）"""
+        self._unit_updates.append((unit, fields))
+
+    def remove_units(self, units: List[Dict[str, Any]]):
+        """删除已有单元（传入原始行，单元中的知识点应已通过remove删除）"""
+        self._unit_removals.extend(units)
+
+    async def flush(self):
+        """写入缓存中剩余的行，等待所有批次完成后执行删除"""
+        await self._flush_buffer()
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks))
+        self._raise_error()
+
+        removals, self._removals = self._removals, []
+        for i in range(0, len(removals), DELETE_CHUNK_SIZE):
+            chunk = removals[i:i + DELETE_CHUNK_SIZE]
+            # 先记录原始内容：请求超时但实际已删除时也能写回
+            self._originals.extend(chunk)
+            await self._write_with_retry("knowledge_points", self._delete_chunk, chunk)
+            self.removed += len(chunk)
+            if self.on_progress is not None:
+                self.on_progress(self.rows + self.removed)
+
+        updates, self._unit_updates = self._unit_updates, []
+        if updates:
+            self._updated_units.extend(
+                {**{key: unit.get(key) for key in fields}, "id": unit["id"]} for unit, fields in updates
+            )
+            await self._write_with_retry("units", self._update_units, [
+                {**fields, "id": unit["id"]} for unit, fields in updates
+            ])
+
+        units, self._unit_removals = self._unit_removals, []
+        if units:
+            self._removed_units.extend(units)
+            await self._write_with_retry("units", self._delete_units, units)
+
+    async def _delete_chunk(self, rows: List[Dict[str, Any]], transaction=None):
+        await self.repository.delete_knowledge_points([row["id"] for row in rows], transaction=transaction)
+
+    async def _update_units(self, rows: List[Dict[str, Any]], transaction=None):
+        for row in rows:
+            fields = {k: v for k, v in row.items() if k != "id"}
+            await self.repository.update_unit(row["id"], fields, transaction=transaction)
+
+    async def _delete_units(self, rows: List[Dict[str, Any]], transaction=None):
+        await self.repository.delete_units([row["id"] for row in rows], transaction=transaction)
+
+    def report(self) -> Dict[str, Any]:
+        """写入统计"""
+        elapsed = self.elapsed or (time.perf_counter() - self.started)
+        return {
+            "rows": self.rows,
+            "removed": self.removed,
+            "units": len(self._unit_ids),
+            "units_updated": len(self._updated_units),
+            "units_removed": len(self._removed_units),
+            "chunks": self.chunks,
+            "retries": self.retries,
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.rows / elapsed, 1) if elapsed > 0 else 0.0,
+            "transactional": self.transactional
+        }
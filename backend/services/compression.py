@@ -0,0 +1,148 @@
+"""
+英语学习辅助应用 - 响应压缩
+
+按请求头 Accept-Encoding 协商 brotli / gzip，只压缩超过阈值的非流式响应。
+brotli 为可选依赖，未安装时只提供 gzip。
+"""
+
+import gzip
+from typing import Dict, List, Optional, Sequence
+
+from starlette.concurrency import run_in_threadpool
+
+try:
+    import brotli
+except ImportError:
+    # brotli为可选依赖
+    brotli = None
+
+
+# 超过该大小的响应在线程池中压缩（zlib/brotli压缩时释放GIL），避免阻塞事件循环
+THREADPOOL_MIN_SIZE = 64 * 1024
+
+# 可压缩的内容类型前缀（SSE等流式响应不压缩，避免缓冲）
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/plain",
+    "text/html",
+    "text/css",
+    "text/markdown",
+    "application/javascript",
+)
+
+
+def _parse_accept_encoding(value: str) -> Dict[str, float]:
+    """解析Accept-Encoding，返回 {编码: q值}"""
+    encodings = {}
+    for item in value.split(","):
+        parts = item.strip().split(";")
+        name = parts[0].strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in parts[1:]:
+            key, _, number = param.strip().partition("=")
+            if key == "q":
+                try:
+                    quality = float(number)
+                except ValueError:
+                    quality = 0.0
+        encodings[name] = quality
+    return encodings
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """选择压缩编码：优先brotli，其次gzip"""
+    encodings = _parse_accept_encoding(accept_encoding)
+    wildcard = encodings.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    for encoding in candidates:
+        if encodings.get(encoding, wildcard) > 0:
+            return encoding
+    return None
+
+
+class CompressionMiddleware:
+    """响应压缩中间件（纯ASGI）"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 3, brotli_quality: int = 1,
+                 compressible_types: Sequence[str] = COMPRESSIBLE_TYPES):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.compressible_types = tuple(compressible_types)
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = negotiate_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[dict] = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                # 等到响应体再决定是否压缩
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            response_headers: List = list(start_message.get("headers", []))
+            header_map = {k.lower(): v for k, v in response_headers}
+            content_type = header_map.get(b"content-type", b"").decode("latin-1")
+
+            if (
+                message.get("more_body", False)
+                or len(body) < self.minimum_size
+                or b"content-encoding" in header_map
+                or not content_type.startswith(self.compressible_types)
+            ):
+                # 流式、过小、已编码或不可压缩的响应原样发送
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            if len(body) >= THREADPOOL_MIN_SIZE:
+                compressed = await run_in_threadpool(self.compress, body, encoding)
+            else:
+                compressed = self.compress(body, encoding)
+            response_headers = [
+                (k, v) for k, v in response_headers if k.lower() != b"content-length"
+            ]
+            response_headers.append((b"content-encoding", encoding.encode("latin-1")))
+            response_headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+            vary = header_map.get(b"vary")
+            if vary is None:
+                response_headers.append((b"vary", b"Accept-Encoding"))
+            elif b"accept-encoding" not in vary.lower():
+                response_headers = [(k, v) for k, v in response_headers if k.lower() != b"vary"]
+                response_headers.append((b"vary", vary + b", Accept-Encoding"))
+
+            passthrough = True
+            await send({**start_message, "headers": response_headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,182 @@
+"""
+英语学习辅助应用 - 批量数据加载
+
+DataLoader风格的读取合并：同一事件循环tick内发起的同类读取合并为一次in_查询，
+请求内的结果按主键缓存，请求结束即丢弃
+"""
+
+import asyncio
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Tuple
+
+from services.repository import repository
+
+
+BatchFunction = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class DataLoader:
+    """按tick合并读取的批量加载器"""
+
+    def __init__(self, batch_fn: BatchFunction, cache: bool = True, max_batch_size: int = 200):
+        self.batch_fn = batch_fn
+        self.cache = cache
+        self.max_batch_size = max_batch_size
+        self._cache: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Tuple[Hashable, asyncio.Future]] = []
+
+        # 统计计数
+        self.loads = 0
+        self.batches = 0
+        self.cache_hits = 0
+
+    def load(self, key: Hashable) -> Awaitable[Any]:
+        """加载单个主键，不存在时结果为None"""
+        self.loads += 1
+
+        if self.cache and key in self._cache:
+            self.cache_hits += 1
+            return asyncio.shield(self._cache[key])
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if self.cache:
+            self._cache[key] = future
+
+        if not self._queue:
+            loop.call_soon(self._dispatch)
+        self._queue.append((key, future))
+
+        # 防止单个等待者被取消时连带取消共享结果
+        return asyncio.shield(future)
+
+    async def load_many(self, keys: List[Hashable]) -> List[Any]:
+        """批量加载，结果顺序与keys一致"""
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self, key: Optional[Hashable] = None):
+        """清除请求内缓存（写操作后调用）"""
+        if key is None:
+            self._cache.clear()
+        else:
+            self._cache.pop(key, None)
+
+    def _dispatch(self):
+        queue, self._queue = self._queue, []
+        for start in range(0, len(queue), self.max_batch_size):
+            asyncio.ensure_future(self._run_batch(queue[start:start + self.max_batch_size]))
+
+    async def _run_batch(self, batch: List[Tuple[Hashable, asyncio.Future]]):
+        keys = list(dict.fromkeys(key for key, _ in batch))
+        self.batches += 1
+
+        try:
+            results = await self.batch_fn(keys)
+        except Exception as e:
+            for key, future in batch:
+                # 失败的结果不缓存，下次读取重新查询
+                if self._cache.get(key) is future:
+                    self._cache.pop(key, None)
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for key, future in batch:
+            if not future.done():
+                future.set_result(results.get(key))
+
+    def stats(self) -> Dict[str, Any]:
+        """加载统计信息"""
+        return {
+            "loads": self.loads,
+            "batches": self.batches,
+            "cache_hits": self.cache_hits
+        }
+
+
+def _index_by(rows: List[Dict[str, Any]], column: str = "id") -> Dict[Hashable, Dict[str, Any]]:
+    return {row[column]: row for row in rows}
+
+
+def _group_by(rows: List[Dict[str, Any]], keys: List[Hashable], column: str) -> Dict[Hashable, List[Dict[str, Any]]]:
+    groups = {key: [] for key in keys}
+    for row in rows:
+        groups.setdefault(row[column], []).append(row)
+    return groups
+
+
+class SharedLoaders:
+    """进程级加载器：不缓存，只合并并发请求在同一tick内的读取"""
+
+    def __init__(self, repo):
+        self.repo = repo
+        self.users = DataLoader(self._load_users, cache=False)
+        self.textbooks = DataLoader(self._load_textbooks, cache=False)
+        self.units = DataLoader(self._load_units, cache=False)
+        self.units_by_textbook = DataLoader(self._load_units_by_textbook, cache=False)
+        self.knowledge_points = DataLoader(self._load_knowledge_points, cache=False)
+
+    async def _load_users(self, user_ids):
+        return _index_by(await self.repo.get_users(user_ids))
+
+    async def _load_textbooks(self, textbook_ids):
+        return _index_by(await self.repo.get_textbooks(textbook_ids))
+
+    async def _load_units(self, unit_ids):
+        return _index_by(await self.repo.get_units(unit_ids))
+
+    async def _load_units_by_textbook(self, textbook_ids):
+        return _group_by(await self.repo.list_units_for_textbooks(textbook_ids), textbook_ids, "textbook_id")
+
+    async def _load_knowledge_points(self, knowledge_point_ids):
+        return _index_by(await self.repo.get_knowledge_points(knowledge_point_ids))
+
+
+def _delegate(loader: DataLoader) -> BatchFunction:
+    async def batch_fn(keys):
+        return dict(zip(keys, await loader.load_many(keys)))
+    return batch_fn
+
+
+class RequestLoaders:
+    """请求级加载器：缓存请求内的读取结果，未命中的读取交给进程级加载器合并"""
+
+    def __init__(self, shared: SharedLoaders):
+        self.users = DataLoader(_delegate(shared.users))
+        self.textbooks = DataLoader(_delegate(shared.textbooks))
+        self.units = DataLoader(_delegate(shared.units))
+        self.units_by_textbook = DataLoader(_delegate(shared.units_by_textbook))
+        self.knowledge_points = DataLoader(_delegate(shared.knowledge_points))
+
+
+_request_loaders: ContextVar[Optional[RequestLoaders]] = ContextVar("request_loaders", default=None)
+
+
+def get_loaders() -> RequestLoaders:
+    """获取当前请求的加载器，不在请求上下文中时返回一次性的加载器"""
+    loaders = _request_loaders.get()
+    if loaders is None:
+        loaders = RequestLoaders(shared_loaders)
+    return loaders
+
+
+class RequestLoadersMiddleware:
+    """为每个HTTP请求创建独立的加载器（纯ASGI中间件，不额外创建任务）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = _request_loaders.set(RequestLoaders(shared_loaders))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _request_loaders.reset(token)
+
+
+# 创建全局批量加载实例
+shared_loaders = SharedLoaders(repository)
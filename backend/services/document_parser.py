@@ -11,6 +11,11 @@ from pathlib import Path
 import json
 
 from config import settings
+from services.tracing import traced
+
+
+# 解析规则版本：解析逻辑或输出结构变化时递增，使客户端缓存（ETag）和解析结果缓存失效
+PARSER_VERSION = "1"
 
 
 class BaseParser(ABC):
@@ -377,6 +382,7 @@ class DocumentParser:
             raise ValueError(f"不支持的文件格式: {ext}")
     
     @staticmethod
+    @traced("document_parser.parse")
     def parse(file_path: str) -> Dict[str, Any]:
         """解析文档"""
         parser = DocumentParser.get_parser(file_path)
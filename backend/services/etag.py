@@ -0,0 +1,84 @@
+"""
+英语学习辅助应用 - ETag与条件请求
+
+教材解析完成后内容基本不变，按教材的 updated_at、解析状态和解析规则版本生成ETag，
+请求头 If-None-Match 匹配时直接返回304，无需再查询单元和知识点。
+
+使用弱ETag：响应可能被压缩中间件按不同编码输出，内容语义相同即可复用。
+"""
+
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Response, status
+
+from services.document_parser import PARSER_VERSION
+
+
+# 浏览器每次使用缓存前都向服务器校验
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts: Any) -> str:
+    """由若干版本字段生成弱ETag"""
+    digest = hashlib.sha1("|".join("" if p is None else str(p) for p in parts).encode("utf-8"))
+    return f'W/"{digest.hexdigest()[:20]}"'
+
+
+def textbook_version(textbook: Dict[str, Any]) -> tuple:
+    """教材内容版本：更新时间 + 解析状态 + 解析规则版本"""
+    return (
+        textbook["id"],
+        textbook.get("updated_at") or textbook.get("created_at"),
+        textbook.get("parse_status"),
+        PARSER_VERSION
+    )
+
+
+def textbook_etag(textbook: Dict[str, Any], *variant: Any) -> Optional[str]:
+    """
+    单本教材相关响应的ETag，variant区分同一教材的不同视图（如分页参数）
+
+    解析进行中知识点仍在写入，不生成ETag
+    """
+    if textbook.get("parse_status") == "processing":
+        return None
+    return make_etag(*textbook_version(textbook), *variant)
+
+
+def textbooks_etag(textbooks: Iterable[Dict[str, Any]], *variant: Any) -> str:
+    """教材列表的ETag"""
+    parts = []
+    for textbook in textbooks:
+        parts.extend(textbook_version(textbook))
+        parts.append(textbook.get("name"))
+    return make_etag(*parts, *variant)
+
+
+def etag_matches(if_none_match: Optional[str], etag: Optional[str]) -> bool:
+    """If-None-Match是否命中（弱比较）"""
+    if not if_none_match or not etag:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def cache_headers(etag: Optional[str]) -> Dict[str, str]:
+    """带ETag的响应头，无ETag时禁止缓存"""
+    if not etag:
+        return {"Cache-Control": "no-store"}
+    return {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+
+
+def not_modified(etag: str) -> Response:
+    """304响应"""
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=cache_headers(etag))
@@ -0,0 +1,228 @@
+"""
+英语学习辅助应用 - 大模型调用准入控制
+
+全局限制同时进行的大模型调用数，超出的调用按优先级排队：
+交互式对话/讲解优先于批量出题，错题分析最后。
+每个用户有独立的令牌桶限制调用频率；排队已满或等待超时时立即拒绝，
+由接口返回429和Retry-After，避免请求堆积并触发百炼限流。
+
+大模型SDK是同步调用，获得执行名额后在线程池中运行，不阻塞事件循环。
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from config import settings, LLMLimitsConfig
+from services.metrics import metrics
+from services.tracing import tracer
+
+
+# 优先级（数值越小越优先）
+PRIORITY_INTERACTIVE = 0  # 对话、知识点讲解
+PRIORITY_BATCH = 1        # 生成测试、复习题
+PRIORITY_BACKGROUND = 2   # 错题分析
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "interactive",
+    PRIORITY_BATCH: "batch",
+    PRIORITY_BACKGROUND: "background"
+}
+
+llm_queue_wait = metrics.histogram(
+    "llm_queue_wait_seconds", "大模型调用排队时间", ("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0))
+llm_queue_depth = metrics.gauge(
+    "llm_queue_depth", "排队中的大模型调用数", ("priority",))
+llm_rejected = metrics.counter(
+    "llm_rejected_total", "被拒绝的大模型调用数", ("priority", "reason"))
+
+
+class LLMBusyError(RuntimeError):
+    """大模型调用被拒绝（由接口转换为429）"""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = max(1, math.ceil(retry_after))
+
+    def to_http_exception(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(self),
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+
+class TokenBucket:
+    """令牌桶"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self) -> float:
+        """不取令牌，返回取到一个令牌需等待的秒数（0表示有令牌）"""
+        self._refill()
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """取一个令牌，成功返回0，否则返回需等待的秒数"""
+        retry_after = self.wait_time()
+        if retry_after == 0:
+            self.tokens -= 1
+        return retry_after
+
+
+class LLMGovernor:
+    """大模型调用的并发、排队和按用户限流"""
+
+    def __init__(self, config: LLMLimitsConfig):
+        self.config = config
+        self.active = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._buckets: "OrderedDict[str, TokenBucket]" = OrderedDict()
+        # 最近调用耗时的滑动平均，用于估算Retry-After
+        self._avg_seconds = 5.0
+
+    # ---------- 按用户限流 ----------
+
+    def _user_bucket(self, user_id: Optional[str]) -> Optional[TokenBucket]:
+        if not user_id or self.config.user_rate_per_minute <= 0:
+            return None
+
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = TokenBucket(self.config.user_rate_per_minute / 60, self.config.user_burst)
+            self._buckets[user_id] = bucket
+            if len(self._buckets) > self.config.max_tracked_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+        return bucket
+
+    # ---------- 排队 ----------
+
+    @property
+    def queue_size(self) -> int:
+        return len(self._waiters)
+
+    def _estimate_wait(self) -> float:
+        """按排队长度和平均耗时估算等待时间"""
+        slots = max(1, self.config.max_concurrency)
+        return (self.queue_size / slots + 1) * self._avg_seconds
+
+    async def _acquire(self, priority: int):
+        if self.active < self.config.max_concurrency and not self._waiters:
+            self.active += 1
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        llm_queue_depth.inc(PRIORITY_NAMES[priority])
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.config.queue_timeout_seconds)
+        except BaseException:
+            if future.done() and not future.cancelled():
+                # 已分配到名额但调用方放弃，转交给下一个
+                self._release()
+            else:
+                future.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+            raise
+        finally:
+            llm_queue_depth.dec(PRIORITY_NAMES[priority])
+
+    def _release(self):
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                # 名额直接转交，active不变
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    # ---------- 执行 ----------
+
+    async def run(self, func: Callable, *args, user_id: Optional[str] = None,
+                  priority: int = PRIORITY_INTERACTIVE, **kwargs) -> Any:
+        """
+        在准入控制下执行同步的大模型调用
+
+        Raises:
+            LLMBusyError: 用户调用过于频繁、排队已满或等待超时
+        """
+        name = PRIORITY_NAMES[priority]
+
+        # 先只检查令牌，获得执行名额后才取走：排队已满或超时被拒绝的调用不消耗用户的额度
+        bucket = self._user_bucket(user_id)
+        if bucket is not None and bucket.wait_time() > 0:
+            llm_rejected.inc(name, "user_rate")
+            raise LLMBusyError("操作过于频繁，请稍后再试", bucket.wait_time())
+
+        if self.active >= self.config.max_concurrency and self.queue_size >= self.config.max_queue:
+            llm_rejected.inc(name, "queue_full")
+            raise LLMBusyError("AI服务繁忙，请稍后再试", self._estimate_wait())
+
+        started = time.perf_counter()
+        try:
+            with tracer.span("llm.queue_wait", priority=name):
+                await self._acquire(priority)
+        except asyncio.TimeoutError:
+            llm_rejected.inc(name, "queue_timeout")
+            raise LLMBusyError("AI服务繁忙，请稍后再试", self._estimate_wait())
+        llm_queue_wait.observe(time.perf_counter() - started, name)
+
+        # 同一用户的多个调用同时排队时，额度可能已被先获得名额的调用用完
+        retry_after = bucket.try_acquire() if bucket is not None else 0.0
+        if retry_after > 0:
+            self._release()
+            llm_rejected.inc(name, "user_rate")
+            raise LLMBusyError("操作过于频繁，请稍后再试", retry_after)
+
+        # 等待方被取消（客户端断开、请求超时）时线程里的调用仍在进行，
+        # 名额要等线程结束才能归还，否则实际并发会超过上限
+        call_started = time.perf_counter()
+        call = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+        call.add_done_callback(lambda fut: self._call_done(fut, call_started))
+        return await asyncio.shield(call)
+
+    def _call_done(self, fut: asyncio.Future, call_started: float):
+        elapsed = time.perf_counter() - call_started
+        self._avg_seconds = self._avg_seconds * 0.8 + elapsed * 0.2
+        if not fut.cancelled():
+            # 等待方已被取消时没人读取异常，这里取出以免事件循环报"未读取的异常"
+            fut.exception()
+        self._release()
+
+    def stats(self) -> Dict[str, Any]:
+        """准入控制统计信息"""
+        return {
+            "active": self.active,
+            "queued": self.queue_size,
+            "max_concurrency": self.config.max_concurrency,
+            "max_queue": self.config.max_queue,
+            "avg_call_seconds": round(self._avg_seconds, 3),
+            "tracked_users": len(self._buckets)
+        }
+
+
+# 创建全局大模型准入控制实例
+llm_governor = LLMGovernor(settings.llm_limits)
@@ -8,21 +8,37 @@ import json
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
-from openai import OpenAI
 from config import settings
+from services.metrics import llm_request_errors, track_llm
+from services.tracing import traced, SPAN_KIND_CLIENT
 
 
 class LLMService:
     """大模型服务类"""
     
     def __init__(self):
-        """初始化大模型客户端"""
-        self.client = OpenAI(
-            api_key=settings.dashscope.api_key,
-            base_url=settings.dashscope.base_url
-        )
+        """初始化大模型服务（客户端在首次调用时创建）"""
+        self._client = None
         self.model = "qwen-max"  # 使用通义千问Max模型
+
+    @property
+    def client(self):
+        """获取大模型客户端"""
+        if self._client is None:
+            # openai SDK导入较慢，按需导入以缩短冷启动时间
+            from openai import OpenAI
+            self._client = OpenAI(
+                api_key=settings.dashscope.api_key,
+                base_url=settings.dashscope.base_url
+            )
+        return self._client
+
+    def warmup(self):
+        """预先创建客户端"""
+        return self.client
     
+    @traced("llm.chat", SPAN_KIND_CLIENT)
+    @track_llm("chat")
     def chat(self, messages: List[Dict[str, str]], 
              system_prompt: Optional[str] = None,
              temperature: float = 0.7,
@@ -62,8 +78,11 @@ class LLMService:
             return response.choices[0].message.content
             
         except Exception as e:
+            llm_request_errors.inc("chat")
             return f"调用大模型失败: {str(e)}"
     
+    @traced("llm.generate_questions", SPAN_KIND_CLIENT)
+    @track_llm("generate_questions")
     def generate_questions(self, 
                           knowledge_points: List[Dict],
                           question_types: List[str] = ["choice", "fill"],
@@ -147,10 +166,13 @@ class LLMService:
                 return []
                 
         except json.JSONDecodeError:
+            llm_request_errors.inc("generate_questions")
             return []
         except Exception as e:
+            llm_request_errors.inc("generate_questions")
             return []
     
+    @traced("llm.answer_question")
     def answer_question(self, 
                        question: str,
                        knowledge_context: str) -> Dict[str, str]:
@@ -190,6 +212,8 @@ class LLMService:
             "question": question
         }
     
+    @traced("llm.explain_knowledge_point", SPAN_KIND_CLIENT)
+    @track_llm("explain_knowledge_point")
     def explain_knowledge_point(self, knowledge_point: Dict) -> str:
         """
         解释知识点
@@ -226,6 +250,8 @@ class LLMService:
         
         return response
     
+    @traced("llm.analyze_errors", SPAN_KIND_CLIENT)
+    @track_llm("analyze_errors")
     def analyze_errors(self, 
                       wrong_answers: List[Dict],
                       knowledge_points: List[Dict]) -> Dict[str, Any]:
@@ -0,0 +1,319 @@
+"""
+英语学习辅助应用 - 运行指标
+
+按路由、数据表/操作、大模型方法统计延迟直方图、进行中请求数和错误数，
+以Prometheus文本格式输出。
+
+热路径上只做字典查找和整数累加，不加锁：指标只在事件循环线程中更新，
+少量在线程池中的更新依赖GIL，偶发的丢失计数可以接受。
+"""
+
+import functools
+import re
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Metric:
+    """指标基类"""
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.description}",
+            f"# TYPE {self.name} {self.metric_type}",
+            *self.samples()
+        ]
+
+
+class Counter(Metric):
+    """单调递增计数器"""
+
+    metric_type = "counter"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, description, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> List[str]:
+        return [
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in list(self._values.items())
+        ]
+
+
+class Gauge(Counter):
+    """可增可减的瞬时值"""
+
+    metric_type = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1):
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def set(self, *labels: str, value: float):
+        self._values[labels] = value
+
+
+class Histogram(Metric):
+    """固定分桶的延迟直方图"""
+
+    metric_type = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [各分桶计数..., +Inf计数, 总和]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series.setdefault(labels, [0] * (len(self.buckets) + 2))
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def samples(self) -> List[str]:
+        lines = []
+        for labels, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), series[:-1]):
+                cumulative += count
+                le = _format_labels(self.labelnames, labels, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{label_text} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Any:
+        return self._metrics.setdefault(metric.name, metric)
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, description, labelnames, buckets))
+
+    def render(self) -> str:
+        """输出Prometheus文本格式"""
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 创建全局指标注册实例
+metrics = MetricsRegistry()
+
+# HTTP路由
+http_requests = metrics.counter(
+    "http_requests_total", "HTTP请求数", ("method", "route", "status"))
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP请求耗时", ("method", "route"))
+http_requests_in_flight = metrics.gauge(
+    "http_requests_in_flight", "进行中的HTTP请求数")
+http_request_exceptions = metrics.counter(
+    "http_request_exceptions_total", "HTTP请求未处理异常数", ("method", "route"))
+
+# 数据库
+db_request_duration = metrics.histogram(
+    "db_request_duration_seconds", "数据库请求耗时", ("backend", "table", "operation"))
+db_requests_in_flight = metrics.gauge(
+    "db_requests_in_flight", "进行中的数据库请求数", ("backend",))
+db_request_errors = metrics.counter(
+    "db_request_errors_total", "数据库请求错误数", ("backend", "table", "operation"))
+
+# 大模型
+llm_request_duration = metrics.histogram(
+    "llm_request_duration_seconds", "大模型调用耗时", ("method",))
+llm_requests_in_flight = metrics.gauge(
+    "llm_requests_in_flight", "进行中的大模型调用数", ("method",))
+llm_request_errors = metrics.counter(
+    "llm_request_errors_total", "大模型调用错误数", ("method",))
+
+
+# ---------- HTTP ----------
+
+class MetricsMiddleware:
+    """记录每个HTTP请求的耗时、状态码和进行中请求数（纯ASGI中间件）"""
+
+    def __init__(self, app, exclude_paths: Sequence[str] = ("/metrics",)):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    @staticmethod
+    def route_template(scope: Dict[str, Any]) -> str:
+        """取路由模板作为标签（如 /api/textbooks/{textbook_id}），避免按实际路径产生大量序列"""
+        return getattr(scope.get("route"), "path", None) or "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        method = scope.get("method", "GET")
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            http_request_exceptions.inc(method, self.route_template(scope))
+            raise
+        finally:
+            route = self.route_template(scope)
+            http_requests_in_flight.dec()
+            http_request_duration.observe(time.perf_counter() - started, method, route)
+            http_requests.inc(method, route, str(status_code))
+
+
+# ---------- 数据库 ----------
+
+_POSTGREST_OPERATIONS = {
+    "GET": "select",
+    "HEAD": "select",
+    "POST": "insert",
+    "PATCH": "update",
+    "PUT": "upsert",
+    "DELETE": "delete"
+}
+
+
+class MetricsTransport(httpx.AsyncBaseTransport):
+    """记录PostgREST请求耗时的HTTP传输层，按表名和操作打标签"""
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, backend: str = "supabase"):
+        self.transport = transport
+        self.backend = backend
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        table = request.url.path.rstrip("/").rsplit("/", 1)[-1] or "unknown"
+        operation = _POSTGREST_OPERATIONS.get(request.method, request.method.lower())
+
+        db_requests_in_flight.inc(self.backend)
+        started = time.perf_counter()
+        try:
+            response = await self.transport.handle_async_request(request)
+        except Exception:
+            db_request_errors.inc(self.backend, table, operation)
+            raise
+        finally:
+            db_requests_in_flight.dec(self.backend)
+            db_request_duration.observe(time.perf_counter() - started, self.backend, table, operation)
+
+        if response.status_code >= 400:
+            db_request_errors.inc(self.backend, table, operation)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_SQL_TABLE = re.compile(r"\b(?:FROM|INTO|UPDATE)\s+[\"`]?(\w+)", re.IGNORECASE)
+
+
+def _sql_labels(statement: str) -> Tuple[str, str]:
+    operation = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "unknown"
+    match = _SQL_TABLE.search(statement)
+    return (match.group(1) if match else "unknown"), operation
+
+
+def instrument_sql_engine(engine, backend: str = "sql"):
+    """为SQLAlchemy引擎注册耗时统计（在驱动执行前后计时）"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+        db_requests_in_flight.inc(backend)
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["metrics_started"].pop()
+        db_requests_in_flight.dec(backend)
+        db_request_duration.observe(time.perf_counter() - started, backend, *_sql_labels(statement))
+
+    @event.listens_for(engine, "handle_error")
+    def _error(exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get("metrics_started"):
+            conn.info["metrics_started"].pop()
+            db_requests_in_flight.dec(backend)
+        db_request_errors.inc(backend, *_sql_labels(exception_context.statement or ""))
+
+
+# ---------- 大模型 ----------
+
+def track_llm(method: str) -> Callable:
+    """统计大模型方法调用的装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            llm_requests_in_flight.inc(method)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                llm_request_errors.inc(method)
+                raise
+            finally:
+                llm_requests_in_flight.dec(method)
+                llm_request_duration.observe(time.perf_counter() - started, method)
+        return wrapper
+    return decorator
@@ -0,0 +1,155 @@
+"""
+英语学习辅助应用 - 文档解析结果缓存
+
+解析失败后重试、部署后重新处理同一文件时不再重新解析：
+- 以（文件内容SHA-256，解析器类名，PARSER_VERSION）为键，保存在本地目录中，多个进程共用
+- 知识点按 POINT_FIELDS 的顺序存为数组（不重复字段名），整体JSON序列化后zlib压缩
+- 命中时刷新文件修改时间；写入后目录总大小超过上限时，按修改时间从旧到新删除（LRU）
+- 解析规则变化时递增 PARSER_VERSION，旧版本的缓存不再命中，并在淘汰时优先删除
+"""
+
+import asyncio
+import json
+import os
+import uuid
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:
+    # orjson为可选依赖
+    orjson = None
+
+from config import settings, ParseJobsConfig
+from services.document_parser import DocumentParser, PARSER_VERSION
+from services.metrics import metrics
+from services.parse_pool import POINT_FIELDS
+from services.responses import dumps
+
+
+CACHE_SUFFIX = ".json.z"
+
+parse_cache_requests = metrics.counter(
+    "parse_cache_requests_total", "解析结果缓存查询次数", ("result",))
+parse_cache_evictions = metrics.counter(
+    "parse_cache_evictions_total", "解析结果缓存淘汰的文件数")
+
+
+def _loads(data: bytes) -> Any:
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def encode_result(result: Dict[str, Any], parser: str) -> bytes:
+    """解析结果（不含content）编码为压缩后的字节串"""
+    return zlib.compress(dumps({
+        "parser": parser,
+        "version": PARSER_VERSION,
+        "fields": POINT_FIELDS,
+        "statistics": result.get("statistics", {}),
+        "rows": [[kp.get(field) for field in POINT_FIELDS] for kp in result.get("knowledge_points", [])]
+    }))
+
+
+def decode_result(data: bytes) -> Dict[str, Any]:
+    """还原为 DocumentParser.parse 的返回结构（不含content）"""
+    payload = _loads(zlib.decompress(data))
+    fields = payload["fields"]
+    return {
+        "success": True,
+        "statistics": payload["statistics"],
+        "knowledge_points": [
+            {field: value for field, value in zip(fields, row) if value is not None}
+            for row in payload["rows"]
+        ]
+    }
+
+
+class ParseCache:
+    """本地目录中的解析结果缓存"""
+
+    def __init__(self, config: ParseJobsConfig):
+        self.directory = Path(config.cache_dir)
+        self.max_bytes = config.cache_max_mb * 1024 * 1024
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, file_hash: str, parser: str) -> Path:
+        return self.directory / f"{file_hash}-{parser}-v{PARSER_VERSION}{CACHE_SUFFIX}"
+
+    @staticmethod
+    def parser_name(file_path: str) -> str:
+        return type(DocumentParser.get_parser(file_path)).__name__
+
+    def _read(self, path: Path) -> Optional[Dict[str, Any]]:
+        try:
+            data = path.read_bytes()
+        except FileNotFoundError:
+            return None
+        try:
+            result = decode_result(data)
+        except Exception:
+            # 损坏的缓存文件直接删除
+            path.unlink(missing_ok=True)
+            return None
+        # 刷新修改时间，淘汰时按最近使用排序
+        os.utime(path)
+        return result
+
+    def _write(self, path: Path, result: Dict[str, Any], parser: str):
+        data = encode_result(result, parser)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        staging = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        staging.write_bytes(data)
+        os.replace(staging, path)
+        self._evict()
+
+    def _evict(self):
+        """目录总大小超过上限时删除旧版本和最久未使用的缓存"""
+        entries: List[tuple] = []
+        total = 0
+        current = f"-v{PARSER_VERSION}{CACHE_SUFFIX}"
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith(CACHE_SUFFIX):
+                    continue
+                stat = entry.stat()
+                total += stat.st_size
+                # 旧版本排在前面，其次按修改时间
+                entries.append((entry.name.endswith(current), stat.st_mtime, stat.st_size, entry.path))
+
+        entries.sort()
+        for _, _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            parse_cache_evictions.inc()
+
+    async def get(self, file_hash: str, file_path: str) -> Optional[Dict[str, Any]]:
+        """查询缓存，未命中返回None"""
+        if not self.enabled:
+            return None
+        result = await asyncio.to_thread(self._read, self._path(file_hash, self.parser_name(file_path)))
+        parse_cache_requests.inc("hit" if result is not None else "miss")
+        return result
+
+    async def put(self, file_hash: str, file_path: str, result: Dict[str, Any]):
+        """保存解析成功的结果（写入失败只记录日志）"""
+        if not self.enabled or not result.get("success"):
+            return
+        parser = self.parser_name(file_path)
+        try:
+            await asyncio.to_thread(self._write, self._path(file_hash, parser), result, parser)
+        except Exception as e:
+            print(f"⚠️ 保存解析结果缓存失败: {str(e)}")
+
+
+# 创建全局解析结果缓存实例
+parse_cache = ParseCache(settings.parse_jobs)
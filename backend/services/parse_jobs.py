@@ -0,0 +1,665 @@
+"""
+英语学习辅助应用 - 教材解析任务
+
+解析接口只创建任务并立即返回202，由每个进程内固定数量的worker协程执行：
+解析文档（在解析进程池中运行，见parse_pool.py）→ 批量保存单元和知识点（见bulk_writer.py）→ 更新教材状态。
+其他教材已解析过内容相同的文件时不再解析，复制其单元和知识点（每个用户的教材各有一份）；
+否则先查解析结果缓存（见parse_cache.py），未命中时才解析。
+
+保存时不重复写入：解析结果（指定unit_numbers时只取这些单元）与已保存的知识点按内容键
+（单元标题、类型、内容、出现次序）比对，只写入新增、变化和删除的知识点（有答题记录引用的知识点及其单元保留），单元的更新和删除在同一次写入中；
+任务中断后重新执行时，上次已写入的部分同样按内容键跳过。
+
+任务记录在 parse_jobs 表中，重启或worker崩溃后不会丢失：
+- 执行中的任务定期刷新心跳，心跳超时的任务由任一进程重新领取
+- 正常关闭时把执行中的任务放回队列，重启后立即继续
+- 领取任务时按 attempts 做比较并交换，多个进程不会重复执行同一任务
+"""
+
+import asyncio
+import re
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException, status
+
+from config import settings, ParseJobsConfig
+from services.bulk_writer import BulkWriter
+from services.metrics import metrics
+from services.parse_cache import parse_cache
+from services.parse_pool import parse_pool
+from services.repository import repository
+from services.textbook_access import textbook_resolver
+from services.tracing import tracer
+from services.uploads import hash_file
+
+
+# 任务状态
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+STATUS_COMPLETED = "completed"
+STATUS_FAILED = "failed"
+ACTIVE_STATUSES = (STATUS_QUEUED, STATUS_RUNNING)
+
+# 执行阶段
+PHASE_QUEUED = "queued"
+PHASE_PARSING = "parsing"
+PHASE_SAVING = "saving"
+PHASE_DONE = "done"
+
+# 没有单元标题的知识点归入该单元
+DEFAULT_UNIT_TITLE = "Unknown"
+
+# 重新解析时比较是否变化的字段（内容键以外）
+DIFF_FIELDS = ("phonetic", "part_of_speech", "chinese_meaning", "collocations", "examples", "image_description")
+
+# 分页读取已保存的知识点时每页的行数
+READ_PAGE_SIZE = 1000
+
+# 知识点类型 -> 单元表中的数量字段
+UNIT_COUNT_FIELDS = {
+    "vocabulary": "vocabulary_count",
+    "grammar": "grammar_count",
+    "sentence": "sentence_count"
+}
+
+parse_job_duration = metrics.histogram(
+    "parse_job_duration_seconds", "教材解析任务耗时", ("status",),
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0))
+parse_job_queue_depth = metrics.gauge(
+    "parse_job_queue_depth", "本进程排队中的解析任务数")
+parse_job_running = metrics.gauge(
+    "parse_job_running", "本进程执行中的解析任务数")
+
+
+class ParseQueueFullError(RuntimeError):
+    """解析任务排队已满（由接口转换为503）"""
+
+    def to_http_exception(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=str(self),
+            headers={"Retry-After": "30"}
+        )
+
+
+class JobLostError(RuntimeError):
+    """任务已被其他进程接管"""
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+
+def _content_key(title: str, point_type: str, content: str, seen: Dict[Tuple[str, str, str], int]) -> Tuple:
+    """知识点的内容键：单元标题、类型、内容；同一单元中重复的内容按出现次序区分"""
+    base = (title, point_type, content)
+    seen[base] = seen.get(base, 0) + 1
+    return base + (seen[base],)
+
+
+def job_to_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """任务状态接口的返回内容"""
+    return {
+        "job_id": job["id"],
+        "textbook_id": job["textbook_id"],
+        "status": job["status"],
+        "phase": job.get("phase"),
+        "progress": job.get("progress") or 0,
+        "result": job.get("result"),
+        "error": job.get("error"),
+        "attempts": job.get("attempts") or 0,
+        "created_at": job.get("created_at"),
+        "started_at": job.get("started_at"),
+        "finished_at": job.get("finished_at"),
+        "status_url": f"/api/textbooks/jobs/{job['id']}"
+    }
+
+
+async def _list_all_knowledge_points(textbook_id: str, unit_ids: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """分页读取教材的全部知识点（PostgREST单次响应有行数上限，超出的行会被当作不存在）"""
+    rows: List[Dict[str, Any]] = []
+    while True:
+        page = await repository.list_knowledge_points(
+            textbook_id=textbook_id, unit_ids=unit_ids, offset=len(rows), limit=READ_PAGE_SIZE,
+            with_unit_title=False
+        )
+        # 服务端的上限可能小于页大小，读到空页才结束
+        if not page:
+            return rows
+        rows.extend(page)
+
+
+def _page_range(pages: Set[str]) -> Optional[str]:
+    # 页码或已有单元的页码范围（如"12-18"）
+    numbers = sorted(int(n) for page in pages for n in re.findall(r"\d+", str(page)))
+    if not numbers:
+        return None
+    if numbers[0] == numbers[-1]:
+        return str(numbers[0])
+    return f"{numbers[0]}-{numbers[-1]}"
+
+
+def plan_units(
+    textbook_id: str,
+    knowledge_points: List[Dict[str, Any]],
+    existing_units: List[Dict[str, Any]],
+    unit_numbers: Optional[List[int]] = None
+) -> Tuple[Dict[str, str], List[Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    按单元分组知识点，确定各单元的ID、序号、页码范围和各类知识点数量
+
+    已有的单元（按标题匹配）沿用；新单元优先使用标题中的序号（如"Unit 3"），
+    序号已被占用或标题中没有序号时排在最后。
+    指定unit_numbers时只返回这些序号的单元。
+
+    Returns:
+        (单元标题 -> 单元ID, 需新建的单元, 已有单元ID -> 需更新的字段)
+
+    Raises:
+        ValueError: 指定的单元都不在解析结果中
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for kp in knowledge_points:
+        title = kp.get("unit") or DEFAULT_UNIT_TITLE
+        group = groups.get(title)
+        if group is None:
+            group = groups[title] = {"pages": set(), "counts": dict.fromkeys(UNIT_COUNT_FIELDS.values(), 0)}
+        if kp.get("page") is not None:
+            group["pages"].add(kp["page"])
+        field = UNIT_COUNT_FIELDS.get(kp.get("type", "vocabulary"))
+        if field:
+            group["counts"][field] += 1
+
+    existing = {unit["title"]: unit for unit in existing_units}
+    used_numbers = {unit["unit_number"] for unit in existing_units}
+
+    # 新单元的序号：先分配标题中的序号，其余依次排在最后
+    numbers: Dict[str, int] = {}
+    for title in groups:
+        match = re.search(r"\d+", title)
+        if title not in existing and match and int(match.group()) not in used_numbers:
+            numbers[title] = int(match.group())
+            used_numbers.add(numbers[title])
+    next_number = max(used_numbers, default=0) + 1
+    for title in groups:
+        if title not in existing and title not in numbers:
+            numbers[title] = next_number
+            next_number += 1
+
+    for title, unit in existing.items():
+        numbers[title] = unit["unit_number"]
+    if unit_numbers:
+        groups = {title: group for title, group in groups.items() if numbers[title] in unit_numbers}
+        if not groups:
+            raise ValueError(f"教材中没有第 {', '.join(map(str, unit_numbers))} 单元")
+
+    unit_ids: Dict[str, str] = {}
+    new_units: List[Dict[str, Any]] = []
+    updates: Dict[str, Dict[str, Any]] = {}
+    for title, group in groups.items():
+        fields = {"page_range": _page_range(group["pages"]), **group["counts"]}
+        unit = existing.get(title)
+        if unit is None:
+            unit = {
+                "id": str(uuid.uuid4()),
+                "textbook_id": textbook_id,
+                "unit_number": numbers[title],
+                "title": title,
+                **fields,
+                "created_at": _now()
+            }
+            new_units.append(unit)
+        elif any(unit.get(key) != value for key, value in fields.items()):
+            updates[unit["id"]] = fields
+        unit_ids[title] = unit["id"]
+    return unit_ids, new_units, updates
+
+
+class ParseJobQueue:
+    """解析任务的排队、执行和中断恢复"""
+
+    def __init__(self, config: ParseJobsConfig):
+        self.config = config
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._recovery_task: Optional[asyncio.Task] = None
+        # 本进程已入队或执行中的任务，恢复扫描时跳过
+        self._pending: Set[str] = set()
+        # 执行中的任务ID -> 领取时的attempts
+        self._running: Dict[str, int] = {}
+        # 执行中的任务ID -> 最新进度（随心跳保存）
+        self._progress: Dict[str, int] = {}
+
+    # ---------- 生命周期 ----------
+
+    async def start(self):
+        """启动worker，并接管排队中和已中断的任务"""
+        self._queue = asyncio.Queue(maxsize=self.config.max_queue)
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"parse-worker-{i}")
+            for i in range(max(1, self.config.workers))
+        ]
+        self._recovery_task = asyncio.create_task(self._run_recovery())
+
+    async def shutdown(self):
+        """停止worker，并把执行中的任务放回队列，重启后立即继续"""
+        tasks = self._workers + ([self._recovery_task] if self._recovery_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._recovery_task = None
+
+        for job_id, attempt in list(self._running.items()):
+            try:
+                await repository.update_parse_job(job_id, {
+                    "status": STATUS_QUEUED,
+                    "phase": PHASE_QUEUED,
+                    "heartbeat_at": _now()
+                }, expected={"status": STATUS_RUNNING, "attempts": attempt})
+            except Exception as e:
+                print(f"⚠️ 释放解析任务失败 {job_id}: {str(e)}")
+        self._running.clear()
+        self._pending.clear()
+
+    # ---------- 提交 ----------
+
+    async def submit(self, textbook: Dict[str, Any], user_id: str,
+                     unit_numbers: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        创建解析任务，同一教材已有未完成的任务时直接返回该任务
+
+        Raises:
+            ParseQueueFullError: 本进程排队已满
+        """
+        active = await repository.list_parse_jobs(ACTIVE_STATUSES, textbook_id=textbook["id"])
+        if active:
+            return active[0]
+
+        if self._queue is None or self._queue.full():
+            raise ParseQueueFullError("解析任务过多，请稍后再试")
+
+        now = _now()
+        job = await repository.insert_parse_job({
+            "id": str(uuid.uuid4()),
+            "textbook_id": textbook["id"],
+            "user_id": user_id,
+            "status": STATUS_QUEUED,
+            "phase": PHASE_QUEUED,
+            "progress": 0,
+            "options": {"unit_numbers": unit_numbers},
+            "attempts": 0,
+            "heartbeat_at": now,
+            "created_at": now
+        })
+
+        await repository.update_textbook(textbook["id"], {
+            "parse_status": "processing",
+            "updated_at": now
+        })
+        textbook_resolver.invalidate(textbook["id"])
+
+        self._enqueue(job["id"])
+        return job
+
+    def _enqueue(self, job_id: str) -> bool:
+        if job_id in self._pending:
+            return True
+        try:
+            self._queue.put_nowait(job_id)
+        except asyncio.QueueFull:
+            return False
+        self._pending.add(job_id)
+        parse_job_queue_depth.inc()
+        return True
+
+    # ---------- 恢复 ----------
+
+    async def _run_recovery(self):
+        while True:
+            try:
+                await self.recover()
+            except Exception as e:
+                print(f"⚠️ 扫描解析任务失败: {str(e)}")
+            await asyncio.sleep(self.config.recovery_interval_seconds)
+
+    def _is_claimable(self, job: Dict[str, Any]) -> bool:
+        """排队中的任务，或心跳超时（执行进程已退出）的任务"""
+        if job["status"] == STATUS_QUEUED:
+            return True
+        stale_before = datetime.utcnow() - timedelta(seconds=self.config.stale_after_seconds)
+        return (job.get("heartbeat_at") or "") < stale_before.isoformat()
+
+    async def recover(self) -> int:
+        """将排队中和心跳超时的任务加入本进程队列，返回加入的数量"""
+        added = 0
+        for job in await repository.list_parse_jobs(ACTIVE_STATUSES):
+            if job["id"] in self._pending or not self._is_claimable(job):
+                continue
+            if not self._enqueue(job["id"]):
+                break
+            added += 1
+        return added
+
+    # ---------- 执行 ----------
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            parse_job_queue_depth.dec()
+            try:
+                await self._process(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ 解析任务异常 {job_id}: {str(e)}")
+            finally:
+                self._pending.discard(job_id)
+                self._queue.task_done()
+
+    async def _claim(self, job: Dict[str, Any]) -> Optional[int]:
+        """领取任务，返回本次执行的attempts；已被其他进程领取时返回None"""
+        attempt = (job.get("attempts") or 0) + 1
+        now = _now()
+        if attempt > self.config.max_attempts:
+            if await repository.update_parse_job(job["id"], {
+                "status": STATUS_FAILED,
+                "phase": PHASE_DONE,
+                "error": "解析多次中断，已放弃",
+                "finished_at": now
+            }, expected={"status": job["status"], "attempts": attempt - 1}):
+                await self._set_textbook_status(job["textbook_id"], "failed")
+            return None
+
+        claimed = await repository.update_parse_job(job["id"], {
+            "status": STATUS_RUNNING,
+            "phase": PHASE_PARSING,
+            "attempts": attempt,
+            "heartbeat_at": now,
+            "started_at": job.get("started_at") or now
+        }, expected={"status": job["status"], "attempts": attempt - 1})
+        return attempt if claimed else None
+
+    async def _process(self, job_id: str):
+        job = await repository.get_parse_job(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES or not self._is_claimable(job):
+            return
+
+        attempt = await self._claim(job)
+        if attempt is None:
+            return
+
+        self._running[job_id] = attempt
+        parse_job_running.inc()
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, attempt))
+        started = time.perf_counter()
+        outcome = STATUS_FAILED
+        try:
+            span = tracer.start_trace("parse_job", **{"job.id": job_id, "job.attempt": attempt})
+            if span is None:
+                await self._execute(job, attempt)
+            else:
+                with tracer.activate(span):
+                    await self._execute(job, attempt)
+            outcome = STATUS_COMPLETED
+        except JobLostError:
+            outcome = "lost"
+            print(f"⚠️ 解析任务已被其他进程接管: {job_id}")
+        except asyncio.CancelledError:
+            # 关闭服务时由shutdown放回队列
+            outcome = "interrupted"
+            raise
+        except Exception as e:
+            await self._fail(job, attempt, str(e))
+        finally:
+            heartbeat.cancel()
+            self._progress.pop(job_id, None)
+            parse_job_running.dec()
+            parse_job_duration.observe(time.perf_counter() - started, outcome)
+            if outcome != "interrupted":
+                self._running.pop(job_id, None)
+
+    async def _heartbeat(self, job_id: str, attempt: int):
+        while True:
+            await asyncio.sleep(self.config.heartbeat_seconds)
+            fields = {"heartbeat_at": _now()}
+            if job_id in self._progress:
+                fields["progress"] = self._progress[job_id]
+            try:
+                await repository.update_parse_job(job_id, fields,
+                                                  expected={"status": STATUS_RUNNING, "attempts": attempt})
+            except Exception as e:
+                print(f"⚠️ 刷新解析任务心跳失败 {job_id}: {str(e)}")
+
+    async def _update(self, job_id: str, attempt: int, fields: Dict[str, Any]):
+        """更新本次执行的任务状态，任务已被接管时抛出JobLostError"""
+        fields = {**fields, "heartbeat_at": _now()}
+        if not await repository.update_parse_job(job_id, fields,
+                                                 expected={"status": STATUS_RUNNING, "attempts": attempt}):
+            raise JobLostError(job_id)
+
+    async def _set_textbook_status(self, textbook_id: str, parse_status: str, **fields):
+        await repository.update_textbook(textbook_id, {
+            "parse_status": parse_status,
+            **fields,
+            "updated_at": _now()
+        })
+        textbook_resolver.invalidate(textbook_id)
+
+    async def _fail(self, job: Dict[str, Any], attempt: int, error: str):
+        updated = await repository.update_parse_job(job["id"], {
+            "status": STATUS_FAILED,
+            "phase": PHASE_DONE,
+            "error": error,
+            "finished_at": _now()
+        }, expected={"status": STATUS_RUNNING, "attempts": attempt})
+        if updated:
+            await self._set_textbook_status(job["textbook_id"], "failed")
+
+    async def _execute(self, job: Dict[str, Any], attempt: int):
+        job_id = job["id"]
+        textbook_id = job["textbook_id"]
+
+        textbook = await repository.get_textbook(textbook_id)
+        if textbook is None:
+            raise ValueError("教材不存在")
+
+        # 解析文档（已有相同内容的教材解析完成时直接复用）
+        source = await self._find_parsed_copy(textbook)
+        parse_result = await self._copy_parse_result(source) if source is not None else None
+        if parse_result is not None:
+            print(f"♻️ 教材 {textbook_id} 与 {source['id']} 内容相同，复用其解析结果")
+        else:
+            source = None
+            parse_result = await self._parse_document(textbook)
+        if not parse_result["success"]:
+            raise ValueError(parse_result.get("error", "未知错误"))
+
+        unit_numbers = (job.get("options") or {}).get("unit_numbers")
+        await self._update(job_id, attempt, {"phase": PHASE_SAVING, "progress": 10})
+
+        # 一次查询已有单元，缺少的单元与知识点一起批量新建；指定单元时只处理这些单元
+        existing_units = await repository.list_units(textbook_id)
+        unit_ids, new_units, unit_updates = plan_units(
+            textbook_id, parse_result["knowledge_points"], existing_units, unit_numbers
+        )
+        selected_units = [
+            unit for unit in existing_units if not unit_numbers or unit["unit_number"] in unit_numbers
+        ]
+
+        # 已保存的知识点（任务重新执行时也包括上次已写入的部分）按内容键比对
+        unit_titles = {unit["id"]: unit["title"] for unit in selected_units}
+        stored: Dict[Tuple, Dict[str, Any]] = {}
+        seen: Dict[Tuple[str, str, str], int] = {}
+        stored_rows = await _list_all_knowledge_points(textbook_id, list(unit_titles))
+        stored_rows.sort(key=lambda kp: (kp.get("created_at") or "", kp["id"]))
+        for row in stored_rows:
+            key = _content_key(unit_titles[row["unit_id"]], row.get("point_type"), row.get("content"), seen)
+            stored[key] = row
+
+        added: List[Dict[str, Any]] = []
+        changed: List[Tuple[Dict[str, Any], Dict[str, Any]]] = []
+        unchanged = 0
+        seen = {}
+        for kp in parse_result["knowledge_points"]:
+            title = kp.get("unit") or DEFAULT_UNIT_TITLE
+            if title not in unit_ids:
+                continue
+            row = {
+                "id": str(uuid.uuid4()),
+                "unit_id": unit_ids[title],
+                "point_type": kp.get("type", "vocabulary"),
+                "content": kp.get("content", ""),
+                "phonetic": kp.get("phonetic"),
+                "part_of_speech": kp.get("part_of_speech"),
+                "chinese_meaning": kp.get("chinese_meaning"),
+                "collocations": kp.get("collocations", []),
+                "examples": kp.get("examples", []),
+                "image_description": kp.get("image_description"),
+                "created_at": _now()
+            }
+            original = stored.pop(_content_key(title, row["point_type"], row["content"], seen), None)
+            if original is None:
+                added.append(row)
+            elif any((original.get(field) or None) != (row[field] or None) for field in DIFF_FIELDS):
+                # 沿用原有ID，学习记录和测试题目的引用不受影响
+                changed.append(({**row, "id": original["id"], "created_at": original.get("created_at")}, original))
+            else:
+                unchanged += 1
+        # 有答题记录引用的知识点保留，其所在的单元也不删除
+        answered = await repository.find_answered_knowledge_points([row["id"] for row in stored.values()])
+        removed = [row for row in stored.values() if row["id"] not in answered]
+        kept_unit_ids = {row["unit_id"] for row in stored.values() if row["id"] in answered}
+        # 本次解析结果中已没有的单元
+        stale_units = [
+            unit for unit in selected_units
+            if unit["title"] not in unit_ids and unit["id"] not in kept_unit_ids
+        ]
+        units_by_id = {unit["id"]: unit for unit in existing_units}
+
+        # 只写入新增、变化和删除的知识点及单元的变化（全部成功或全部撤销），进度由心跳一并保存
+        pending = max(1, len(added) + len(changed) + len(removed))
+
+        def on_progress(rows: int):
+            self._progress[job_id] = 10 + int(rows * 85 / pending)
+
+        async with BulkWriter(repository, settings.storage, on_progress=on_progress) as writer:
+            await writer.write_units(new_units)
+            for row in added:
+                await writer.add(row)
+            for row, original in changed:
+                await writer.add(row, original=original)
+            writer.remove(removed)
+            for unit_id, fields in unit_updates.items():
+                writer.update_unit(units_by_id[unit_id], fields)
+            writer.remove_units(stale_units)
+        write_report = writer.report()
+        diff = {
+            "added": len(added),
+            "changed": len(changed),
+            "removed": len(removed),
+            "kept": len(stored) - len(removed),
+            "unchanged": unchanged
+        }
+        print(f"📝 教材 {textbook_id} 新增 {diff['added']}、更新 {diff['changed']}、删除 {diff['removed']} 个知识点，"
+              f"{write_report['rows_per_second']} 行/秒（重试 {write_report['retries']} 次）")
+
+        # 更新教材状态和统计
+        statistics = parse_result.get("statistics", {})
+        result = {
+            "statistics": statistics,
+            "knowledge_points_count": len(added) + len(changed) + unchanged,
+            "diff": diff,
+            "write": write_report
+        }
+        if unit_numbers:
+            result["unit_numbers"] = unit_numbers
+        if source is not None:
+            result["reused_from"] = source["id"]
+        elif parse_result.get("cached"):
+            result["cached"] = True
+        await self._update(job_id, attempt, {
+            "status": STATUS_COMPLETED,
+            "phase": PHASE_DONE,
+            "progress": 100,
+            "result": result,
+            "finished_at": _now()
+        })
+        await self._set_textbook_status(textbook_id, "completed", statistics=statistics)
+
+    async def _parse_document(self, textbook: Dict[str, Any]) -> Dict[str, Any]:
+        """先查解析结果缓存，未命中时在解析进程池中解析并写入缓存"""
+        file_path = textbook["file_path"]
+        if not parse_cache.enabled:
+            return await parse_pool.parse(file_path)
+
+        # 早期上传的教材没有记录文件哈希
+        file_hash = textbook.get("file_hash") or await asyncio.to_thread(hash_file, file_path)
+        result = await parse_cache.get(file_hash, file_path)
+        if result is not None:
+            print(f"📦 教材 {textbook['id']} 命中解析结果缓存")
+            result["cached"] = True
+            return result
+
+        result = await parse_pool.parse(file_path)
+        await parse_cache.put(file_hash, file_path, result)
+        return result
+
+    async def _find_parsed_copy(self, textbook: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """查找文件内容相同且已解析完成的其他教材"""
+        if not textbook.get("file_hash"):
+            return None
+        for other in await repository.list_textbooks_by_hash(textbook["file_hash"]):
+            if other["id"] != textbook["id"] and other.get("parse_status") == "completed":
+                return other
+        return None
+
+    async def _copy_parse_result(self, source: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        把已解析教材的单元和知识点还原为 DocumentParser.parse 的返回结构
+
+        来源教材只解析了部分单元（知识点数与解析统计不符）时返回None
+        """
+        units = {unit["id"]: unit for unit in await repository.list_units(source["id"])}
+        rows = [kp for kp in await _list_all_knowledge_points(source["id"]) if kp["unit_id"] in units]
+        if len(rows) != (source.get("statistics") or {}).get("total_words"):
+            return None
+        # 按原顺序，同一单元中重复内容的出现次序不变
+        rows.sort(key=lambda kp: (units[kp["unit_id"]]["unit_number"], kp.get("created_at") or "", kp["id"]))
+
+        knowledge_points = []
+        for kp in rows:
+            unit = units[kp["unit_id"]]
+            knowledge_points.append({
+                "type": kp.get("point_type"),
+                "content": kp.get("content"),
+                "phonetic": kp.get("phonetic"),
+                "part_of_speech": kp.get("part_of_speech"),
+                "chinese_meaning": kp.get("chinese_meaning"),
+                "unit": unit["title"],
+                "page": unit.get("page_range"),
+                "collocations": kp.get("collocations") or [],
+                "examples": kp.get("examples") or [],
+                "image_description": kp.get("image_description")
+            })
+        return {
+            "success": True,
+            "statistics": source.get("statistics") or {},
+            "knowledge_points": knowledge_points
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        """任务队列统计信息"""
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+            "running": len(self._running),
+            "max_queue": self.config.max_queue
+        }
+
+
+# 创建全局解析任务队列实例
+parse_job_queue = ParseJobQueue(settings.parse_jobs)
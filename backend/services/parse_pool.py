@@ -0,0 +1,248 @@
+"""
+英语学习辅助应用 - 文档解析进程池
+
+正则提取和PDF文本抽取是纯CPU计算，在线程中执行仍会占用GIL、拖慢同进程的其他请求，
+因此放到独立的子进程中执行：
+- 子进程以spawn方式启动，不继承事件循环和连接池
+- 子进程调低调度优先级（nice），CPU紧张时优先保证处理请求的进程
+- 每个子进程限制地址空间（RLIMIT_AS），每次解析限制CPU时间（RLIMIT_CPU），外加总耗时超时
+- 只回传知识点和统计信息，不回传文档全文；知识点按固定字段顺序打包为元组，
+  每POINTS_PER_CHUNK个序列化为一段，主进程逐段还原并在段间让出事件循环
+
+pool_workers为0时退回线程池执行（不支持多进程的环境或调试时使用）。
+"""
+
+import asyncio
+import multiprocessing
+import os
+import pickle
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Optional
+
+try:
+    import resource
+except ImportError:
+    # resource仅在类Unix系统可用，其他平台不限制资源
+    resource = None
+
+from config import settings, ParseJobsConfig
+from services.document_parser import DocumentParser
+from services.tracing import traced
+
+
+# 回传的知识点字段，按此顺序打包
+POINT_FIELDS = (
+    "type", "content", "phonetic", "part_of_speech", "chinese_meaning",
+    "unit", "page", "collocations", "examples", "image_description"
+)
+
+# 每段知识点数，单段还原耗时约1毫秒量级
+POINTS_PER_CHUNK = 500
+
+# 子进程的nice增量
+WORKER_NICE = 10
+
+
+class ParseTimeoutError(RuntimeError):
+    """解析超时或超出资源限制"""
+
+
+# ---------- 子进程 ----------
+
+def _init_worker(memory_limit_mb: int):
+    """子进程初始化：调低优先级，限制地址空间"""
+    if hasattr(os, "nice"):
+        os.nice(WORKER_NICE)
+    if resource is not None and memory_limit_mb > 0:
+        limit = memory_limit_mb * 1024 * 1024
+        _, hard = resource.getrlimit(resource.RLIMIT_AS)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+
+def _limit_cpu(seconds: float):
+    """本次解析最多再使用seconds秒CPU，超出后子进程收到SIGXCPU退出"""
+    if resource is None or seconds <= 0:
+        return
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    soft = int(usage.ru_utime + usage.ru_stime + seconds) + 1
+    _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+
+
+def pack_result(result: Dict[str, Any]) -> Dict[str, Any]:
+    """去掉文档全文，知识点打包为元组并分段序列化"""
+    if not result.get("success"):
+        return {"success": False, "error": result.get("error")}
+    rows = [
+        tuple(kp.get(field) for field in POINT_FIELDS)
+        for kp in result.get("knowledge_points", [])
+    ]
+    return {
+        "success": True,
+        "statistics": result.get("statistics", {}),
+        "chunks": [
+            pickle.dumps(rows[i:i + POINTS_PER_CHUNK], protocol=pickle.HIGHEST_PROTOCOL)
+            for i in range(0, len(rows), POINTS_PER_CHUNK)
+        ]
+    }
+
+
+async def unpack_result(packed: Dict[str, Any]) -> Dict[str, Any]:
+    """还原为 DocumentParser.parse 的返回结构（不含content）"""
+    if not packed.get("success"):
+        return packed
+    knowledge_points = []
+    for chunk in packed["chunks"]:
+        knowledge_points.extend(
+            {field: value for field, value in zip(POINT_FIELDS, row) if value is not None}
+            for row in pickle.loads(chunk)
+        )
+        await asyncio.sleep(0)
+    return {
+        "success": True,
+        "statistics": packed["statistics"],
+        "knowledge_points": knowledge_points
+    }
+
+
+def _parse_in_worker(file_path: str, cpu_seconds: float) -> Dict[str, Any]:
+    _limit_cpu(cpu_seconds)
+    try:
+        packed = pack_result(DocumentParser.parse(file_path))
+    except MemoryError:
+        return {"success": False, "error": "文档过大，解析时超出内存限制"}
+    if not packed["success"] and not packed.get("error"):
+        # 解析器捕获的MemoryError没有错误信息
+        packed["error"] = "解析失败（可能超出内存限制）"
+    return packed
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+# ---------- 主进程 ----------
+
+class ParsePool:
+    """文档解析进程池"""
+
+    def __init__(self, config: ParseJobsConfig):
+        self.config = config
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+        self.restarts = 0
+
+    @property
+    def workers(self) -> int:
+        return self.config.pool_workers
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """获取进程池（首次使用时创建）"""
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                    initargs=(self.config.memory_limit_mb,)
+                )
+            return self._executor
+
+    @staticmethod
+    def _close(executor: ProcessPoolExecutor, kill: bool):
+        if kill:
+            # 执行中的子进程不会自行结束，直接终止
+            for process in list((getattr(executor, "_processes", None) or {}).values()):
+                process.kill()
+        executor.shutdown(wait=kill, cancel_futures=True)
+
+    def _reset(self, executor: ProcessPoolExecutor, kill: bool = False):
+        """丢弃损坏或超时的进程池，下次使用时重建"""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self.restarts += 1
+        self._close(executor, kill)
+
+    async def _run_in_process(self, file_path: str) -> Dict[str, Any]:
+        timeout = self.config.timeout_seconds or None
+        loop = asyncio.get_running_loop()
+
+        # 进程池损坏时（其他任务超出资源限制被终止）重试一次
+        for attempt in range(2):
+            executor = self._get_executor()
+            future = loop.run_in_executor(executor, _parse_in_worker, file_path, self.config.timeout_seconds)
+            try:
+                packed = await asyncio.wait_for(future, timeout=timeout)
+            except asyncio.TimeoutError:
+                self._reset(executor, kill=True)
+                raise ParseTimeoutError(f"解析超时（超过{self.config.timeout_seconds:g}秒）")
+            except BrokenProcessPool:
+                self._reset(executor)
+                if attempt == 1:
+                    raise ParseTimeoutError("解析进程异常退出（可能超出内存或CPU时间限制）")
+                continue
+            return await unpack_result(packed)
+
+    @traced("parse_pool.parse")
+    async def parse(self, file_path: str) -> Dict[str, Any]:
+        """
+        在子进程中解析文档，返回结构与 DocumentParser.parse 相同（不含content）
+
+        Raises:
+            ParseTimeoutError: 超时或子进程因超出资源限制退出
+        """
+        self.active += 1
+        try:
+            if self.workers <= 0:
+                result = await asyncio.to_thread(DocumentParser.parse, file_path)
+            else:
+                result = await self._run_in_process(file_path)
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.active -= 1
+        self.completed += 1
+        return result
+
+    async def warmup(self):
+        """预先启动全部子进程，避免首次解析承担进程启动和导入耗时"""
+        if self.workers <= 0:
+            return
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor()
+        await asyncio.gather(*(loop.run_in_executor(executor, _ping) for _ in range(self.workers)))
+
+    def shutdown(self):
+        """关闭进程池（执行中的解析已由任务队列放回，子进程直接终止）"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            self._close(executor, kill=True)
+
+    def stats(self) -> Dict[str, Any]:
+        """进程池统计信息"""
+        return {
+            "workers": self.workers,
+            "active": self.active,
+            "completed": self.completed,
+            "failed": self.failed,
+            "restarts": self.restarts
+        }
+
+
+# 创建全局解析进程池实例
+parse_pool = ParsePool(settings.parse_jobs)
@@ -0,0 +1,162 @@
+"""
+英语学习辅助应用 - 密码哈希服务
+
+在独立的有界线程池中执行bcrypt计算，避免阻塞事件循环
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import settings
+from services.metrics import metrics
+
+
+password_hash_pending = metrics.gauge(
+    "password_hash_pending", "已提交到哈希线程池、尚未完成的任务数")
+password_hash_active = metrics.gauge(
+    "password_hash_active", "哈希线程池中执行中的任务数")
+password_hash_rejected = metrics.counter(
+    "password_hash_rejected_total", "哈希线程池排队已满被拒绝的任务数")
+
+
+def build_crypt_context(rounds: int) -> CryptContext:
+    """
+    创建密码加密上下文
+
+    min/max rounds与默认值一致，计算强度变更后旧哈希会被判定为需要更新
+    """
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=rounds,
+        bcrypt__max_rounds=rounds
+    )
+
+
+class PasswordHasherBusyError(RuntimeError):
+    """密码哈希队列已满"""
+    pass
+
+
+class PasswordHasher:
+    """有界的异步密码哈希执行器"""
+
+    def __init__(self, context: CryptContext, max_workers: int = 2, max_pending: int = 64):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # 统计计数
+        self.pending = 0
+        self.active = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.total_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """获取专用线程池（首次使用时创建）"""
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self.max_workers,
+                thread_name_prefix="password-hash"
+            )
+        return self._executor
+
+    def _run(self, func: Callable, *args) -> Any:
+        """在工作线程中执行哈希计算并记录耗时"""
+        with self._lock:
+            self.active += 1
+        password_hash_active.inc()
+        started = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.active -= 1
+                self.completed += 1
+                self.total_seconds += elapsed
+            password_hash_active.dec()
+
+    async def _submit(self, func: Callable, *args) -> Any:
+        """提交任务到线程池，排队任务过多时直接拒绝"""
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            password_hash_rejected.inc()
+            raise PasswordHasherBusyError("密码校验请求过多，请稍后重试")
+
+        self.pending += 1
+        password_hash_pending.inc()
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), self._run, func, *args)
+        finally:
+            self.pending -= 1
+            password_hash_pending.dec()
+
+    @property
+    def queue_depth(self) -> int:
+        """等待工作线程的任务数"""
+        return max(0, self.pending - self.active)
+
+    async def hash(self, password: str) -> str:
+        """生成密码哈希"""
+        return await self._submit(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        """验证密码"""
+        return await self._submit(self.context.verify, password, hashed_password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        验证密码，并在计算强度变更时返回新的哈希
+
+        Returns:
+            (是否验证通过, 新哈希或None)
+        """
+        return await self._submit(self.context.verify_and_update, password, hashed_password)
+
+    async def warmup(self):
+        """预先创建工作线程并加载bcrypt后端"""
+        await self._submit(self.context.hash, "warmup")
+
+    def stats(self) -> Dict[str, Any]:
+        """线程池统计信息"""
+        return {
+            "workers": self.max_workers,
+            "max_pending": self.max_pending,
+            "pending": self.pending,
+            "active": self.active,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_seconds": round(self.total_seconds / self.completed, 4) if self.completed else 0.0
+        }
+
+    def shutdown(self):
+        """关闭线程池"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+
+# 密码加密上下文
+pwd_context = build_crypt_context(settings.auth.bcrypt_rounds)
+
+# 创建全局密码哈希服务实例
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.auth.hash_workers,
+    max_pending=settings.auth.hash_max_pending
+)
@@ -0,0 +1,220 @@
+"""
+英语学习辅助应用 - 请求采样分析
+
+按需对单个请求做栈采样：请求头携带管理员令牌或按比例随机命中时，
+后台线程定时抓取事件循环线程的调用栈，请求结束后写出折叠栈文件
+（flamegraph.pl / speedscope 可直接读取）和一份摘要JSON。
+
+事件循环正在执行其他请求或空闲等待I/O时，样本分别记为
+[other tasks] 和 [idle: awaiting I/O]，便于区分CPU耗时与等待数据库/大模型的时间。
+"""
+
+import asyncio
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from config import settings, ProfilingConfig
+
+
+PROFILE_HEADER = b"x-profile-token"
+PROFILE_ID_PATTERN = re.compile(r"^[0-9]{8}T[0-9]{6}-[0-9a-f]{8}$")
+
+_BACKEND_DIR = str(Path(__file__).resolve().parent.parent) + os.sep
+
+
+def _frame_label(code) -> str:
+    """栈帧名称：函数名 (相对路径:定义行号)"""
+    filename = code.co_filename
+    if filename.startswith(_BACKEND_DIR):
+        filename = filename[len(_BACKEND_DIR):]
+    elif "site-packages" + os.sep in filename:
+        filename = filename.split("site-packages" + os.sep, 1)[1]
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StackSampler(threading.Thread):
+    """对指定线程和协程任务做定时栈采样的后台线程"""
+
+    def __init__(self, thread_id: int, loop: asyncio.AbstractEventLoop, task: Optional[asyncio.Task],
+                 interval: float):
+        super().__init__(name="request-profiler", daemon=True)
+        self.thread_id = thread_id
+        self.loop = loop
+        self.task = task
+        self.interval = interval
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self._stop_event = threading.Event()
+        self._on_finish = None
+
+    def _sample(self):
+        current = asyncio.current_task(self.loop)
+        if current is None:
+            stack = "[idle: awaiting I/O]"
+        elif current is not self.task:
+            stack = "[other tasks]"
+        else:
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            stack = ";".join(reversed(labels))
+        self.stacks[stack] += 1
+        self.samples += 1
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self._sample()
+            except Exception:
+                # 采样失败不影响请求本身
+                pass
+
+        if self._on_finish is not None:
+            self._on_finish(self)
+
+    def finish(self, on_finish):
+        """停止采样，由采样线程执行on_finish（写文件不占用事件循环）"""
+        self._on_finish = on_finish
+        self._stop_event.set()
+
+
+class RequestProfiler:
+    """请求采样分析器"""
+
+    def __init__(self, config: ProfilingConfig):
+        self.config = config
+        self.output_dir = Path(config.output_dir)
+        self._active = False
+
+    def should_profile(self, headers: Dict[bytes, bytes]) -> Optional[str]:
+        """判断是否分析当前请求，返回触发方式（header / sample）"""
+        if not self.config.enabled or self._active:
+            return None
+
+        token = headers.get(PROFILE_HEADER)
+        if token and self.config.token and hmac.compare_digest(token.decode("latin-1"), self.config.token):
+            return "header"
+
+        if self.config.sample_rate > 0 and random.random() < self.config.sample_rate:
+            return "sample"
+        return None
+
+    def start(self) -> StackSampler:
+        self._active = True
+        sampler = StackSampler(
+            threading.get_ident(),
+            asyncio.get_running_loop(),
+            asyncio.current_task(),
+            self.config.interval_ms / 1000
+        )
+        sampler.start()
+        return sampler
+
+    def stop(self, sampler: StackSampler, summary: Dict[str, Any]):
+        self._active = False
+        sampler.finish(lambda s: self._write(s, summary))
+
+    def _write(self, sampler: StackSampler, summary: Dict[str, Any]):
+        """写出折叠栈文件和摘要，并清理超出数量上限的旧结果"""
+        profile_id = summary["id"]
+        summary["samples"] = sampler.samples
+
+        try:
+            self.output_dir.mkdir(parents=True, exist_ok=True)
+            with open(self.output_dir / f"{profile_id}.folded", "w", encoding="utf-8") as f:
+                for stack, count in sampler.stacks.most_common():
+                    f.write(f"{stack} {count}\n")
+            with open(self.output_dir / f"{profile_id}.json", "w", encoding="utf-8") as f:
+                json.dump(summary, f, ensure_ascii=False)
+
+            summaries = sorted(self.output_dir.glob("*.json"))
+            for old in summaries[:max(0, len(summaries) - self.config.max_profiles)]:
+                old.unlink(missing_ok=True)
+                old.with_suffix(".folded").unlink(missing_ok=True)
+        except OSError as e:
+            print(f"⚠️ 写入请求分析结果失败: {str(e)}")
+
+    def list_profiles(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """最近的分析结果摘要（按时间倒序）"""
+        if not self.output_dir.exists():
+            return []
+
+        profiles = []
+        for path in sorted(self.output_dir.glob("*.json"), reverse=True)[:limit]:
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def profile_path(self, profile_id: str) -> Optional[Path]:
+        """折叠栈文件路径，ID不合法或文件不存在时返回None"""
+        if not PROFILE_ID_PATTERN.match(profile_id):
+            return None
+        path = self.output_dir / f"{profile_id}.folded"
+        return path if path.exists() else None
+
+
+class ProfilingMiddleware:
+    """按需分析单个请求的ASGI中间件"""
+
+    def __init__(self, app, profiler: Optional[RequestProfiler] = None):
+        self.app = app
+        self.profiler = profiler or request_profiler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trigger = self.profiler.should_profile(dict(scope.get("headers") or []))
+        if trigger is None:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started_at = datetime.utcnow()
+        started = time.perf_counter()
+        sampler = self.profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = getattr(scope.get("route"), "path", None)
+            self.profiler.stop(sampler, {
+                "id": f"{started_at.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}",
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "route": route,
+                "status": status_code,
+                "trigger": trigger,
+                "wall_ms": round((time.perf_counter() - started) * 1000, 2),
+                "interval_ms": self.profiler.config.interval_ms,
+                "started_at": started_at.isoformat()
+            })
+
+
+# 创建全局请求分析实例
+request_profiler = RequestProfiler(settings.profiling)
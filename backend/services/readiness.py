@@ -0,0 +1,77 @@
+"""
+英语学习辅助应用 - 就绪状态
+
+供负载均衡/编排系统探测：启动预热完成前和收到SIGTERM后返回未就绪，
+使流量在连接池就绪后才进入，并在进程退出前提前摘除。
+"""
+
+import signal
+import time
+from typing import Any, Dict, Optional
+
+
+class Readiness:
+    """进程就绪状态"""
+
+    def __init__(self):
+        self.ready = False
+        self.draining = False
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self._installed = False
+
+    def mark_ready(self):
+        """启动预热完成"""
+        self.ready = True
+        self.ready_at = time.time()
+
+    def start_draining(self):
+        """开始退出，不再接收新流量"""
+        self.draining = True
+
+    @property
+    def is_ready(self) -> bool:
+        return self.ready and not self.draining
+
+    @property
+    def state(self) -> str:
+        if self.draining:
+            return "draining"
+        return "ready" if self.ready else "starting"
+
+    def install_signal_handlers(self):
+        """
+        收到SIGTERM时标记为退出中
+
+        保留服务器原有的信号处理（uvicorn据此停止接收连接并等待进行中的请求完成），
+        只在其前面插入状态变更；必须在主线程中调用。
+        """
+        if self._installed:
+            return
+
+        previous = signal.getsignal(signal.SIGTERM)
+
+        def handle_sigterm(signum, frame):
+            self.start_draining()
+            if callable(previous):
+                previous(signum, frame)
+            elif previous == signal.SIG_DFL:
+                raise SystemExit(128 + signum)
+
+        try:
+            signal.signal(signal.SIGTERM, handle_sigterm)
+            self._installed = True
+        except ValueError:
+            # 非主线程（如测试客户端）中无法注册信号处理
+            pass
+
+    def status(self) -> Dict[str, Any]:
+        """就绪状态信息"""
+        return {
+            "status": self.state,
+            "startup_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None
+        }
+
+
+# 创建全局就绪状态实例
+readiness = Readiness()
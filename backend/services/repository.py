@@ -0,0 +1,607 @@
+"""
+英语学习辅助应用 - 数据访问层
+
+统一封装用户、教材、单元、知识点、测试记录的读写，存储后端可在配置中切换：
+- supabase: 通过PostgREST访问Supabase（默认）
+- sql: 通过SQLAlchemy异步引擎直连SQLite/Postgres
+"""
+
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Iterable, List, Optional, Set
+
+from config import settings, StorageConfig
+
+
+POINT_TYPES = ("vocabulary", "grammar", "sentence")
+
+
+class BaseRepository(ABC):
+    """数据访问基类"""
+
+    # ---------- 用户 ----------
+
+    @abstractmethod
+    async def get_user(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """根据ID获取用户"""
+        pass
+
+    @abstractmethod
+    async def get_users(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """根据ID批量获取用户"""
+        pass
+
+    @abstractmethod
+    async def get_user_by_email(self, email: str) -> Optional[Dict[str, Any]]:
+        """根据邮箱获取用户（不区分大小写）"""
+        pass
+
+    @abstractmethod
+    async def find_existing_emails(self, emails: Iterable[str]) -> Set[str]:
+        """返回已被注册的邮箱（小写）"""
+        pass
+
+    @abstractmethod
+    async def insert_users(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """批量创建用户"""
+        pass
+
+    @abstractmethod
+    async def update_user(self, user_id: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """更新用户"""
+        pass
+
+    @abstractmethod
+    async def assign_family_id(self, user_id: str, family_id: str) -> Optional[str]:
+        """用户还没有家庭ID时设置为family_id（条件更新），返回用户最终的家庭ID"""
+        pass
+
+    @abstractmethod
+    async def list_disabled_user_ids(self) -> List[str]:
+        """获取已禁用用户ID"""
+        pass
+
+    # ---------- 令牌吊销 ----------
+
+    @abstractmethod
+    async def insert_token_revocation(self, row: Dict[str, Any]):
+        """记录已注销的令牌"""
+        pass
+
+    @abstractmethod
+    async def list_token_revocations(self, expires_after: str) -> List[Dict[str, Any]]:
+        """获取尚未过期的已注销令牌"""
+        pass
+
+    # ---------- 教材 ----------
+
+    @abstractmethod
+    async def get_textbook(self, textbook_id: str) -> Optional[Dict[str, Any]]:
+        """获取教材"""
+        pass
+
+    @abstractmethod
+    async def get_textbooks(self, textbook_ids: List[str]) -> List[Dict[str, Any]]:
+        """根据ID批量获取教材"""
+        pass
+
+    @abstractmethod
+    async def list_textbooks(self, user_id: str) -> List[Dict[str, Any]]:
+        """获取用户的教材列表（按创建时间倒序）"""
+        pass
+
+    @abstractmethod
+    async def list_textbooks_by_hash(self, file_hash: str) -> List[Dict[str, Any]]:
+        """获取文件内容相同的教材（所有用户，按更新时间倒序）"""
+        pass
+
+    @abstractmethod
+    async def insert_textbook(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """创建教材"""
+        pass
+
+    @abstractmethod
+    async def update_textbook(self, textbook_id: str, fields: Dict[str, Any]):
+        """更新教材"""
+        pass
+
+    @abstractmethod
+    async def delete_textbook(self, textbook_id: str):
+        """删除教材及其单元、知识点"""
+        pass
+
+    # ---------- 单元 ----------
+
+    @abstractmethod
+    async def list_units(self, textbook_id: str) -> List[Dict[str, Any]]:
+        """获取教材的单元列表（按单元序号排序）"""
+        pass
+
+    @abstractmethod
+    async def list_units_for_textbooks(self, textbook_ids: List[str]) -> List[Dict[str, Any]]:
+        """批量获取多本教材的单元（按单元序号排序）"""
+        pass
+
+    @abstractmethod
+    async def get_units(self, unit_ids: List[str]) -> List[Dict[str, Any]]:
+        """根据ID批量获取单元"""
+        pass
+
+    @abstractmethod
+    async def insert_unit(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """创建单元"""
+        pass
+
+    @abstractmethod
+    async def insert_units(self, rows: List[Dict[str, Any]], transaction: Any = None):
+        """批量创建单元（id由调用方生成）"""
+        pass
+
+    @abstractmethod
+    async def update_unit(self, unit_id: str, fields: Dict[str, Any], transaction: Any = None):
+        """更新单元"""
+        pass
+
+    @abstractmethod
+    async def delete_units(self, unit_ids: List[str], transaction: Any = None):
+        """删除单元及其知识点"""
+        pass
+
+    @abstractmethod
+    async def count_points_by_unit(self, textbook_id: str,
+                                   unit_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+        """统计教材各单元的知识点数量 {unit_id: {point_type: count}}，已知单元ID时可直接传入"""
+        pass
+
+    # ---------- 知识点 ----------
+
+    @abstractmethod
+    async def list_knowledge_points(self,
+                                    textbook_id: Optional[str] = None,
+                                    unit_ids: Optional[List[str]] = None,
+                                    point_types: Optional[List[str]] = None,
+                                    offset: int = 0,
+                                    limit: Optional[int] = None,
+                                    with_unit_title: bool = True) -> List[Dict[str, Any]]:
+        """
+        查询知识点
+
+        结果中附带所属单元标题unit_title（with_unit_title为False时可省略）；
+        指定教材但教材没有单元时返回空列表
+        """
+        pass
+
+    @abstractmethod
+    async def get_knowledge_point(self, knowledge_point_id: str) -> Optional[Dict[str, Any]]:
+        """获取知识点（附带所属单元标题unit_title）"""
+        pass
+
+    @abstractmethod
+    async def get_knowledge_points(self, knowledge_point_ids: List[str]) -> List[Dict[str, Any]]:
+        """根据ID批量获取知识点（不附带单元标题）"""
+        pass
+
+    @abstractmethod
+    async def insert_knowledge_point(self, row: Dict[str, Any]):
+        """创建知识点"""
+        pass
+
+    @abstractmethod
+    async def insert_knowledge_points(self, rows: List[Dict[str, Any]], transaction: Any = None):
+        """批量写入知识点（id由调用方生成，按id覆盖写入，重试不会产生重复行）"""
+        pass
+
+    @abstractmethod
+    async def delete_knowledge_points(self, knowledge_point_ids: List[str], transaction: Any = None):
+        """根据ID批量删除知识点"""
+        pass
+
+    @abstractmethod
+    async def find_answered_knowledge_points(self, knowledge_point_ids: List[str]) -> Set[str]:
+        """返回有答题记录引用的知识点ID"""
+        pass
+
+    # ---------- 解析任务 ----------
+
+    @abstractmethod
+    async def insert_parse_job(self, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """创建解析任务"""
+        pass
+
+    @abstractmethod
+    async def get_parse_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """获取解析任务"""
+        pass
+
+    @abstractmethod
+    async def list_parse_jobs(self, statuses: List[str], textbook_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取指定状态的解析任务（按创建时间排序）"""
+        pass
+
+    @abstractmethod
+    async def update_parse_job(self, job_id: str, fields: Dict[str, Any],
+                               expected: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        更新解析任务
+
+        指定expected时仅在这些字段仍等于给定值时更新（比较并交换），返回是否更新成功
+        """
+        pass
+
+    # ---------- 测试记录 ----------
+
+    @abstractmethod
+    async def get_test_record(self, test_id: str) -> Optional[Dict[str, Any]]:
+        """获取测试记录"""
+        pass
+
+    @abstractmethod
+    async def list_test_records(self,
+                                user_id: str,
+                                status: Optional[str] = None,
+                                offset: int = 0,
+                                limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """获取用户的测试记录（按创建时间倒序）"""
+        pass
+
+    @abstractmethod
+    async def insert_test_record(self, row: Dict[str, Any]):
+        """创建测试记录"""
+        pass
+
+    @abstractmethod
+    async def update_test_record(self, test_id: str, fields: Dict[str, Any]):
+        """更新测试记录"""
+        pass
+
+    @abstractmethod
+    async def list_answer_records(self, test_id: str) -> List[Dict[str, Any]]:
+        """获取测试的答题记录"""
+        pass
+
+    @abstractmethod
+    async def insert_answer_record(self, row: Dict[str, Any]):
+        """创建答题记录"""
+        pass
+
+    @asynccontextmanager
+    async def transaction(self) -> AsyncIterator[Any]:
+        """
+        开启写事务，传给批量写入方法的transaction参数，正常退出时提交，异常时回滚
+
+        PostgREST无法跨请求开启事务，返回None，由调用方在失败时删除已写入的数据
+        """
+        yield None
+
+    async def warmup(self):
+        """预先建立连接"""
+        pass
+
+    async def close(self):
+        """释放连接资源"""
+        pass
+
+
+# 按ID列表过滤时每次请求的ID数
+IN_FILTER_CHUNK_SIZE = 100
+
+# 分页读取时每页的行数（PostgREST单次响应有行数上限，默认1000）
+READ_PAGE_SIZE = 1000
+
+
+def _first(response) -> Optional[Dict[str, Any]]:
+    """取PostgREST响应中的第一行"""
+    if response.data and len(response.data) > 0:
+        return response.data[0]
+    return None
+
+
+def _quote(value: str) -> str:
+    """or/in过滤中的取值加双引号（值中可能含逗号、括号）"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _minimal():
+    """写入时不回传数据（Prefer: return=minimal）"""
+    from postgrest.types import ReturnMethod
+    return ReturnMethod.minimal
+
+
+class SupabaseRepository(BaseRepository):
+    """基于Supabase PostgREST的数据访问实现"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def table(self, table_name: str):
+        return self.client.table(table_name)
+
+    async def _select_in(self, table_name: str, column: str, values: List[str], order: Optional[str] = None):
+        """按列批量查询（一次in_请求）"""
+        if not values:
+            return []
+        query = self.table(table_name).select("*").in_(column, list(values))
+        if order:
+            query = query.order(order)
+        response = await query.execute()
+        return response.data or []
+
+    async def get_user(self, user_id):
+        return _first(await self.table("users").select("*").eq("id", user_id).execute())
+
+    async def get_users(self, user_ids):
+        return await self._select_in("users", "id", user_ids)
+
+    async def get_user_by_email(self, email):
+        # ilike不区分大小写，模式中的通配符可能多匹配，再按小写精确比较
+        response = await self.table("users").select("*").ilike("email", email).execute()
+        return next((u for u in response.data or [] if u["email"].lower() == email.lower()), None)
+
+    async def find_existing_emails(self, emails):
+        emails = {e.lower() for e in emails}
+        if not emails:
+            return set()
+        conditions = ",".join(f"email.ilike.{_quote(email)}" for email in emails)
+        response = await self.table("users").select("email").or_(conditions).execute()
+        return {u["email"].lower() for u in response.data or []} & emails
+
+    async def insert_users(self, rows):
+        if not rows:
+            return []
+        response = await self.table("users").insert(rows).execute()
+        return response.data or []
+
+    async def update_user(self, user_id, fields):
+        return _first(await self.table("users").update(fields).eq("id", user_id).execute())
+
+    async def assign_family_id(self, user_id, family_id):
+        response = await self.table("users").update({"family_id": family_id}).eq(
+            "id", user_id
+        ).is_("family_id", "null").execute()
+        if response.data:
+            return family_id
+        user = await self.get_user(user_id)
+        return user["family_id"] if user else None
+
+    async def list_disabled_user_ids(self):
+        response = await self.table("users").select("id").eq("is_active", False).execute()
+        return [u["id"] for u in response.data or []]
+
+    async def insert_token_revocation(self, row):
+        await self.table("token_revocations").insert(row).execute()
+
+    async def list_token_revocations(self, expires_after):
+        response = await self.table("token_revocations").select("jti, expires_at").gt(
+            "expires_at", expires_after
+        ).execute()
+        return response.data or []
+
+    async def get_textbook(self, textbook_id):
+        return _first(await self.table("textbooks").select("*").eq("id", textbook_id).execute())
+
+    async def get_textbooks(self, textbook_ids):
+        return await self._select_in("textbooks", "id", textbook_ids)
+
+    async def list_textbooks(self, user_id):
+        response = await self.table("textbooks").select("*").eq("user_id", user_id).order("created_at", desc=True).execute()
+        return response.data or []
+
+    async def list_textbooks_by_hash(self, file_hash):
+        response = await self.table("textbooks").select("*").eq("file_hash", file_hash).order("updated_at", desc=True).execute()
+        return response.data or []
+
+    async def insert_textbook(self, row):
+        return _first(await self.table("textbooks").insert(row).execute())
+
+    async def update_textbook(self, textbook_id, fields):
+        await self.table("textbooks").update(fields).eq("id", textbook_id).execute()
+
+    async def delete_textbook(self, textbook_id):
+        # 数据库外键级联删除关联的单元和知识点
+        await self.table("textbooks").delete().eq("id", textbook_id).execute()
+
+    async def list_units(self, textbook_id):
+        response = await self.table("units").select("*").eq("textbook_id", textbook_id).order("unit_number").execute()
+        return response.data or []
+
+    async def list_units_for_textbooks(self, textbook_ids):
+        return await self._select_in("units", "textbook_id", textbook_ids, order="unit_number")
+
+    async def get_units(self, unit_ids):
+        return await self._select_in("units", "id", unit_ids)
+
+    async def insert_unit(self, row):
+        return _first(await self.table("units").insert(row).execute())
+
+    async def insert_units(self, rows, transaction=None):
+        if rows:
+            await self.table("units").insert(rows, returning=_minimal()).execute()
+
+    async def update_unit(self, unit_id, fields, transaction=None):
+        await self.table("units").update(fields, returning=_minimal()).eq("id", unit_id).execute()
+
+    async def delete_units(self, unit_ids, transaction=None):
+        if not unit_ids:
+            return
+        await self.table("knowledge_points").delete(returning=_minimal()).in_("unit_id", list(unit_ids)).execute()
+        await self.table("units").delete(returning=_minimal()).in_("id", list(unit_ids)).execute()
+
+    async def count_points_by_unit(self, textbook_id, unit_ids=None):
+        if unit_ids is None:
+            unit_ids = [u["id"] for u in await self.list_units(textbook_id)]
+        counts = {uid: {t: 0 for t in POINT_TYPES} for uid in unit_ids}
+        if not counts:
+            return counts
+
+        # 分页读取直到返回空页：超出max-rows的行会被静默截断，不能以不满一页判断结束
+        offset = 0
+        while True:
+            response = await self.table("knowledge_points").select("unit_id, point_type").in_(
+                "unit_id", list(counts)
+            ).order("id").range(offset, offset + READ_PAGE_SIZE - 1).execute()
+            rows = response.data or []
+            if not rows:
+                return counts
+            for kp in rows:
+                unit_counts = counts.get(kp["unit_id"])
+                if unit_counts is not None and kp.get("point_type") in unit_counts:
+                    unit_counts[kp["point_type"]] += 1
+            offset += len(rows)
+
+    async def list_knowledge_points(self, textbook_id=None, unit_ids=None, point_types=None, offset=0, limit=None,
+                                    with_unit_title=True):
+        query = self.table("knowledge_points").select("*")
+
+        if textbook_id:
+            # PostgREST无法直接按教材过滤，先取该教材的单元
+            units_resp = await self.table("units").select("id, title").eq("textbook_id", textbook_id).execute()
+            unit_titles = {u["id"]: u["title"] for u in units_resp.data or []}
+            allowed = list(unit_titles) if unit_ids is None else [uid for uid in unit_ids if uid in unit_titles]
+        else:
+            allowed = list(unit_ids or [])
+            unit_titles = None
+
+        if (textbook_id or unit_ids is not None) and not allowed:
+            return []
+        if allowed:
+            query = query.in_("unit_id", allowed)
+
+        if point_types:
+            query = query.in_("point_type", list(point_types))
+
+        if limit is not None:
+            # 分页时固定顺序，否则各页之间可能重复或遗漏
+            query = query.order("id").range(offset, offset + limit - 1)
+
+        response = await query.execute()
+        rows = response.data or []
+
+        if not with_unit_title:
+            return rows
+
+        if unit_titles is None and rows:
+            unit_ids_in_rows = list({kp["unit_id"] for kp in rows})
+            units_resp = await self.table("units").select("id, title").in_("id", unit_ids_in_rows).execute()
+            unit_titles = {u["id"]: u["title"] for u in units_resp.data or []}
+
+        for kp in rows:
+            kp["unit_title"] = (unit_titles or {}).get(kp["unit_id"])
+        return rows
+
+    async def get_knowledge_point(self, knowledge_point_id):
+        kp = _first(await self.table("knowledge_points").select("*").eq("id", knowledge_point_id).execute())
+        if kp is None:
+            return None
+
+        unit = _first(await self.table("units").select("title").eq("id", kp["unit_id"]).execute())
+        kp["unit_title"] = unit["title"] if unit else None
+        return kp
+
+    async def get_knowledge_points(self, knowledge_point_ids):
+        return await self._select_in("knowledge_points", "id", knowledge_point_ids)
+
+    async def insert_knowledge_point(self, row):
+        await self.table("knowledge_points").insert(row).execute()
+
+    async def insert_knowledge_points(self, rows, transaction=None):
+        if not rows:
+            return
+        # 按id合并写入，超时重试时已写入的行不会重复；不回传写入的行
+        await self.table("knowledge_points").upsert(rows, on_conflict="id", returning=_minimal()).execute()
+
+    async def delete_knowledge_points(self, knowledge_point_ids, transaction=None):
+        if knowledge_point_ids:
+            await self.table("knowledge_points").delete(returning=_minimal()).in_(
+                "id", list(knowledge_point_ids)
+            ).execute()
+
+    async def find_answered_knowledge_points(self, knowledge_point_ids):
+        ids = list(knowledge_point_ids)
+        answered = set()
+        # 分批查询，避免URL过长
+        for i in range(0, len(ids), IN_FILTER_CHUNK_SIZE):
+            response = await self.table("answer_records").select("knowledge_point_id").in_(
+                "knowledge_point_id", ids[i:i + IN_FILTER_CHUNK_SIZE]
+            ).execute()
+            answered.update(row["knowledge_point_id"] for row in response.data or [])
+        return answered
+
+    async def insert_parse_job(self, row):
+        return _first(await self.table("parse_jobs").insert(row).execute())
+
+    async def get_parse_job(self, job_id):
+        return _first(await self.table("parse_jobs").select("*").eq("id", job_id).execute())
+
+    async def list_parse_jobs(self, statuses, textbook_id=None):
+        query = self.table("parse_jobs").select("*").in_("status", list(statuses))
+        if textbook_id:
+            query = query.eq("textbook_id", textbook_id)
+        response = await query.order("created_at").execute()
+        return response.data or []
+
+    async def update_parse_job(self, job_id, fields, expected=None):
+        query = self.table("parse_jobs").update(fields).eq("id", job_id)
+        for column, value in (expected or {}).items():
+            query = query.eq(column, value)
+        response = await query.execute()
+        return bool(response.data)
+
+    async def get_test_record(self, test_id):
+        return _first(await self.table("test_records").select("*").eq("id", test_id).execute())
+
+    async def list_test_records(self, user_id, status=None, offset=0, limit=None):
+        query = self.table("test_records").select("*").eq("user_id", user_id)
+        if status:
+            query = query.eq("status", status)
+        query = query.order("created_at", desc=True)
+        if limit is not None:
+            query = query.range(offset, offset + limit - 1)
+        response = await query.execute()
+        return response.data or []
+
+    async def insert_test_record(self, row):
+        await self.table("test_records").insert(row).execute()
+
+    async def update_test_record(self, test_id, fields):
+        await self.table("test_records").update(fields).eq("id", test_id).execute()
+
+    async def list_answer_records(self, test_id):
+        response = await self.table("answer_records").select("*").eq("test_id", test_id).execute()
+        return response.data or []
+
+    async def insert_answer_record(self, row):
+        await self.table("answer_records").insert(row).execute()
+
+    async def warmup(self):
+        await self.table("users").select("id").limit(1).execute()
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_repository(config: StorageConfig) -> BaseRepository:
+    """根据存储配置创建数据访问实例"""
+    if config.backend == "sql":
+        # SQLAlchemy异步驱动按需导入
+        from services.sql_repository import SQLRepository
+        repo = SQLRepository(
+            config.database_url,
+            pool_size=config.pool_size,
+            create_tables=config.create_tables,
+            echo=config.echo
+        )
+    elif config.backend == "supabase":
+        from services.supabase_pool import supabase
+        repo = SupabaseRepository(supabase)
+    else:
+        raise ValueError(f"不支持的存储后端: {config.backend}")
+
+    if settings.tracing.enabled:
+        # 每次数据访问记录一个span
+        from services.tracing import trace_repository
+        trace_repository(repo)
+    return repo
+
+
+# 创建全局数据访问实例
+repository = create_repository(settings.storage)
@@ -0,0 +1,47 @@
+"""
+英语学习辅助应用 - 快速JSON响应
+
+大列表接口（知识点、测试题、统计）的数据由接口自己构建，结构已确定，
+直接返回 FastJSONResponse 可跳过 response_model 的逐项校验和 jsonable_encoder，
+安装 orjson 时用其序列化，否则退回标准库 json。
+"""
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    # orjson为可选依赖
+    orjson = None
+
+
+def _default(value: Any) -> Any:
+    """标准库json无法直接序列化的类型"""
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    """序列化为UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        content,
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+        default=_default
+    ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """跳过响应模型校验的JSON响应"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,446 @@
+"""
+英语学习辅助应用 - SQL数据访问实现
+
+基于已有的SQLAlchemy模型，通过异步引擎直连SQLite/Postgres，
+使用JOIN和聚合查询代替PostgREST的多次往返
+"""
+
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import DateTime, delete, func, insert, inspect, select, text, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from database import (
+    Base, User, Textbook, Unit, KnowledgePoint,
+    TestRecord, AnswerRecord, TokenRevocation, ParseJob
+)
+from services.metrics import instrument_sql_engine
+from services.repository import BaseRepository, POINT_TYPES
+
+
+def _to_dict(obj) -> Dict[str, Any]:
+    """将模型实例转换为与PostgREST返回格式一致的字典"""
+    data = {}
+    for column in obj.__table__.columns:
+        value = getattr(obj, column.key)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data[column.key] = value
+    return data
+
+
+def _coerce(model, fields: Dict[str, Any]) -> Dict[str, Any]:
+    """过滤未知字段，并把ISO时间字符串转换为datetime"""
+    columns = model.__table__.columns
+    values = {}
+    for key, value in fields.items():
+        if key not in columns:
+            continue
+        if isinstance(value, str) and isinstance(columns[key].type, DateTime):
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        values[key] = value
+    return values
+
+
+def _add_missing_columns(conn):
+    """为已有的表补上模型中新增的可空列（create_all不会修改已存在的表）"""
+    inspector = inspect(conn)
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing or not column.nullable:
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            for index in table.indexes:
+                if column.name in index.columns:
+                    index.create(conn, checkfirst=True)
+
+
+class SQLRepository(BaseRepository):
+    """基于SQLAlchemy异步引擎的数据访问实现"""
+
+    def __init__(self, database_url: str, pool_size: int = 10, create_tables: bool = True, echo: bool = False):
+        url = make_url(database_url)
+        engine_kwargs = {"echo": echo}
+
+        if url.get_backend_name() == "sqlite":
+            # 确保SQLite数据库文件所在目录存在
+            if url.database and url.database != ":memory:":
+                Path(url.database).parent.mkdir(parents=True, exist_ok=True)
+        else:
+            engine_kwargs.update(pool_size=pool_size, pool_pre_ping=True)
+
+        self.engine = create_async_engine(url, **engine_kwargs)
+        instrument_sql_engine(self.engine.sync_engine)
+        self.session_factory = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.create_tables = create_tables
+        self._schema_ready = False
+        self._schema_lock = asyncio.Lock()
+
+    async def _ensure_schema(self):
+        """首次访问时建表"""
+        if self._schema_ready or not self.create_tables:
+            return
+        async with self._schema_lock:
+            if not self._schema_ready:
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                    await conn.run_sync(_add_missing_columns)
+                self._schema_ready = True
+
+    async def _fetch_all(self, statement) -> List[Dict[str, Any]]:
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            result = await session.execute(statement)
+            return [_to_dict(obj) for obj in result.scalars().all()]
+
+    async def _fetch_one(self, statement) -> Optional[Dict[str, Any]]:
+        rows = await self._fetch_all(statement.limit(1))
+        return rows[0] if rows else None
+
+    async def _insert(self, model, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            async with session.begin():
+                objs = [model(**_coerce(model, row)) for row in rows]
+                session.add_all(objs)
+            return [_to_dict(obj) for obj in objs]
+
+    async def _execute(self, statement):
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(statement)
+
+    async def _insert_many(self, model, rows: List[Dict[str, Any]], transaction=None, replace: bool = False):
+        """批量插入（executemany），不回读写入的行；replace为True时先删除同ID的行（与PostgREST的upsert一致）"""
+        if not rows:
+            return
+        values = [_coerce(model, row) for row in rows]
+
+        async def run(session):
+            if replace:
+                await session.execute(delete(model).where(model.id.in_([row["id"] for row in values])))
+            await session.execute(insert(model), values)
+
+        if transaction is not None:
+            await run(transaction)
+            return
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            async with session.begin():
+                await run(session)
+
+    # ---------- 用户 ----------
+
+    async def get_user(self, user_id):
+        return await self._fetch_one(select(User).where(User.id == user_id))
+
+    async def get_users(self, user_ids):
+        if not user_ids:
+            return []
+        return await self._fetch_all(select(User).where(User.id.in_(user_ids)))
+
+    async def get_user_by_email(self, email):
+        return await self._fetch_one(select(User).where(func.lower(User.email) == email.lower()))
+
+    async def find_existing_emails(self, emails):
+        emails = [e.lower() for e in emails]
+        if not emails:
+            return set()
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            result = await session.execute(select(User.email).where(func.lower(User.email).in_(emails)))
+            return {email.lower() for email in result.scalars().all()}
+
+    async def insert_users(self, rows):
+        if not rows:
+            return []
+        return await self._insert(User, rows)
+
+    async def update_user(self, user_id, fields):
+        await self._execute(update(User).where(User.id == user_id).values(**_coerce(User, fields)))
+        return await self.get_user(user_id)
+
+    async def assign_family_id(self, user_id, family_id):
+        await self._execute(
+            update(User).where(User.id == user_id, User.family_id.is_(None)).values(family_id=family_id)
+        )
+        user = await self.get_user(user_id)
+        return user["family_id"] if user else None
+
+    async def list_disabled_user_ids(self):
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            result = await session.execute(select(User.id).where(User.is_active.is_(False)))
+            return list(result.scalars().all())
+
+    # ---------- 令牌吊销 ----------
+
+    async def insert_token_revocation(self, row):
+        await self._insert(TokenRevocation, [row])
+
+    async def list_token_revocations(self, expires_after):
+        threshold = datetime.fromisoformat(expires_after)
+        return await self._fetch_all(select(TokenRevocation).where(TokenRevocation.expires_at > threshold))
+
+    # ---------- 教材 ----------
+
+    async def get_textbook(self, textbook_id):
+        return await self._fetch_one(select(Textbook).where(Textbook.id == textbook_id))
+
+    async def get_textbooks(self, textbook_ids):
+        if not textbook_ids:
+            return []
+        return await self._fetch_all(select(Textbook).where(Textbook.id.in_(textbook_ids)))
+
+    async def list_textbooks(self, user_id):
+        return await self._fetch_all(
+            select(Textbook).where(Textbook.user_id == user_id).order_by(Textbook.created_at.desc())
+        )
+
+    async def list_textbooks_by_hash(self, file_hash):
+        return await self._fetch_all(
+            select(Textbook).where(Textbook.file_hash == file_hash).order_by(Textbook.updated_at.desc())
+        )
+
+    async def insert_textbook(self, row):
+        rows = await self._insert(Textbook, [row])
+        return rows[0] if rows else None
+
+    async def update_textbook(self, textbook_id, fields):
+        await self._execute(update(Textbook).where(Textbook.id == textbook_id).values(**_coerce(Textbook, fields)))
+
+    async def delete_textbook(self, textbook_id):
+        await self._ensure_schema()
+        unit_ids = select(Unit.id).where(Unit.textbook_id == textbook_id).scalar_subquery()
+
+        # 在同一事务中按外键顺序级联删除；与Supabase后端一致，只删单元、知识点和解析任务，
+        # 测试和答题记录是学生的学习历史，不随教材删除
+        async with self.session_factory() as session:
+            async with session.begin():
+                await session.execute(delete(ParseJob).where(ParseJob.textbook_id == textbook_id))
+                await session.execute(delete(KnowledgePoint).where(KnowledgePoint.unit_id.in_(unit_ids)))
+                await session.execute(delete(Unit).where(Unit.textbook_id == textbook_id))
+                await session.execute(delete(Textbook).where(Textbook.id == textbook_id))
+
+    # ---------- 单元 ----------
+
+    async def list_units(self, textbook_id):
+        return await self._fetch_all(
+            select(Unit).where(Unit.textbook_id == textbook_id).order_by(Unit.unit_number)
+        )
+
+    async def list_units_for_textbooks(self, textbook_ids):
+        if not textbook_ids:
+            return []
+        return await self._fetch_all(
+            select(Unit).where(Unit.textbook_id.in_(textbook_ids)).order_by(Unit.unit_number)
+        )
+
+    async def get_units(self, unit_ids):
+        if not unit_ids:
+            return []
+        return await self._fetch_all(select(Unit).where(Unit.id.in_(unit_ids)))
+
+    async def insert_unit(self, row):
+        rows = await self._insert(Unit, [row])
+        return rows[0] if rows else None
+
+    async def insert_units(self, rows, transaction=None):
+        await self._insert_many(Unit, rows, transaction)
+
+    async def update_unit(self, unit_id, fields, transaction=None):
+        statement = update(Unit).where(Unit.id == unit_id).values(**_coerce(Unit, fields))
+        if transaction is not None:
+            await transaction.execute(statement)
+        else:
+            await self._execute(statement)
+
+    async def delete_units(self, unit_ids, transaction=None):
+        if not unit_ids:
+            return
+
+        async def run(session):
+            await session.execute(delete(KnowledgePoint).where(KnowledgePoint.unit_id.in_(unit_ids)))
+            await session.execute(delete(Unit).where(Unit.id.in_(unit_ids)))
+
+        if transaction is not None:
+            await run(transaction)
+            return
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            async with session.begin():
+                await run(session)
+
+    async def count_points_by_unit(self, textbook_id, unit_ids=None):
+        await self._ensure_schema()
+        statement = (
+            select(Unit.id, KnowledgePoint.point_type, func.count(KnowledgePoint.id))
+            .select_from(Unit)
+            .outerjoin(KnowledgePoint, KnowledgePoint.unit_id == Unit.id)
+            .where(Unit.textbook_id == textbook_id)
+            .group_by(Unit.id, KnowledgePoint.point_type)
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(statement)
+
+        counts: Dict[str, Dict[str, int]] = {}
+        for unit_id, point_type, count in result.all():
+            unit_counts = counts.setdefault(unit_id, {t: 0 for t in POINT_TYPES})
+            if point_type in unit_counts:
+                unit_counts[point_type] = count
+        return counts
+
+    # ---------- 知识点 ----------
+
+    async def list_knowledge_points(self, textbook_id=None, unit_ids=None, point_types=None, offset=0, limit=None,
+                                    with_unit_title=True):
+        if unit_ids is not None and not unit_ids:
+            return []
+
+        await self._ensure_schema()
+        statement = (
+            select(KnowledgePoint, Unit.title)
+            .join(Unit, KnowledgePoint.unit_id == Unit.id)
+            .order_by(Unit.unit_number, KnowledgePoint.created_at, KnowledgePoint.id)
+        )
+        if textbook_id:
+            statement = statement.where(Unit.textbook_id == textbook_id)
+        if unit_ids is not None:
+            statement = statement.where(KnowledgePoint.unit_id.in_(unit_ids))
+        if point_types:
+            statement = statement.where(KnowledgePoint.point_type.in_(list(point_types)))
+        if limit is not None:
+            statement = statement.offset(offset).limit(limit)
+
+        async with self.session_factory() as session:
+            result = await session.execute(statement)
+            rows = []
+            for kp, unit_title in result.all():
+                row = _to_dict(kp)
+                row["unit_title"] = unit_title
+                rows.append(row)
+            return rows
+
+    async def get_knowledge_point(self, knowledge_point_id):
+        await self._ensure_schema()
+        statement = (
+            select(KnowledgePoint, Unit.title)
+            .join(Unit, KnowledgePoint.unit_id == Unit.id, isouter=True)
+            .where(KnowledgePoint.id == knowledge_point_id)
+        )
+        async with self.session_factory() as session:
+            result = (await session.execute(statement)).first()
+        if result is None:
+            return None
+
+        kp, unit_title = result
+        row = _to_dict(kp)
+        row["unit_title"] = unit_title
+        return row
+
+    async def get_knowledge_points(self, knowledge_point_ids):
+        if not knowledge_point_ids:
+            return []
+        return await self._fetch_all(select(KnowledgePoint).where(KnowledgePoint.id.in_(knowledge_point_ids)))
+
+    async def insert_knowledge_point(self, row):
+        await self._insert(KnowledgePoint, [row])
+
+    async def insert_knowledge_points(self, rows, transaction=None):
+        await self._insert_many(KnowledgePoint, rows, transaction, replace=True)
+
+    async def delete_knowledge_points(self, knowledge_point_ids, transaction=None):
+        if not knowledge_point_ids:
+            return
+        statement = delete(KnowledgePoint).where(KnowledgePoint.id.in_(knowledge_point_ids))
+        if transaction is not None:
+            await transaction.execute(statement)
+        else:
+            await self._execute(statement)
+
+    async def find_answered_knowledge_points(self, knowledge_point_ids):
+        if not knowledge_point_ids:
+            return set()
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            result = await session.execute(
+                select(AnswerRecord.knowledge_point_id).where(
+                    AnswerRecord.knowledge_point_id.in_(knowledge_point_ids)
+                ).distinct()
+            )
+            return set(result.scalars().all())
+
+    # ---------- 解析任务 ----------
+
+    async def insert_parse_job(self, row):
+        rows = await self._insert(ParseJob, [row])
+        return rows[0] if rows else None
+
+    async def get_parse_job(self, job_id):
+        return await self._fetch_one(select(ParseJob).where(ParseJob.id == job_id))
+
+    async def list_parse_jobs(self, statuses, textbook_id=None):
+        statement = select(ParseJob).where(ParseJob.status.in_(list(statuses)))
+        if textbook_id:
+            statement = statement.where(ParseJob.textbook_id == textbook_id)
+        return await self._fetch_all(statement.order_by(ParseJob.created_at))
+
+    async def update_parse_job(self, job_id, fields, expected=None):
+        statement = update(ParseJob).where(ParseJob.id == job_id)
+        for column, value in _coerce(ParseJob, expected or {}).items():
+            statement = statement.where(ParseJob.__table__.columns[column] == value)
+
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            async with session.begin():
+                result = await session.execute(statement.values(**_coerce(ParseJob, fields)))
+                return result.rowcount > 0
+
+    # ---------- 测试记录 ----------
+
+    async def get_test_record(self, test_id):
+        return await self._fetch_one(select(TestRecord).where(TestRecord.id == test_id))
+
+    async def list_test_records(self, user_id, status=None, offset=0, limit=None):
+        statement = select(TestRecord).where(TestRecord.user_id == user_id)
+        if status:
+            statement = statement.where(TestRecord.status == status)
+        statement = statement.order_by(TestRecord.created_at.desc())
+        if limit is not None:
+            statement = statement.offset(offset).limit(limit)
+        return await self._fetch_all(statement)
+
+    async def insert_test_record(self, row):
+        await self._insert(TestRecord, [row])
+
+    async def update_test_record(self, test_id, fields):
+        await self._execute(update(TestRecord).where(TestRecord.id == test_id).values(**_coerce(TestRecord, fields)))
+
+    async def list_answer_records(self, test_id):
+        return await self._fetch_all(select(AnswerRecord).where(AnswerRecord.test_id == test_id))
+
+    async def insert_answer_record(self, row):
+        await self._insert(AnswerRecord, [row])
+
+    @asynccontextmanager
+    async def transaction(self):
+        await self._ensure_schema()
+        async with self.session_factory() as session:
+            async with session.begin():
+                yield session
+
+    async def warmup(self):
+        await self._ensure_schema()
+        async with self.engine.connect():
+            pass
+
+    async def close(self):
+        await self.engine.dispose()
@@ -0,0 +1,110 @@
+"""
+英语学习辅助应用 - Supabase数据访问客户端
+
+全局共享的异步PostgREST客户端，基于可调的HTTP keep-alive连接池
+"""
+
+from typing import Dict, Optional, Union
+
+import httpx
+from postgrest import AsyncPostgrestClient
+from postgrest.constants import DEFAULT_POSTGREST_CLIENT_HEADERS
+
+from config import settings
+from services.metrics import MetricsTransport
+
+
+class PooledPostgrestClient(AsyncPostgrestClient):
+    """使用自定义连接池参数的异步PostgREST客户端"""
+
+    def __init__(self, base_url: str, *, limits: httpx.Limits, **kwargs):
+        self._limits = limits
+        super().__init__(base_url, **kwargs)
+
+    def create_session(
+        self,
+        base_url: str,
+        headers: Dict[str, str],
+        timeout: Union[int, float, httpx.Timeout],
+        *args,
+        **kwargs
+    ) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            transport=MetricsTransport(httpx.AsyncHTTPTransport(limits=self._limits))
+        )
+
+
+class SupabasePool:
+    """共享的Supabase数据访问客户端（首次使用时创建连接池）"""
+
+    def __init__(self,
+                 url: str,
+                 service_key: str,
+                 max_connections: int = 100,
+                 max_keepalive: int = 20,
+                 keepalive_expiry: float = 30.0,
+                 timeout: float = 10.0):
+        self.url = url
+        self.service_key = service_key
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = timeout
+        self._client: Optional[PooledPostgrestClient] = None
+
+    @property
+    def client(self) -> PooledPostgrestClient:
+        """获取PostgREST客户端"""
+        if self._client is None:
+            headers = {
+                **DEFAULT_POSTGREST_CLIENT_HEADERS,
+                "apiKey": self.service_key,
+                "Authorization": f"Bearer {self.service_key}"
+            }
+            base_url = f"{self.url.rstrip('/')}/rest/v1"
+            try:
+                self._client = AsyncPostgrestClient(
+                    base_url,
+                    headers=headers,
+                    http_client=httpx.AsyncClient(
+                        base_url=base_url,
+                        headers={**headers, "Accept-Profile": "public", "Content-Profile": "public"},
+                        timeout=self.timeout,
+                        transport=MetricsTransport(httpx.AsyncHTTPTransport(limits=self.limits))
+                    )
+                )
+            except TypeError:
+                # 旧版postgrest不支持传入http_client，通过create_session注入连接池参数
+                self._client = PooledPostgrestClient(
+                    base_url,
+                    limits=self.limits,
+                    headers=headers,
+                    timeout=self.timeout
+                )
+        return self._client
+
+    def table(self, table_name: str):
+        """对指定表构建查询"""
+        return self.client.table(table_name)
+
+    async def aclose(self):
+        """关闭连接池"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# 创建全局Supabase客户端实例
+supabase = SupabasePool(
+    settings.supabase.url,
+    settings.supabase.service_key,
+    max_connections=settings.supabase.pool_max_connections,
+    max_keepalive=settings.supabase.pool_max_keepalive,
+    keepalive_expiry=settings.supabase.pool_keepalive_expiry,
+    timeout=settings.supabase.timeout
+)
@@ -10,6 +10,7 @@ from datetime import datetime
 from uuid import uuid4
 
 from services.llm_service import llm_service
+from services.tracing import traced
 from config import settings
 
 
@@ -19,6 +20,7 @@ class TestGenerator:
     def __init__(self):
         self.llm = llm_service
     
+    @traced("test_generator.generate_test")
     def generate_test(self,
                      knowledge_points: List[Dict],
                      test_scope: Dict,
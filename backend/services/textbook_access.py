@@ -0,0 +1,132 @@
+"""
+英语学习辅助应用 - 教材权限解析
+
+缓存教材归属及单元列表，供各路由统一做权限校验和单元过滤，
+教材上传、解析、删除时主动失效
+"""
+
+import asyncio
+from typing import Any, Dict, List, Optional
+
+from config import settings
+from services.data_loader import get_loaders
+from services.repository import repository
+from services.tracing import traced
+from services.user_cache import TTLCache
+
+
+class TextbookAccess:
+    """教材元数据（教材记录 + 按序号排序的单元列表）"""
+
+    def __init__(self, textbook: Dict[str, Any], units: List[Dict[str, Any]]):
+        self.textbook = textbook
+        self.units = units
+
+    @property
+    def id(self) -> str:
+        return self.textbook["id"]
+
+    @property
+    def user_id(self) -> str:
+        return self.textbook["user_id"]
+
+    @property
+    def unit_ids(self) -> List[str]:
+        return [u["id"] for u in self.units]
+
+    @property
+    def unit_titles(self) -> Dict[str, str]:
+        return {u["id"]: u["title"] for u in self.units}
+
+    def is_owner(self, user_id: str) -> bool:
+        """判断用户是否为教材所有者"""
+        return self.user_id == user_id
+
+    def filter_unit_ids(self, unit_ids: Optional[List[str]] = None) -> List[str]:
+        """返回属于该教材的单元ID，不指定时返回全部单元"""
+        if unit_ids is None:
+            return self.unit_ids
+        owned = set(self.unit_ids)
+        return [uid for uid in unit_ids if uid in owned]
+
+
+def _same_version(cached: Dict[str, Any], fresh: Dict[str, Any]) -> bool:
+    """缓存的教材记录与最新记录的更新时间和解析状态是否一致"""
+    return all(cached.get(key) == fresh.get(key) for key in ("updated_at", "parse_status"))
+
+
+class TextbookResolver:
+    """教材权限解析器"""
+
+    def __init__(self, ttl_seconds: int = 30, max_size: int = 2000):
+        self._cache = TTLCache("textbook", ttl_seconds=ttl_seconds, max_size=max_size)
+
+    async def _load(self, textbook_id: str) -> Optional[TextbookAccess]:
+        loaders = get_loaders()
+        textbook, units = await asyncio.gather(
+            loaders.textbooks.load(textbook_id),
+            loaders.units_by_textbook.load(textbook_id)
+        )
+        if not textbook:
+            return None
+
+        units = [
+            {"id": u["id"], "unit_number": u["unit_number"], "title": u["title"]}
+            for u in units
+        ]
+        return TextbookAccess(textbook, units)
+
+    @traced("textbook_access.resolve")
+    async def resolve(self, textbook_id: str) -> Optional[TextbookAccess]:
+        """获取教材元数据，教材不存在时返回None"""
+        return await self._cache.get_or_load(textbook_id, self._load)
+
+    @traced("textbook_access.resolve_fresh")
+    async def resolve_fresh(self, textbook_id: str) -> Optional[TextbookAccess]:
+        """
+        获取教材元数据，并用数据库中最新的教材记录校验缓存
+
+        缓存只在发生变化的进程中失效，多worker部署时其他进程的缓存在TTL内可能仍是旧版本；
+        生成ETag等依赖最新解析状态的场合使用（多一次主键查询，不查单元和知识点）
+        """
+        textbook = await repository.get_textbook(textbook_id)
+        if not textbook:
+            self.invalidate(textbook_id)
+            return None
+
+        access = await self.resolve(textbook_id)
+        if access is not None and _same_version(access.textbook, textbook):
+            return access
+
+        # 缓存已过时（其他进程重新解析或修改过教材），单元列表也一并重新加载
+        self.invalidate(textbook_id)
+        access = await self.resolve(textbook_id)
+        units = access.units if access is not None else []
+        return TextbookAccess(textbook, units)
+
+    def prime(self, textbook: Dict[str, Any], units: Optional[List[Dict[str, Any]]] = None):
+        """新建教材后直接写入缓存，后续的解析请求无需再查库"""
+        self._cache.invalidate(textbook["id"])
+        self._cache.set(textbook["id"], TextbookAccess(textbook, units or []))
+
+    def invalidate(self, textbook_id: str):
+        """教材或其单元发生变化时调用"""
+        self._cache.invalidate(textbook_id)
+
+        loaders = get_loaders()
+        loaders.textbooks.clear(textbook_id)
+        loaders.units_by_textbook.clear(textbook_id)
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        return self._cache.stats()
+
+
+# 创建全局教材权限解析实例
+textbook_resolver = TextbookResolver(
+    ttl_seconds=settings.cache.textbook_ttl_seconds,
+    max_size=settings.cache.textbook_max_size
+)
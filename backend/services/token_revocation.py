@@ -0,0 +1,87 @@
+"""
+英语学习辅助应用 - 令牌吊销列表
+
+在内存中维护已注销的令牌和已禁用的用户，并定期从数据库刷新
+"""
+
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Set, Tuple
+
+from config import settings
+
+
+# 刷新函数返回 (已禁用用户ID列表, [(jti, 过期时间戳), ...])
+RevocationFetcher = Callable[[], Awaitable[Tuple[Iterable[str], Iterable[Tuple[str, float]]]]]
+
+
+class RevocationList:
+    """令牌吊销列表"""
+
+    def __init__(self, refresh_seconds: int = 30):
+        self.refresh_seconds = refresh_seconds
+        self._revoked_tokens: Dict[str, float] = {}  # jti -> 令牌过期时间戳
+        self._disabled_users: Set[str] = set()
+        self.last_refreshed_at: Optional[float] = None
+
+    def revoke_token(self, jti: str, expires_at: float):
+        """吊销单个令牌"""
+        self._revoked_tokens[jti] = expires_at
+
+    def disable_user(self, user_id: str):
+        """吊销用户的全部令牌"""
+        self._disabled_users.add(user_id)
+
+    def enable_user(self, user_id: str):
+        """恢复用户的令牌"""
+        self._disabled_users.discard(user_id)
+
+    def is_revoked(self, payload: Dict[str, Any]) -> bool:
+        """检查令牌是否已被吊销"""
+        if payload.get("sub") in self._disabled_users:
+            return True
+
+        jti = payload.get("jti")
+        return jti is not None and jti in self._revoked_tokens
+
+    def _prune(self):
+        """清理已自然过期的令牌记录"""
+        now = time.time()
+        expired = [jti for jti, expires_at in self._revoked_tokens.items() if expires_at <= now]
+        for jti in expired:
+            del self._revoked_tokens[jti]
+
+    async def refresh(self, fetcher: RevocationFetcher):
+        """从数据库刷新吊销列表"""
+        disabled_users, revoked_tokens = await fetcher()
+
+        self._disabled_users = set(disabled_users)
+        for jti, expires_at in revoked_tokens:
+            self._revoked_tokens[jti] = expires_at
+
+        self._prune()
+        self.last_refreshed_at = time.time()
+
+    async def run_periodic(self, fetcher: RevocationFetcher):
+        """定期刷新吊销列表（在后台任务中运行）"""
+        while True:
+            try:
+                await self.refresh(fetcher)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ 刷新令牌吊销列表失败: {str(e)}")
+
+            await asyncio.sleep(self.refresh_seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        """吊销列表统计信息"""
+        return {
+            "revoked_tokens": len(self._revoked_tokens),
+            "disabled_users": len(self._disabled_users),
+            "last_refreshed_at": self.last_refreshed_at
+        }
+
+
+# 创建全局令牌吊销列表实例
+revocation_list = RevocationList(refresh_seconds=settings.auth.revocation_refresh_seconds)
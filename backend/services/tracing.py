@@ -0,0 +1,375 @@
+"""
+英语学习辅助应用 - 请求链路追踪
+
+轻量的span实现：每个请求一个trace id，路由、鉴权、数据库、文档解析、大模型调用
+各记录一个span，通过ContextVar传递父子关系（asyncio.to_thread 和线程池会复制上下文）。
+
+结束的span放入内存队列，由后台线程批量导出到：
+- jsonl: 本地JSONL文件，一行一个span（benchmarks/trace_view.py 可查看瀑布图）
+- otlp:  OTLP/HTTP JSON 协议的采集端（OpenTelemetry Collector、Jaeger、Tempo等）
+
+未被采样的请求只做一次ContextVar读取，不创建span。
+"""
+
+import asyncio
+import functools
+import json
+import queue
+import random
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from config import settings, TracingConfig
+
+
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+
+class Span:
+    """一次操作的耗时记录"""
+
+    __slots__ = ("trace_id", "span_id", "parent_id", "name", "kind", "attributes",
+                 "start_ns", "end_ns", "error", "_started")
+
+    def __init__(self, trace_id: str, parent_id: Optional[str], name: str,
+                 kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes or {}
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        self._started = time.perf_counter_ns()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        # 用单调时钟计算耗时，避免系统时间调整
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._started)
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or self.start_ns) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_unix_nano": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "attributes": self.attributes,
+            "error": self.error
+        }
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def current_span() -> Optional[Span]:
+    """当前上下文中的span（未采样时为None）"""
+    return _current_span.get()
+
+
+# ---------- 导出 ----------
+
+class JsonlExporter:
+    """追加写入本地JSONL文件"""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+
+    def export(self, spans: List[Span]):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            for span in spans:
+                f.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OtlpExporter:
+    """以OTLP/HTTP JSON协议发送到采集端"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.url = endpoint.rstrip("/") + "/v1/traces"
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [
+                    {"key": "service.name", "value": {"stringValue": self.service_name}}
+                ]},
+                "scopeSpans": [{
+                    "scope": {"name": "services.tracing"},
+                    "spans": [{
+                        "traceId": span.trace_id,
+                        "spanId": span.span_id,
+                        "parentSpanId": span.parent_id or "",
+                        "name": span.name,
+                        "kind": span.kind,
+                        "startTimeUnixNano": str(span.start_ns),
+                        "endTimeUnixNano": str(span.end_ns or span.start_ns),
+                        "attributes": [
+                            {"key": key, "value": _otlp_value(value)}
+                            for key, value in span.attributes.items()
+                        ],
+                        "status": {"code": 2, "message": span.error} if span.error else {"code": 1}
+                    } for span in spans]
+                }]
+            }]
+        }
+
+    def export(self, spans: List[Span]):
+        import httpx
+
+        # 导出请求本身不经过追踪和指标统计的传输层
+        httpx.post(self.url, json=self._payload(spans), timeout=self.timeout).raise_for_status()
+
+
+class Tracer:
+    """span的创建、采样和批量导出"""
+
+    def __init__(self, config: TracingConfig):
+        self.config = config
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=config.max_queue_size)
+        self._exporter = None
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.config.enabled
+
+    def _get_exporter(self):
+        if self._exporter is None:
+            if self.config.exporter == "otlp":
+                self._exporter = OtlpExporter(self.config.otlp_endpoint, self.config.service_name)
+            elif self.config.exporter == "jsonl":
+                self._exporter = JsonlExporter(self.config.jsonl_path)
+            else:
+                raise ValueError(f"不支持的追踪导出方式: {self.config.exporter}")
+        return self._exporter
+
+    # ---------- span ----------
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes) -> Optional[Span]:
+        """开始一条新的链路（按采样率决定是否记录），可延续上游的W3C traceparent"""
+        if not self.enabled:
+            return None
+
+        trace_id, parent_id = None, None
+        if traceparent:
+            parts = traceparent.split("-")
+            if len(parts) == 4 and len(parts[1]) == 32 and len(parts[2]) == 16:
+                trace_id, parent_id = parts[1], parts[2]
+                if parts[3] == "00":
+                    # 上游未采样
+                    return None
+
+        if trace_id is None and random.random() >= self.config.sample_rate:
+            return None
+
+        return Span(trace_id or secrets.token_hex(16), parent_id, name, SPAN_KIND_SERVER, attributes)
+
+    @contextmanager
+    def span(self, name: str, kind: int = SPAN_KIND_INTERNAL, **attributes) -> Iterator[Optional[Span]]:
+        """在当前链路下记录一个子span；当前请求未采样时不做任何事"""
+        parent = _current_span.get()
+        if parent is None:
+            yield None
+            return
+
+        span = Span(parent.trace_id, parent.span_id, name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    @contextmanager
+    def activate(self, span: Span) -> Iterator[Span]:
+        """将span设为当前上下文的父span，退出时结束并导出"""
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.finish(span)
+
+    def finish(self, span: Span):
+        span.finish()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+            return
+        self._ensure_worker()
+
+    # ---------- 后台导出 ----------
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="trace-exporter", daemon=True)
+                self._worker.start()
+
+    def _drain(self, block: bool) -> List[Span]:
+        batch: List[Span] = []
+        try:
+            if block:
+                batch.append(self._queue.get(timeout=self.config.flush_interval_seconds))
+            while len(batch) < self.config.batch_size:
+                batch.append(self._queue.get_nowait())
+        except queue.Empty:
+            pass
+        return batch
+
+    def _export(self, batch: List[Span]):
+        try:
+            self._get_exporter().export(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            print(f"⚠️ 导出追踪数据失败: {str(e)}")
+
+    def _run(self):
+        while True:
+            batch = self._drain(block=True)
+            if batch:
+                self._export(batch)
+
+    def flush(self):
+        """导出队列中剩余的span（关闭服务时调用）"""
+        while True:
+            batch = self._drain(block=False)
+            if not batch:
+                return
+            self._export(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        """追踪统计信息"""
+        return {
+            "enabled": self.enabled,
+            "exporter": self.config.exporter,
+            "queued": self._queue.qsize(),
+            "exported": self.exported,
+            "dropped": self.dropped
+        }
+
+
+def traced(name: str, kind: int = SPAN_KIND_INTERNAL) -> Callable:
+    """为同步或异步函数记录span的装饰器"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _current_span.get() is None:
+                    return await func(*args, **kwargs)
+                with tracer.span(name, kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with tracer.span(name, kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def trace_repository(repository, prefix: str = "repository"):
+    """为数据访问实例的每个公开异步方法记录span（在实例上替换方法，保持类型不变）"""
+    for attr in dir(type(repository)):
+        if attr.startswith("_") or attr in ("close", "warmup"):
+            continue
+        method = getattr(repository, attr)
+        if callable(method) and asyncio.iscoroutinefunction(method):
+            setattr(repository, attr, traced(f"{prefix}.{attr}", SPAN_KIND_CLIENT)(method))
+    return repository
+
+
+class TracingMiddleware:
+    """为每个请求创建根span，并在响应头返回traceparent（纯ASGI中间件）"""
+
+    def __init__(self, app, exclude_paths=("/metrics", "/health", "/ready")):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope.get("path") in self.exclude_paths:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        traceparent = headers.get(b"traceparent")
+        span = tracer.start_trace(
+            f"{scope.get('method')} {scope.get('path')}",
+            traceparent.decode("latin-1") if traceparent else None,
+            **{"http.method": scope.get("method"), "http.target": scope.get("path")}
+        )
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+                message = {**message, "headers": [
+                    *message.get("headers", []),
+                    (b"traceparent", f"00-{span.trace_id}-{span.span_id}-01".encode("latin-1"))
+                ]}
+            await send(message)
+
+        with tracer.activate(span):
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                # 匹配到路由后改用路由模板命名，便于按接口聚合
+                route = getattr(scope.get("route"), "path", None)
+                if route:
+                    span.name = f"{scope.get('method')} {route}"
+                    span.set_attribute("http.route", route)
+
+
+# 创建全局追踪实例
+tracer = Tracer(settings.tracing)
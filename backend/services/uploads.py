@@ -0,0 +1,244 @@
+"""
+英语学习辅助应用 - 教材文件上传
+
+上传的文件按块写入磁盘，不在内存中保留整个文件：
+- 写入过程中计算SHA-256、累计大小，超过上限立即中止
+- 根据第一块的文件头（magic bytes）核对文件类型，扩展名与内容不符时拒绝
+- 先写入 .part 临时文件，完成后改名；失败时删除已写入的部分
+- 文件按内容寻址保存为 <SHA-256><扩展名>，相同内容的教材共用同一个文件，
+  不再被任何教材引用时才删除
+
+同一内容的上传与删除可能同时进行，两边按以下顺序操作，文件不会在仍被引用时丢失：
+- 上传：先写入暂存文件，教材记录写入后才改名为按内容寻址的路径（publish_upload）
+- 删除：先把文件改名移开，再检查引用；仍被引用时移回，否则删除（release_upload）
+检查引用时还看不到的上传，其改名一定发生在移开之后，会重新放回文件。
+
+请求体在到达接口前已由框架解析（文件部分超过1MB时暂存到磁盘临时文件），
+因此 UploadLimitMiddleware 在解析前按Content-Length拒绝明显超限的请求。
+"""
+
+import asyncio
+import codecs
+import hashlib
+import json
+import os
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional, Sequence
+
+from fastapi import HTTPException, UploadFile, status
+
+from config import UploadConfig
+from services.metrics import metrics
+from services.repository import repository
+
+
+# 各扩展名允许的文件头
+MAGIC_BYTES = {
+    ".pdf": (b"%PDF-",),
+    ".docx": (b"PK\x03\x04",),
+    ".doc": (b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1", b"PK\x03\x04"),
+}
+
+# 文本格式（无固定文件头，按UTF-8文本校验）
+TEXT_TYPES = (".md",)
+
+# multipart表单中文件以外的部分（边界、表单字段）允许的字节数
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+upload_bytes = metrics.histogram(
+    "upload_bytes", "上传的教材文件大小（字节）", (),
+    buckets=(1e5, 1e6, 5e6, 1e7, 5e7, 1e8, 2e8, 5e8))
+upload_rejected = metrics.counter(
+    "upload_rejected_total", "被拒绝的上传", ("reason",))
+
+
+class UploadRejectedError(ValueError):
+    """上传的文件不符合要求（由接口转换为4xx）"""
+
+    def __init__(self, status_code: int, detail: str, reason: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.reason = reason
+
+    def to_http_exception(self) -> HTTPException:
+        return HTTPException(status_code=self.status_code, detail=str(self))
+
+
+def _too_large(max_bytes: int) -> UploadRejectedError:
+    return UploadRejectedError(
+        status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        f"文件过大，最大允许 {max_bytes // (1024 * 1024)} MB",
+        "too_large"
+    )
+
+
+def check_magic(file_ext: str, head: bytes) -> bool:
+    """根据文件开头的字节核对文件类型"""
+    if file_ext in TEXT_TYPES:
+        if b"\x00" in head:
+            return False
+        try:
+            # 增量解码：第一块末尾被截断的多字节字符不算错误
+            codecs.getincrementaldecoder("utf-8")().decode(head)
+        except UnicodeDecodeError:
+            return False
+        return True
+    return any(head.startswith(magic) for magic in MAGIC_BYTES.get(file_ext, ()))
+
+
+def hash_file(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """计算已保存文件的SHA-256（在线程中调用）"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _write_chunk(handle, digest, chunk: bytes):
+    digest.update(chunk)
+    handle.write(chunk)
+
+
+async def save_upload(upload: UploadFile, destination: Path, config: UploadConfig) -> Dict[str, Any]:
+    """
+    按块把上传的文件写入destination
+
+    Returns:
+        {"size": 字节数, "sha256": 十六进制摘要}
+
+    Raises:
+        UploadRejectedError: 文件为空、超过大小上限或内容与扩展名不符
+    """
+    file_ext = destination.suffix.lower()
+    max_bytes = config.max_size_mb * 1024 * 1024
+    chunk_size = max(1, config.chunk_size_kb) * 1024
+    partial = destination.with_name(destination.name + ".part")
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(partial, "wb") as handle:
+            while True:
+                chunk = await upload.read(chunk_size)
+                if not chunk:
+                    break
+                if size == 0 and not check_magic(file_ext, chunk):
+                    raise UploadRejectedError(
+                        status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                        f"文件内容与格式 {file_ext} 不符",
+                        "type_mismatch"
+                    )
+                size += len(chunk)
+                if size > max_bytes:
+                    raise _too_large(max_bytes)
+                # 哈希和写盘在线程中执行，不阻塞事件循环
+                await asyncio.to_thread(_write_chunk, handle, digest, chunk)
+
+        if size == 0:
+            raise UploadRejectedError(status.HTTP_400_BAD_REQUEST, "文件为空", "empty")
+        os.replace(partial, destination)
+    except BaseException as e:
+        if isinstance(e, UploadRejectedError):
+            upload_rejected.inc(e.reason)
+        try:
+            partial.unlink()
+        except FileNotFoundError:
+            pass
+        raise
+
+    upload_bytes.observe(size)
+    return {"size": size, "sha256": digest.hexdigest()}
+
+
+async def stage_upload(upload: UploadFile, upload_dir: Path, file_ext: str, config: UploadConfig) -> Dict[str, Any]:
+    """
+    把上传的文件写入暂存文件，教材记录写入后再调用 publish_upload
+
+    Returns:
+        {"path": 按内容寻址的路径, "staging": 暂存文件, "size": 字节数, "sha256": 十六进制摘要,
+         "reused": 是否已有相同内容的文件}
+    """
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    staging = upload_dir / f"{uuid.uuid4()}{file_ext}"
+    saved = await save_upload(upload, staging, config)
+
+    path = upload_dir / f"{saved['sha256']}{file_ext}"
+    return {"path": path, "staging": staging, "reused": path.exists(), **saved}
+
+
+def publish_upload(staging: Path, path: Path):
+    """暂存文件改名为按内容寻址的路径（已存在时同样覆盖，内容相同）"""
+    os.replace(staging, path)
+
+
+def discard_upload(staging: Path):
+    """教材记录写入失败时删除暂存文件"""
+    staging.unlink(missing_ok=True)
+
+
+async def release_upload(file_path: Optional[str], file_hash: Optional[str]):
+    """删除教材后释放其文件：其他教材仍引用相同内容时保留"""
+    if not file_path:
+        return
+    if not file_hash:
+        # 早期上传的文件不按内容寻址，只属于一本教材
+        Path(file_path).unlink(missing_ok=True)
+        return
+
+    removing = f"{file_path}.{uuid.uuid4().hex}.removing"
+    try:
+        os.rename(file_path, removing)
+    except FileNotFoundError:
+        return
+    try:
+        still_referenced = bool(await repository.list_textbooks_by_hash(file_hash))
+    except BaseException:
+        os.replace(removing, file_path)
+        raise
+    if still_referenced:
+        os.replace(removing, file_path)
+    else:
+        os.remove(removing)
+
+
+class UploadLimitMiddleware:
+    """按Content-Length在解析请求体之前拒绝超限的上传（纯ASGI）"""
+
+    def __init__(self, app, paths: Sequence[str], max_bytes: int):
+        self.app = app
+        self.paths = tuple(paths)
+        self.max_bytes = max_bytes + FORM_OVERHEAD_BYTES
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        content_length: Optional[int] = None
+        for name, value in scope.get("headers") or []:
+            if name == b"content-length":
+                try:
+                    content_length = int(value)
+                except ValueError:
+                    pass
+                break
+
+        if content_length is None or content_length <= self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+
+        error = _too_large(self.max_bytes - FORM_OVERHEAD_BYTES)
+        upload_rejected.inc(error.reason)
+        body = json.dumps({"detail": str(error)}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": error.status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,146 @@
+"""
+英语学习辅助应用 - 登录用户缓存
+
+通用的TTL/LRU缓存（TTLCache），支持并发未命中合并；
+user_cache 按JWT中的sub缓存用户数据，教材权限解析（textbook_access.py）也使用TTLCache
+"""
+
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from config import settings
+from services.metrics import metrics
+
+
+cache_requests = metrics.counter(
+    "cache_requests_total", "缓存查询次数", ("cache", "result"))
+cache_entries = metrics.gauge(
+    "cache_entries", "缓存中的条目数", ("cache",))
+
+Loader = Callable[[str], Awaitable[Optional[Any]]]
+
+
+class TTLCache:
+    """带TTL和LRU淘汰的缓存，name用作指标标签"""
+
+    def __init__(self, name: str, ttl_seconds: int = 60, max_size: int = 10000):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: OrderedDict[str, Tuple[float, Any]] = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        # 统计计数
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.coalesced = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        """读取缓存，过期条目视为未命中"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            self._update_size()
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any):
+        """写入缓存，超出容量时淘汰最久未使用的条目"""
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        self._update_size()
+
+    def invalidate(self, key: str):
+        """使指定条目失效"""
+        self._entries.pop(key, None)
+        self._update_size()
+        # 丢弃进行中的加载结果，避免旧数据在失效后被写回
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        """清空缓存"""
+        self._entries.clear()
+        self._inflight.clear()
+        self._update_size()
+
+    def _update_size(self):
+        cache_entries.set(self.name, value=len(self._entries))
+
+    async def get_or_load(self, key: str, loader: Loader) -> Optional[Any]:
+        """
+        读取缓存，未命中时调用loader加载
+
+        同一键的并发未命中只会触发一次loader调用
+        """
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            cache_requests.inc(self.name, "hit")
+            return value
+
+        self.misses += 1
+        cache_requests.inc(self.name, "miss")
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self.coalesced += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+
+        try:
+            value = await loader(key)
+        except BaseException as e:
+            if self._inflight.get(key) is future:
+                self._inflight.pop(key, None)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # 没有其他等待者时避免"exception was never retrieved"警告
+                future.exception()
+            raise
+
+        if self._inflight.get(key) is future:
+            self._inflight.pop(key, None)
+            if value is not None:
+                self.set(key, value)
+
+        future.set_result(value)
+        return value
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total > 0 else 0.0
+        }
+
+
+# 创建全局用户缓存实例
+user_cache = TTLCache(
+    "user",
+    ttl_seconds=settings.cache.user_ttl_seconds,
+    max_size=settings.cache.user_max_size
+)
@@ -19,6 +19,11 @@ export function parseTextbook(textbookId, unitNumbers = null) {
   })
 }
 
+// 查询解析任务状态（status_url 已带 /api 前缀）
+export function getParseJob(statusUrl) {
+  return api.get(statusUrl, { baseURL: '' })
+}
+
 export function getTextbooks() {
   return api.get('/textbooks')
 }